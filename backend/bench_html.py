@@ -0,0 +1,57 @@
+"""
+Benchmark de los backends de extracción HTML (lxml vs bs4).
+
+Por defecto usa las páginas sintéticas de fixtures/ (ver fixtures/README.md):
+sirven para comparar backends y versiones, no como medida del parseo de
+una página real; para eso pásale páginas guardadas de las tiendas.
+
+Uso (desde backend/):
+    python bench_html.py                       # usa fixtures/ (sintéticas)
+    python bench_html.py --ml pagina_ml.html --homecenter pagina_hc.html -n 50
+
+Verifica primero que ambos backends producen exactamente las mismas
+tarjetas y luego mide el tiempo por página de cada uno.
+"""
+import argparse
+import pathlib
+import time
+
+from html_parsing import extract_homecenter_cards, extract_ml_cards
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+
+def bench(fn, html: str, backend: str, n: int) -> float:
+    """Retorna los ms promedio por página."""
+    fn(html, backend=backend)  # calentamiento
+    started = time.perf_counter()
+    for _ in range(n):
+        fn(html, backend=backend)
+    return (time.perf_counter() - started) * 1000 / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ml", default=str(FIXTURES / "mercadolibre_search.html"))
+    parser.add_argument("--homecenter", default=str(FIXTURES / "homecenter_search.html"))
+    parser.add_argument("-n", type=int, default=20, help="iteraciones por backend")
+    args = parser.parse_args()
+
+    for label, fn, path in [
+        ("MercadoLibre", extract_ml_cards, args.ml),
+        ("Homecenter", extract_homecenter_cards, args.homecenter),
+    ]:
+        html = pathlib.Path(path).read_text(encoding="utf-8")
+        lxml_out = fn(html, backend="lxml")
+        bs4_out = fn(html, backend="bs4")
+        if lxml_out != bs4_out:
+            raise SystemExit(f"[{label}] Los backends no producen la misma salida")
+
+        lxml_ms = bench(fn, html, "lxml", args.n)
+        bs4_ms = bench(fn, html, "bs4", args.n)
+        print(f"[{label}] {pathlib.Path(path).name}, {len(html) / 1024:.0f} KB, {len(lxml_out[0])} tarjetas: "
+              f"bs4 {bs4_ms:.2f} ms, lxml {lxml_ms:.2f} ms ({bs4_ms / lxml_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Benchmark de carga de punta a punta: la app real contra tiendas simuladas.
+
+Levanta el stub de tiendas (bench_stub.py) y la app con uvicorn apuntando
+a él (UPSTREAM_OVERRIDE), ambos en procesos aparte, y dispara /search con
+`--concurrency` clientes durante `--duration` segundos. Reporta latencias
+p50/p95/p99, throughput, estados por tienda, memoria de la app (RSS) y el
+promedio por tienda y fase que expone /metrics.
+
+Uso (desde backend/):
+    python bench_load.py                                  # caché apagado, sin demora
+    python bench_load.py -c 32 -d 30 --latency-ms 200 --jitter-ms 100
+    python bench_load.py --cache on                       # mide el camino del caché
+    python bench_load.py --error-rate 0.05 --store-latency falabella=900
+    python bench_load.py --json resultado.json
+
+Con `--cache off` (por defecto) la app corre con CACHE_TTL_DEFAULT=0 y
+CACHE_STALE_TTL=0: cada /search consulta las seis tiendas y se mide el
+camino completo (red, parseo, puntaje). Los límites por tienda se suben
+(RATE_LIMIT_DEFAULT) salvo que ya vengan en el entorno. Las demás
+variables del entorno (PARSE_EXECUTOR, HTTP_MAX_CONNECTIONS...) pasan tal
+cual a la app, así se comparan configuraciones.
+
+La memoria se lee de /proc/<pid>/status (solo Linux).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import pathlib
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND = pathlib.Path(__file__).parent
+
+QUERIES = [
+    "iphone 15", "iphone 15 pro", "televisor samsung 55", "laptop lenovo", "nevera",
+    "audifonos inalambricos", "celular xiaomi", "iphone 14 128gb", "portatil asus", "lavadora",
+]
+
+PHASE_PATTERN = re.compile(r'^cocheap_store_phase_seconds_(sum|count)\{store="([^"]+)",phase="([^"]+)"\} (\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not values:
+        return 0.0
+    return values[max(1, math.ceil(pct / 100 * len(values))) - 1]
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """VmRSS y VmHWM (pico) en KB de un proceso."""
+    memory = {}
+    try:
+        for line in pathlib.Path(f"/proc/{pid}/status").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    cmd = [sys.executable, "bench_stub.py", "--port", str(port),
+           "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+           "--error-rate", str(args.error_rate), "--block-rate", str(args.block_rate),
+           "--hang-rate", str(args.hang_rate), "--seed", str(args.seed)]
+    for value in args.store_latency or []:
+        cmd += ["--store-latency", value]
+    return subprocess.Popen(cmd, cwd=BACKEND)
+
+
+def start_app(port: int, stub_port: int, args, tmp: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "UPSTREAM_OVERRIDE": f"http://127.0.0.1:{stub_port}",
+        "HISTORY_DB_PATH": os.path.join(tmp, "history.db"),
+        "LOCAL_INDEX_PATH": os.path.join(tmp, "local_index.json.gz"),
+        "PREFETCH_ENABLED": "0",
+    }
+    env.setdefault("RATE_LIMIT_DEFAULT", "100000")
+    env.setdefault("RATE_BURST_DEFAULT", "100000")
+    env.setdefault("MAX_CONCURRENCY_DEFAULT", "100000")
+    if args.cache == "off":
+        env.update(CACHE_TTL_DEFAULT="0", CACHE_STALE_TTL="0")
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env,
+                            stdout=None if args.verbose else subprocess.DEVNULL,
+                            stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"El proceso terminó al arrancar ({url})")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise SystemExit(f"No respondió a tiempo: {url}")
+
+
+async def drive(base_url: str, args, app_pid: int) -> Dict:
+    latencies: List[float] = []
+    codes: Counter = Counter()
+    store_status: Dict[str, Counter] = defaultdict(Counter)
+    memory_samples: List[int] = []
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as client:
+        # Calentamiento: pools, caché de filtros/puntaje y (con --cache on) el caché
+        for q in QUERIES:
+            await client.get("/search", params={"q": q})
+
+        stop_at = time.perf_counter() + args.duration
+
+        async def worker():
+            while time.perf_counter() < stop_at:
+                q = rng.choice(QUERIES)
+                started = time.perf_counter()
+                try:
+                    r = await client.get("/search", params={"q": q})
+                    codes[r.status_code] += 1
+                    if r.status_code == 200:
+                        for store, st in r.json().get("stores", {}).items():
+                            store_status[store][st["status"]] += 1
+                except httpx.HTTPError as e:
+                    codes[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        async def sample_memory():
+            while time.perf_counter() < stop_at:
+                memory_samples.append(read_memory(app_pid).get("VmRSS", 0))
+                await asyncio.sleep(0.5)
+
+        started = time.perf_counter()
+        await asyncio.gather(sample_memory(), *(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        metrics_text = (await client.get("/metrics")).text
+
+    latencies.sort()
+    memory = read_memory(app_pid)
+    return {
+        "requests": sum(codes.values()),
+        "ok": codes.get(200, 0),
+        "codes": {str(code): n for code, n in codes.items()},
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        },
+        "stores": {store: dict(counts) for store, counts in store_status.items()},
+        "memory_kb": {
+            "rss_start": memory_samples[0] if memory_samples else 0,
+            "rss_end": memory.get("VmRSS", 0),
+            "rss_peak": memory.get("VmHWM", 0),
+        },
+        "phases_ms": phase_means(metrics_text),
+    }
+
+
+def phase_means(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Promedio en ms por tienda y fase de cocheap_store_phase_seconds."""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        match = PHASE_PATTERN.match(line)
+        if match:
+            kind, store, phase, value = match.groups()
+            (sums if kind == "sum" else counts)[(store, phase)] = float(value)
+    means: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for key, total in sorted(sums.items()):
+        if counts.get(key):
+            means[key[0]][key[1]] = round(total / counts[key] * 1000, 2)
+    return dict(means)
+
+
+def print_report(result: Dict, args):
+    lat = result["latency_ms"]
+    mem = result["memory_kb"]
+    print(f"\n/search · concurrencia {args.concurrency} · {result['duration_s']}s · caché {args.cache}")
+    print(f"  peticiones   {result['requests']} ({result['ok']} ok)  códigos {result['codes']}")
+    print(f"  throughput   {result['throughput_rps']} req/s")
+    print(f"  latencia ms  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}  media {lat['mean']}")
+    print(f"  memoria      RSS {mem['rss_start'] // 1024} → {mem['rss_end'] // 1024} MB (pico {mem['rss_peak'] // 1024} MB)")
+    print("\n  tienda         estados                          fases (ms promedio)")
+    for store in sorted(set(result["stores"]) | set(result["phases_ms"])):
+        statuses = " ".join(f"{k}={v}" for k, v in sorted(result["stores"].get(store, {}).items()))
+        phases = " ".join(f"{k}={v}" for k, v in result["phases_ms"].get(store, {}).items())
+        print(f"  {store:<14} {statuses:<32} {phases}")
+
+
+async def run(args) -> Dict:
+    stub_port, app_port = free_port(), free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = start_stub(stub_port, args)
+        app = start_app(app_port, stub_port, args, tmp)
+        try:
+            await wait_ready(f"http://127.0.0.1:{stub_port}/__stub/stats", stub)
+            await wait_ready(f"http://127.0.0.1:{app_port}/", app)
+            return await drive(f"http://127.0.0.1:{app_port}", args, app.pid)
+        finally:
+            for process in (app, stub):
+                process.terminate()
+            for process in (app, stub):
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=15, help="segundos de carga")
+    parser.add_argument("--cache", choices=("on", "off"), default="off")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--store-latency", action="append", metavar="TIENDA=MS")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--block-rate", type=float, default=0)
+    parser.add_argument("--hang-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guarda el resultado en este archivo")
+    parser.add_argument("-v", "--verbose", action="store_true", help="muestra los logs de la app")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print_report(result, args)
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps({"args": vars(args), **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Micro-benchmark del parseo y filtrado de cada tienda, con línea base.
+
+Mide, sin red y sobre las páginas sintéticas de fixtures/ (ver
+fixtures/README.md) salvo en Falabella, la etapa que corre en el pool de
+parseo de cada fetcher:
+
+    mercadolibre   parse_mercadolibre(html)                   fixtures/mercadolibre_search.html
+    homecenter     parse_homecenter(html)                     fixtures/homecenter_search.html
+    falabella      scan_next_data + parse_falabella            falabella-nextdata-sample.json**
+    alkosto        scan_next_data + parse_alkosto              fixtures/alkosto_search.html
+    exito          parse_exito(json VTEX)                     fixtures/exito_search.json*
+    olimpica       parse_olimpica(json VTEX)                  fixtures/olimpica_search.json*
+
+    * si no existe, la misma respuesta VTEX que sirve bench_stub.py
+    ** el producto real guardado en la raíz del repo, repetido en una página
+       como la que sirve bench_stub.py; si no existe, fixtures/falabella_search.html
+
+Por etapa reporta ops/s (la mejor de `--repeat` rondas de `--seconds`),
+ms por operación y el pico de memoria asignada durante una operación
+(tracemalloc).
+
+Uso (desde backend/):
+    python bench_parsers.py                           # solo muestra
+    python bench_parsers.py --save                    # guarda la línea base
+    python bench_parsers.py --compare                 # falla (exit 1) si algo empeora >15%
+    python bench_parsers.py --compare --threshold 20 --only falabella,exito
+
+La línea base (bench_parsers_baseline.json) depende de la máquina: se
+anota dónde se generó y se avisa al comparar en otra distinta.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import pathlib
+import platform
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+from bench_stub import FALABELLA_SAMPLE, falabella_from_sample, vtex_from_mercadolibre
+from fetch_alkosto import RUNTIME_MARKER, parse_alkosto
+from fetch_exito import parse_exito
+from fetch_falabella import parse_falabella
+from fetch_homecenter import parse_homecenter
+from fetch_mercadolibre import parse_mercadolibre
+from fetch_olimpica import parse_olimpica
+from next_data import scan_next_data
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+BASELINE = pathlib.Path(__file__).parent / "bench_parsers_baseline.json"
+QUERY = "iphone 15"
+
+
+def read_vtex(store: str) -> bytes:
+    saved = FIXTURES / f"{store}_search.json"
+    return saved.read_bytes() if saved.exists() else vtex_from_mercadolibre(store)
+
+
+def read_falabella() -> bytes:
+    if FALABELLA_SAMPLE.exists():
+        return falabella_from_sample(json.loads(FALABELLA_SAMPLE.read_text(encoding="utf-8")))
+    return (FIXTURES / "falabella_search.html").read_bytes()
+
+
+def build_stages(q: str) -> Dict[str, Callable[[], Tuple[List, Counter]]]:
+    """Etapa de cada tienda como una función sin argumentos (los datos ya en memoria)."""
+    ml_html = (FIXTURES / "mercadolibre_search.html").read_text(encoding="utf-8")
+    hc_html = (FIXTURES / "homecenter_search.html").read_text(encoding="utf-8")
+    falabella_page = read_falabella()
+    alkosto_page = (FIXTURES / "alkosto_search.html").read_bytes()
+    exito_json = read_vtex("exito")
+    olimpica_json = read_vtex("olimpica")
+
+    def falabella():
+        return parse_falabella(scan_next_data(falabella_page).payload, q)
+
+    def alkosto():
+        return parse_alkosto(scan_next_data(alkosto_page, markers=[RUNTIME_MARKER]).payload, q)
+
+    return {
+        "mercadolibre": lambda: parse_mercadolibre(ml_html, q),
+        "homecenter": lambda: parse_homecenter(hc_html, q),
+        "falabella": falabella,
+        "alkosto": alkosto,
+        "exito": lambda: parse_exito(exito_json, q),
+        "olimpica": lambda: parse_olimpica(olimpica_json, q),
+    }
+
+
+def time_stage(fn: Callable, seconds: float, repeat: int) -> float:
+    """Mejor ops/s de `repeat` rondas de al menos `seconds` cada una."""
+    fn()  # calentamiento (caché de filtros, imports perezosos)
+    best = 0.0
+    for _ in range(repeat):
+        ops = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            fn()
+            ops += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+        best = max(best, ops / (now - started))
+    return best
+
+
+def measure_memory(fn: Callable) -> float:
+    """KB asignados en el pico de una operación (sobre lo que ya estaba en memoria)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        gc.collect()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round((peak - before) / 1024, 1)
+
+
+def machine() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def run(args) -> Dict[str, Dict]:
+    stages = build_stages(args.query)
+    only = [s for s in args.only.split(",") if s] if args.only else list(stages)
+    results = {}
+    # Los parsers imprimen cada producto descartado: se descarta la salida
+    logging.getLogger("uvicorn.error").setLevel(logging.WARNING)
+    for name in only:
+        if name not in stages:
+            raise SystemExit(f"Etapa desconocida: {name} (opciones: {', '.join(stages)})")
+        fn = stages[name]
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            items = len(fn()[0])
+            ops = time_stage(fn, args.seconds, args.repeat)
+            peak_kb = measure_memory(fn)
+        results[name] = {"ops_per_s": round(ops, 1), "ms_per_op": round(1000 / ops, 3), "items": items,
+                         "peak_kb": peak_kb}
+        print(f"  {name:<13} {ops:>9.1f} ops/s  {1000 / ops:>8.3f} ms  pico {peak_kb:>8.1f} KB  ({items} productos)")
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, threshold: float) -> List[str]:
+    """Etapas que empeoraron más de `threshold` % en ops/s o en pico de memoria."""
+    regressions = []
+    print(f"\n  {'etapa':<13} {'ops/s base':>11} {'actual':>9} {'cambio':>8}   {'pico base':>10} {'actual':>9}")
+    for name, current in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"  {name:<13} sin línea base")
+            continue
+        speed = (current["ops_per_s"] - base["ops_per_s"]) / base["ops_per_s"] * 100
+        memory = ((current["peak_kb"] - base["peak_kb"]) / base["peak_kb"] * 100) if base["peak_kb"] else 0.0
+        flags = []
+        if speed < -threshold:
+            flags.append(f"{-speed:.1f}% más lento")
+        if memory > threshold:
+            flags.append(f"{memory:.1f}% más memoria")
+        if base["items"] != current["items"]:
+            flags.append(f"productos {base['items']} → {current['items']}")
+        print(f"  {name:<13} {base['ops_per_s']:>11.1f} {current['ops_per_s']:>9.1f} {speed:>+7.1f}%   "
+              f"{base['peak_kb']:>10.1f} {current['peak_kb']:>9.1f}  {'REGRESIÓN: ' + ', '.join(flags) if flags else 'ok'}")
+        if flags:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-q", "--query", default=QUERY)
+    parser.add_argument("--only", help="etapas separadas por coma")
+    parser.add_argument("--seconds", type=float, default=0.5, help="duración de cada ronda")
+    parser.add_argument("--repeat", type=int, default=5, help="rondas por etapa (se toma la mejor)")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--save", action="store_true", help="guarda el resultado como línea base")
+    parser.add_argument("--compare", action="store_true", help="compara con la línea base")
+    parser.add_argument("--threshold", type=float, default=15, help="%% de empeoramiento tolerado")
+    args = parser.parse_args()
+
+    print(f"Parseo por tienda, búsqueda '{args.query}'")
+    results = run(args)
+    baseline_path = pathlib.Path(args.baseline)
+
+    if args.compare:
+        if not baseline_path.exists():
+            raise SystemExit(f"No hay línea base en {baseline_path} (generarla con --save)")
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get("query") != args.query:
+            raise SystemExit(f"La línea base es para la búsqueda '{baseline.get('query')}'")
+        if baseline.get("machine") != machine():
+            print("\n  Aviso: la línea base se generó en otra máquina/versión de Python")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegresión en: {', '.join(regressions)} (umbral {args.threshold:g}%)")
+            sys.exit(1)
+        print(f"\nSin regresiones (umbral {args.threshold:g}%)")
+
+    if args.save:
+        data = {"query": args.query, "machine": machine(), "results": results}
+        if baseline_path.exists() and args.only:
+            # Con --only se actualizan solo esas etapas
+            previous = json.loads(baseline_path.read_text())
+            data["results"] = {**previous.get("results", {}), **results}
+        baseline_path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+        print(f"\nLínea base guardada en {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
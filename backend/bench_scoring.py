@@ -0,0 +1,131 @@
+"""
+Equivalencia y benchmark del puntaje de relevancia (scoring.QueryScorer).
+
+Uso (desde backend/):
+    python bench_scoring.py              # 2000 títulos por búsqueda
+    python bench_scoring.py -n 5000 --reps 20
+
+Toma los títulos de las páginas sintéticas de fixtures/ (más variantes
+cortas, de accesorios y reacondicionadas), verifica que `score` y
+`score_many` den exactamente lo mismo que la función original por
+producto -valor y tipo- y luego mide cada variante.
+"""
+import argparse
+import json
+import pathlib
+import time
+
+from html_parsing import extract_homecenter_cards, extract_ml_cards
+from next_data import iter_json_array
+from scoring import QueryScorer
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+QUERIES = [
+    "iphone", "iphone 15 pro", "funda iphone", "televisor samsung 55",
+    "laptop lenovo", "iphone reacondicionado", "tv", "el cargador de la casa",
+]
+
+
+def reference_score(title: str, query: str):
+    """Implementación original de main.calculate_match_score (referencia)."""
+    title_lower = title.lower()
+    query_lower = query.lower()
+    stop_words = ['el', 'la', 'de', 'para', 'con', 'en', 'y', 'un', 'una']
+    query_words = [w for w in query_lower.split() if w not in stop_words and len(w) > 2]
+    if not query_words:
+        return 50
+    score = 0
+    if query_lower in title_lower:
+        score += 50
+    words_in_title = sum(1 for word in query_words if word in title_lower)
+    score += (words_in_title / len(query_words)) * 30
+    first_50_chars = title_lower[:50]
+    words_at_start = sum(1 for word in query_words if word in first_50_chars)
+    score += (words_at_start / len(query_words)) * 20
+    accesorios = ['cable', 'cargador', 'funda', 'estuche', 'protector', 'vidrio',
+                  'mica', 'auricular', 'audífono', 'holder', 'soporte', 'base']
+    if not any(acc in query_lower for acc in accesorios):
+        if any(acc in title_lower for acc in accesorios):
+            score -= 40
+    if 'reacondicionado' not in query_lower and 'reacondicionado' in title_lower:
+        score -= 20
+    if len(title) < 15:
+        score -= 15
+    return max(0, min(100, score))
+
+
+def load_titles(n: int) -> list:
+    """Títulos de los fixtures, repetidos con variantes hasta llegar a `n`."""
+    base = []
+    base += [c["title"] for c in extract_ml_cards((FIXTURES / "mercadolibre_search.html").read_text(), limit=1000)[0]]
+    base += [c["title"] for c in extract_homecenter_cards((FIXTURES / "homecenter_search.html").read_text(), limit=1000)[0]]
+    for name, path, key in [
+        ("falabella_search.html", ("props", "pageProps", "results"), "displayName"),
+        ("alkosto_search.html", ("props", "pageProps", "searchResult", "products"), "productName"),
+    ]:
+        html = (FIXTURES / name).read_text()
+        start = html.index(">", html.index('<script id="__NEXT_DATA__"')) + 1
+        payload = html[start:html.index("</script>", start)]
+        base += [p.get(key, "") for p in iter_json_array(payload, path)]
+    base = [t for t in base if t]
+
+    titles = []
+    variants = [
+        lambda t: t,
+        lambda t: t.upper(),
+        lambda t: f"{t} Reacondicionado",
+        lambda t: f"Funda para {t}",
+        lambda t: t[:12],
+    ]
+    while len(titles) < n:
+        for variant in variants:
+            titles.extend(variant(t) for t in base)
+    return titles[:n]
+
+
+def check(titles: list):
+    for query in QUERIES:
+        expected = [reference_score(t, query) for t in titles]
+        scorer = QueryScorer(query)
+        got = {
+            "score": [scorer.score(t) for t in titles],
+            "score_many": scorer.score_many(titles),
+        }
+        for label, scores in got.items():
+            # json.dumps distingue 100 de 100.0, igual que la respuesta de /search
+            if json.dumps(scores) != json.dumps(expected):
+                raise SystemExit(f"[{query!r}] {label} no coincide con la función original")
+
+
+def bench(fn, reps: int) -> float:
+    """Retorna los ms promedio por llamada."""
+    fn()  # calentamiento
+    started = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - started) * 1000 / reps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=2000, help="títulos por búsqueda")
+    parser.add_argument("--reps", type=int, default=10, help="repeticiones por variante")
+    args = parser.parse_args()
+
+    titles = load_titles(args.n)
+    check(titles)
+    print(f"Equivalencia OK: {len(QUERIES)} búsquedas x {len(titles)} títulos")
+
+    for query in QUERIES[:3]:
+        results = {
+            "original": bench(lambda: [reference_score(t, query) for t in titles], args.reps),
+            # Incluye construir el scorer: es lo que paga cada búsqueda
+            "score_many": bench(lambda: QueryScorer(query).score_many(titles), args.reps),
+        }
+        base = results["original"]
+        print(f"[{query}] " + ", ".join(f"{k} {v:.2f} ms ({base / v:.1f}x)" for k, v in results.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Servidor local que hace de tiendas para los benchmarks de carga (ver bench_load.py).
+
+Responde según el header Host (el que conserva UPSTREAM_OVERRIDE, ver
+http_clients.py) con las páginas sintéticas de fixtures/ (ver fixtures/README.md)
+y, para Falabella, con el producto real guardado en la raíz del repo:
+
+    listado.mercadolibre.com.co   fixtures/mercadolibre_search.html
+    www.falabella.com.co          falabella-nextdata-sample.json  (en __NEXT_DATA__)
+    www.alkosto.com               fixtures/alkosto_search.html
+    www.homecenter.com.co         fixtures/homecenter_search.html
+    www.exito.com                 fixtures/exito_search.json     (VTEX)
+    www.olimpica.com              fixtures/olimpica_search.json  (VTEX)
+
+falabella-nextdata-sample.json es un producto de `props.pageProps.results`
+tal como lo entrega Falabella (lo guarda test-falabella-nextdata.js): la
+página del stub lo repite FALABELLA_RESULTS veces (con productId y url
+distintos) dentro de un <script id="__NEXT_DATA__">. Sin ese archivo se
+usa fixtures/falabella_search.html.
+
+Si no hay respuesta VTEX guardada para Éxito/Olímpica se arma una con los
+títulos y precios de la página de MercadoLibre, con el mismo formato que
+retorna catalog_system/pub/products/search.
+
+Latencia y fallas inyectadas (con --seed reproducibles):
+    --latency-ms / --jitter-ms    demora de cada respuesta
+    --store-latency exito=800     demora propia de una tienda (repetible)
+    --error-rate                  fracción de respuestas 503
+    --block-rate                  fracción de respuestas 403 (página de bloqueo)
+    --hang-rate                   fracción de peticiones que no responden a tiempo
+
+Uso (desde backend/):
+    python bench_stub.py --port 9000 --latency-ms 150 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+from typing import Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from html_parsing import extract_ml_cards
+from http_clients import STORE_HOSTS
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+FALABELLA_SAMPLE = pathlib.Path(__file__).parent.parent / "falabella-nextdata-sample.json"
+# Resultados por página de búsqueda de Falabella
+FALABELLA_RESULTS = 48
+
+HTML_FIXTURES = {
+    "mercadolibre": "mercadolibre_search.html",
+    "falabella": "falabella_search.html",
+    "alkosto": "alkosto_search.html",
+    "homecenter": "homecenter_search.html",
+}
+VTEX_STORES = ("exito", "olimpica")
+
+BLOCK_PAGE = b"<html><body><h1>Access Denied</h1></body></html>"
+HANG_SECONDS = 60
+
+
+def vtex_from_mercadolibre(store: str) -> bytes:
+    """Respuesta VTEX armada con las tarjetas de la página de MercadoLibre."""
+    html = (FIXTURES / HTML_FIXTURES["mercadolibre"]).read_text(encoding="utf-8")
+    cards, _ = extract_ml_cards(html, limit=50)
+    products = []
+    for i, card in enumerate(cards):
+        digits = "".join(filter(str.isdigit, card["price_text"] or ""))
+        products.append({
+            "productName": card["title"],
+            "linkText": f"{store}-producto-{i}",
+            "items": [{
+                "images": [{"imageUrl": card["image"] or ""}],
+                "sellers": [{"commertialOffer": {"Price": float(digits or 0), "AvailableQuantity": 1 + i % 5}}],
+            }],
+        })
+    return json.dumps(products).encode()
+
+
+def falabella_from_sample(sample: dict) -> bytes:
+    """Página de búsqueda de Falabella con el producto guardado repetido en __NEXT_DATA__."""
+    results = []
+    for i in range(FALABELLA_RESULTS):
+        product = dict(sample)
+        product["productId"] = f"{sample['productId']}{i:02d}"
+        product["url"] = f"{sample['url']}?stub={i}"
+        results.append(product)
+    next_data = {"props": {"pageProps": {"results": results}}, "page": "/search", "query": {"Ntt": "stub"}}
+    return (
+        '<!DOCTYPE html><html lang="es-CO"><head><meta charset="utf-8"/><title>Falabella</title></head>'
+        '<body><div id="__next"></div><script id="__NEXT_DATA__" type="application/json">'
+        + json.dumps(next_data, ensure_ascii=False)
+        + "</script></body></html>"
+    ).encode("utf-8")
+
+
+def load_responses() -> Dict[str, Tuple[bytes, str]]:
+    """(cuerpo, content-type) por host."""
+    responses = {}
+    for store, name in HTML_FIXTURES.items():
+        responses[STORE_HOSTS[store]] = ((FIXTURES / name).read_bytes(), "text/html; charset=utf-8")
+    if FALABELLA_SAMPLE.exists():
+        sample = json.loads(FALABELLA_SAMPLE.read_text(encoding="utf-8"))
+        responses[STORE_HOSTS["falabella"]] = (falabella_from_sample(sample), "text/html; charset=utf-8")
+    for store in VTEX_STORES:
+        saved = FIXTURES / f"{store}_search.json"
+        body = saved.read_bytes() if saved.exists() else vtex_from_mercadolibre(store)
+        responses[STORE_HOSTS[store]] = (body, "application/json; charset=utf-8")
+    return responses
+
+
+def parse_store_latency(values) -> Dict[str, float]:
+    """["exito=800"] -> {"www.exito.com": 0.8}"""
+    latencies = {}
+    for value in values or []:
+        store, _, ms = value.partition("=")
+        if store not in STORE_HOSTS or not ms:
+            raise SystemExit(f"--store-latency inválido: {value}")
+        latencies[STORE_HOSTS[store]] = float(ms) / 1000
+    return latencies
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, store_latency: Optional[Dict[str, float]] = None,
+               error_rate: float = 0, block_rate: float = 0, hang_rate: float = 0, seed: int = 0) -> FastAPI:
+    responses = load_responses()
+    store_latency = store_latency or {}
+    rng = random.Random(seed)
+    stub = FastAPI(title="Stub de tiendas")
+    stub.state.served = {}
+
+    @stub.api_route("/{path:path}", methods=["GET", "POST"])
+    async def serve(path: str, request: Request):
+        host = request.headers.get("host", "").split(":")[0]
+        if host not in responses:
+            return Response(f"Host desconocido: {host}", status_code=404)
+        stub.state.served[host] = stub.state.served.get(host, 0) + 1
+
+        delay = store_latency.get(host, latency_ms / 1000) + rng.uniform(0, jitter_ms / 1000)
+        roll = rng.random()
+        if roll < hang_rate:
+            await asyncio.sleep(HANG_SECONDS)
+        elif delay:
+            await asyncio.sleep(delay)
+        roll -= hang_rate
+        if roll < error_rate:
+            return Response("Service Unavailable", status_code=503)
+        roll -= error_rate
+        if roll < block_rate:
+            return Response(BLOCK_PAGE, status_code=403, media_type="text/html")
+        body, content_type = responses[host]
+        return Response(body, media_type=content_type)
+
+    @stub.get("/__stub/stats")
+    def stats():
+        return stub.state.served
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--store-latency", action="append", metavar="TIENDA=MS")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--block-rate", type=float, default=0)
+    parser.add_argument("--hang-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    stub = create_app(args.latency_ms, args.jitter_ms, parse_store_latency(args.store_latency),
+                      args.error_rate, args.block_rate, args.hang_rate, args.seed)
+    uvicorn.run(stub, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
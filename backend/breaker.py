@@ -0,0 +1,168 @@
+"""
+Circuit breakers y timeouts adaptativos por tienda.
+
+Cada tienda tiene un circuito con tres estados:
+
+- cerrado: se consulta normalmente y se anotan los resultados;
+- abierto: la tienda falló demasiado (o respondió un bloqueo) y no se
+  consulta: /search la reporta como "skipped" sin gastar tiempo en ella;
+- medio abierto: pasado el enfriamiento se deja pasar una sola consulta
+  de prueba; si sale bien el circuito se cierra, si no se vuelve a abrir
+  con un enfriamiento el doble de largo (hasta un máximo).
+
+El timeout de cada consulta sale de las latencias observadas de la tienda
+(percentil p95 por un multiplicador, acotado), así una tienda que suele
+responder en 800 ms no puede retener /search por 15 s.
+
+Configuración:
+    BREAKER_WINDOW           resultados recientes que se miran     (por defecto 20)
+    BREAKER_MIN_CALLS        mínimo de resultados para abrir       (por defecto 5)
+    BREAKER_ERROR_RATE       tasa de error que abre el circuito    (por defecto 0.5)
+    BREAKER_OPEN_SECONDS     enfriamiento inicial                  (por defecto 30)
+    BREAKER_MAX_OPEN_SECONDS enfriamiento máximo                   (por defecto 300)
+    BREAKER_BLOCK_SECONDS    enfriamiento tras un bloqueo          (por defecto 120)
+    TIMEOUT_PERCENTILE       percentil de latencia                 (por defecto 95)
+    TIMEOUT_MULTIPLIER       margen sobre ese percentil            (por defecto 2)
+    TIMEOUT_MIN / TIMEOUT_MAX  límites del timeout en segundos     (por defecto 2 / 15)
+    TIMEOUT_MIN_SAMPLES      latencias necesarias para adaptarse   (por defecto 10)
+"""
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Dict
+
+from store_errors import StoreBlocked
+
+logger = logging.getLogger("uvicorn.error")
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "300"))
+BREAKER_BLOCK_SECONDS = float(os.getenv("BREAKER_BLOCK_SECONDS", "120"))
+TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "95"))
+TIMEOUT_MULTIPLIER = float(os.getenv("TIMEOUT_MULTIPLIER", "2"))
+TIMEOUT_MIN = float(os.getenv("TIMEOUT_MIN", "2"))
+TIMEOUT_MAX = float(os.getenv("TIMEOUT_MAX", "15"))
+TIMEOUT_MIN_SAMPLES = int(os.getenv("TIMEOUT_MIN_SAMPLES", "10"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil por rango más cercano de una lista no vacía."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class CircuitBreaker:
+    """Circuito y latencias de una tienda."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._results: deque = deque(maxlen=BREAKER_WINDOW)  # True = falló
+        self._latencies: deque = deque(maxlen=100)
+        self._open_until = 0.0
+        self._open_seconds = BREAKER_OPEN_SECONDS
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+        self.last_error = ""
+
+    def allow(self) -> bool:
+        """True si se puede consultar la tienda ahora."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self._open_until:
+            self.state = HALF_OPEN
+            logger.info(f"[Breaker] {self.name}: medio abierto, se prueba una consulta")
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_in(self) -> float:
+        """Segundos que faltan para volver a probar la tienda."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def timeout(self) -> float:
+        """Timeout para la próxima consulta según las latencias observadas."""
+        if len(self._latencies) < TIMEOUT_MIN_SAMPLES:
+            return TIMEOUT_MAX
+        observed = percentile(self._latencies, TIMEOUT_PERCENTILE) * TIMEOUT_MULTIPLIER
+        return min(TIMEOUT_MAX, max(TIMEOUT_MIN, observed))
+
+    def record_success(self, latency: float):
+        self._latencies.append(latency)
+        if self.state == HALF_OPEN:
+            logger.info(f"[Breaker] {self.name}: cerrado, la tienda volvió a responder")
+            self.state = CLOSED
+            self._results.clear()
+            self._open_seconds = BREAKER_OPEN_SECONDS
+        self._probing = False
+        self._results.append(False)
+
+    def record_failure(self, error: BaseException):
+        self._probing = False
+        self.last_error = str(error)
+        if isinstance(error, StoreBlocked):
+            # Un bloqueo no se arregla reintentando: se abre de inmediato
+            self._open(max(BREAKER_BLOCK_SECONDS, self._open_seconds))
+            return
+        if self.state == HALF_OPEN:
+            # Falló la prueba: otra vez abierto, con el doble de espera
+            self._open(min(BREAKER_MAX_OPEN_SECONDS, self._open_seconds * 2))
+            return
+        self._results.append(True)
+        failures = sum(self._results)
+        if len(self._results) >= BREAKER_MIN_CALLS and failures / len(self._results) >= BREAKER_ERROR_RATE:
+            self._open(self._open_seconds)
+
+    def release(self):
+        """La consulta se canceló sin resultado (p. ej. presupuesto de /search)."""
+        self._probing = False
+
+    def _open(self, seconds: float):
+        self.state = OPEN
+        self._open_seconds = seconds
+        self._open_until = time.monotonic() + seconds
+        self._results.clear()
+        self.opened += 1
+        logger.warning(f"[Breaker] {self.name}: abierto por {seconds:.0f}s ({self.last_error})")
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "retry_in_s": round(self.retry_in(), 1) if self.state == OPEN else 0,
+            "timeout_s": round(self.timeout(), 2),
+            "p50_ms": round(percentile(self._latencies, 50) * 1000) if self._latencies else None,
+            "p95_ms": round(percentile(self._latencies, 95) * 1000) if self._latencies else None,
+            "error_rate": round(sum(self._results) / len(self._results), 2) if self._results else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+class BreakerRegistry:
+    """Un circuito por tienda, creado al primer uso."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, store: str) -> CircuitBreaker:
+        breaker = self._breakers.get(store)
+        if breaker is None:
+            breaker = self._breakers[store] = CircuitBreaker(store)
+        return breaker
+
+    def stats(self) -> Dict[str, Dict]:
+        return {store: breaker.stats() for store, breaker in self._breakers.items()}
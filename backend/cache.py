@@ -0,0 +1,117 @@
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def normalize_query(q: str) -> str:
+    """
+    Normaliza una búsqueda para usarla como llave de caché:
+    minúsculas, sin tildes y con los espacios colapsados.
+
+    "  Televisor   SAMSUNG " y "televisor samsung" comparten llave,
+    igual que "Olímpica" y "olimpica".
+    """
+    q = unicodedata.normalize("NFKD", q.lower())
+    q = "".join(c for c in q if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", q).strip()
+
+
+class TTLCache:
+    """
+    Caché en memoria con tamaño máximo (desalojo LRU) y expiración por entrada.
+
+    Cada `set` puede indicar su propio TTL, así las entradas de tiendas
+    distintas expiran a ritmos distintos dentro del mismo caché.
+
+    Con `stale_ttl` > 0 las entradas vencidas se conservan ese tiempo
+    adicional: `get` ya no las retorna, pero `get_entry` sí (marcadas como
+    viejas) para servir mientras se revalidan en segundo plano.
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl: float = 300.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        # llave -> (valor, vence_en, guardado_en)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor si existe y no ha expirado; si no, None."""
+        entry = self.get_entry(key, allow_stale=False)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: Hashable, allow_stale: bool = True) -> Optional[Tuple[Any, float, bool]]:
+        """
+        Retorna (valor, edad en segundos, vencido) o None si no hay nada
+        que servir. Las entradas vencidas solo se retornan con `allow_stale`
+        y mientras no pase `stale_ttl`.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, stored_at = entry
+        now = time.monotonic()
+        stale = now >= expires_at
+        if stale and now >= expires_at + self.stale_ttl:
+            del self._data[key]
+            self.misses += 1
+            return None
+        if stale and not allow_stale:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return value, now - stored_at, stale
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float, bool]]:
+        """Como get_entry (con vencidas), pero sin contar en las estadísticas ni mover el LRU."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at, stored_at = entry
+        now = time.monotonic()
+        if now >= expires_at + self.stale_ttl:
+            return None
+        return value, now - stored_at, now >= expires_at
+
+    def ttl_left(self, key: Hashable) -> float:
+        """Segundos que le quedan a la entrada (0 si no existe); no cuenta como acierto."""
+        entry = self._data.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[1] - time.monotonic())
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guarda un valor; desaloja el menos usado si se supera maxsize."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.monotonic()
+        self._data[key] = (value, now + ttl, now)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
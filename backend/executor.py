@@ -0,0 +1,99 @@
+"""
+Pool donde se ejecuta el parseo (HTML/JSON) de las respuestas de las tiendas.
+
+La descarga sigue siendo async en el event loop; el parseo, que es CPU
+puro, se envía a un pool para que un HTML grande no bloquee las demás
+búsquedas ni los health checks.
+
+Configuración:
+    PARSE_EXECUTOR = thread | process | inline   (por defecto thread)
+    PARSE_WORKERS  = número de workers            (por defecto, núcleos)
+
+Con "process" las funciones de parseo deben ser de nivel de módulo y sus
+argumentos/resultados serializables con pickle.
+
+El parseo se cronometra dentro del worker (fase "parse"): la espera por un
+worker libre, el pickle y el regreso al event loop van aparte, en la fase
+"parse_queue". Medir todo el await mezclaría las dos con la carga.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+from metrics import record_filtered
+from timings import add, measure
+
+logger = logging.getLogger("uvicorn.error")
+
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# Fases que suma el pool al registro de timings
+PARSE_PHASES = ("parse", "parse_queue")
+
+
+def _timed(fn: Callable[..., Any], *args) -> Tuple[Any, float]:
+    """fn(*args) y los segundos que tardó (corre en el worker)."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class ParseExecutor:
+    """Pool de parseo con ciclo de vida explícito (start/shutdown)."""
+
+    def __init__(self, kind: str = PARSE_EXECUTOR, workers: int = PARSE_WORKERS):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"PARSE_EXECUTOR inválido: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self._pool: Optional[Executor] = None
+
+    def start(self):
+        if self._pool is not None or self.kind == "inline":
+            return
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse")
+        logger.info(f"[Parse] pool {self.kind} con {self.workers} workers")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Ejecuta fn(*args) en el pool y suma su duración a la fase "parse" y
+        la espera hasta tener el resultado a "parse_queue".
+        Sin pool iniciado (p. ej. un fetcher usado desde un script) corre en línea.
+        """
+        if self._pool is None:
+            with measure("parse"):
+                return fn(*args)
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        result, parse_seconds = await loop.run_in_executor(self._pool, partial(_timed, fn, *args))
+        add("parse", parse_seconds)
+        add("parse_queue", max(0.0, time.perf_counter() - submitted - parse_seconds))
+        return result
+
+
+# Pool compartido por todos los fetchers; la app lo inicia y lo cierra
+parse_executor = ParseExecutor()
+
+
+async def run_parser(fn: Callable[..., Any], *args) -> Any:
+    """
+    `parse_executor.run(...)` para los parsers de las tiendas, que retornan
+    (productos, descartados por (tienda, motivo)): los descartes se cuentan
+    aquí, en el proceso principal, y se retornan los productos.
+    """
+    items, discarded = await parse_executor.run(fn, *args)
+    record_filtered(discarded)
+    return items
@@ -1,17 +1,30 @@
 import httpx
 import json
-import re
-from typing import List, Dict
+from collections import Counter
+from typing import List, Optional, Tuple
+from executor import run_parser
+from http_clients import use_client
+from next_data import stream_next_data
+from store_errors import StoreError, StoreTimeout, StoreBlocked
+from timings import measure
+from product import Product
 
-async def fetch_alkosto(q: str) -> List[Dict]:
+RUNTIME_MARKER = b"window.__RUNTIME__"
+
+async def fetch_alkosto(q: str, client: Optional[httpx.AsyncClient] = None) -> List[Product]:
     """
     Obtiene productos desde Alkosto Colombia usando scraping del JSON embebido
     
     Args:
         q: Término de búsqueda
+        client: Cliente HTTP compartido (pool keep-alive); si es None se abre uno temporal
         
     Returns:
-        Lista de productos con formato estandarizado
+        Lista de productos (product.Product)
+        
+    Raises:
+        StoreError: si la tienda falla, responde un bloqueo (StoreBlocked)
+            o no responde a tiempo (StoreTimeout)
     """
     # Alkosto usa parámetro de búsqueda
     url = f"https://www.alkosto.com/buscar?Ntt={q}"
@@ -26,126 +39,121 @@ async def fetch_alkosto(q: str) -> List[Dict]:
     try:
         print(f"[Alkosto] Buscando: {q}")
         
-        async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                print(f"[Alkosto] Error {response.status_code}")
-                return []
-            
-            html = response.text
-            html_size = len(html)
+        async with use_client(client, timeout=15.0, follow_redirects=True) as client:
+            # Descarga en streaming hasta __NEXT_DATA__ (si usan Next.js); de paso
+            # se anota si aparece window.__RUNTIME__ (Alkosto usa VTEX similar a Éxito)
+            with measure("network"):
+                scan = await stream_next_data(client, url, headers, timeout=15.0, markers=[RUNTIME_MARKER])
+            html_size = scan.bytes_read
             print(f"[Alkosto] HTML recibido: {html_size} bytes")
             
-            if html_size < 10000:
-                print("[Alkosto] HTML muy pequeño, posible bloqueo")
+            if scan.payload is None:
+                # Sin __NEXT_DATA__ se descargó la página completa: bytes_read es
+                # su tamaño (con el corte sería solo lo leído hasta el script)
+                if html_size < 10000:
+                    print("[Alkosto] HTML muy pequeño, posible bloqueo")
+                    raise StoreBlocked(f"HTML muy pequeño ({html_size} bytes), posible bloqueo")
+                if RUNTIME_MARKER not in scan.markers:
+                    print("[Alkosto] No se encontró __NEXT_DATA__ ni __RUNTIME__")
+                    raise StoreBlocked("No se encontró __NEXT_DATA__ ni __RUNTIME__")
+                # La estructura de __RUNTIME__ requeriría un análisis más profundo;
+                # por ahora solo se usa para distinguir la página de un bloqueo
+                print("[Alkosto] Encontrado __RUNTIME__ sin __NEXT_DATA__, no se pudieron extraer productos")
                 return []
             
-            # Buscar datos de productos en el HTML (Alkosto usa VTEX similar a Éxito)
-            # Intentar encontrar __RUNTIME__ o datos JSON embebidos
-            products_data = []
+            items = await run_parser(parse_alkosto, scan.payload, q)
+            return items
+            
+    except StoreError:
+        raise
+    except httpx.TimeoutException as e:
+        print("[Alkosto] Timeout en la solicitud")
+        raise StoreTimeout("Timeout en la solicitud") from e
+    except httpx.HTTPError as e:
+        print(f"[Alkosto] Error HTTP: {e}")
+        raise StoreError(f"Error HTTP: {e}") from e
+    except Exception as e:
+        print(f"[Alkosto] Error inesperado: {e}")
+        raise StoreError(f"Error inesperado: {e}") from e
+
+
+def parse_alkosto(payload: bytearray, q: str) -> Tuple[List[Product], Counter]:
+    """
+    Decodifica los productos de __NEXT_DATA__ de Alkosto (formato VTEX).
+    Es CPU puro: se ejecuta en el pool de parseo (ver executor.py).
+    Retorna los productos y los descartados por (tienda, motivo).
+    
+    Raises:
+        StoreError: si el JSON embebido no se puede decodificar
+    """
+    try:
+        next_data = json.loads(payload)
+        productos = next_data.get("props", {}).get("pageProps", {}).get("products", [])
+        if not productos:
+            # Intentar otras rutas comunes
+            productos = next_data.get("props", {}).get("pageProps", {}).get("searchResult", {}).get("products", [])
+        products_data = productos
+        print(f"[Alkosto] Productos encontrados en __NEXT_DATA__: {len(products_data)}")
+    except json.JSONDecodeError as e:
+        print(f"[Alkosto] Error parseando __NEXT_DATA__: {e}")
+        raise StoreError(f"Error parseando __NEXT_DATA__: {e}") from e
+    
+    if not products_data:
+        print("[Alkosto] No se pudieron extraer productos del HTML")
+        return [], Counter()
+    
+    discarded = Counter()
+    items = []
+    
+    for product in products_data[:10]:  # Limitar a 10
+        try:
+            # Extraer título
+            titulo = product.get("productName") or product.get("name") or ""
+            if not titulo or len(titulo) < 5:
+                continue
             
-            # Patrón 1: Buscar window.__RUNTIME__ 
-            runtime_match = re.search(r'window\.__RUNTIME__\s*=\s*({.*?});?\s*</script>', html, re.DOTALL)
-            if runtime_match:
-                try:
-                    runtime_data = json.loads(runtime_match.group(1))
-                    # Navegar por la estructura para encontrar productos
-                    # La estructura varía, pero típicamente está en route.context o similar
-                    print("[Alkosto] Encontrado __RUNTIME__, parseando...")
-                    # Esto requeriría análisis más profundo de la estructura específica de Alkosto
-                except json.JSONDecodeError:
-                    pass
+            # Extraer precio
+            precio = 0
+            # Intentar múltiples ubicaciones comunes para el precio
+            if "items" in product and product["items"]:
+                first_item = product["items"][0]
+                if "sellers" in first_item and first_item["sellers"]:
+                    offer = first_item["sellers"][0].get("commertialOffer", {})
+                    precio = offer.get("Price", 0)
             
-            # Patrón 2: Buscar __NEXT_DATA__ (si usan Next.js)
-            next_data_match = re.search(
-                r'<script id="__NEXT_DATA__" type="application/json">([\s\S]*?)</script>',
-                html
-            )
+            if precio == 0 and "price" in product:
+                precio = product["price"]
             
-            if next_data_match:
-                try:
-                    next_data = json.loads(next_data_match.group(1))
-                    productos = next_data.get("props", {}).get("pageProps", {}).get("products", [])
-                    if not productos:
-                        # Intentar otras rutas comunes
-                        productos = next_data.get("props", {}).get("pageProps", {}).get("searchResult", {}).get("products", [])
-                    products_data = productos
-                    print(f"[Alkosto] Productos encontrados en __NEXT_DATA__: {len(products_data)}")
-                except json.JSONDecodeError as e:
-                    print(f"[Alkosto] Error parseando __NEXT_DATA__: {e}")
+            if precio == 0:
+                continue
             
-            if not products_data:
-                print("[Alkosto] No se pudieron extraer productos del HTML")
-                return []
+            # Construir URL
+            link_text = product.get("linkText", "")
+            if link_text:
+                product_url = f"https://www.alkosto.com/{link_text}/p"
+            else:
+                product_id = product.get("productId") or product.get("id", "")
+                product_url = f"https://www.alkosto.com/p/{product_id}" if product_id else ""
             
-            items = []
+            if not product_url:
+                continue
             
-            for product in products_data[:10]:  # Limitar a 10
-                try:
-                    # Extraer título
-                    titulo = product.get("productName") or product.get("name") or ""
-                    if not titulo or len(titulo) < 5:
-                        continue
-                    
-                    # Extraer precio
-                    precio = 0
-                    # Intentar múltiples ubicaciones comunes para el precio
-                    if "items" in product and product["items"]:
-                        first_item = product["items"][0]
-                        if "sellers" in first_item and first_item["sellers"]:
-                            offer = first_item["sellers"][0].get("commertialOffer", {})
-                            precio = offer.get("Price", 0)
-                    
-                    if precio == 0 and "price" in product:
-                        precio = product["price"]
-                    
-                    if precio == 0:
-                        continue
-                    
-                    # Construir URL
-                    link_text = product.get("linkText", "")
-                    if link_text:
-                        product_url = f"https://www.alkosto.com/{link_text}/p"
-                    else:
-                        product_id = product.get("productId") or product.get("id", "")
-                        product_url = f"https://www.alkosto.com/p/{product_id}" if product_id else ""
-                    
-                    if not product_url:
-                        continue
-                    
-                    # Extraer imagen
-                    imagen = ""
-                    if "items" in product and product["items"]:
-                        images = product["items"][0].get("images", [])
-                        if images:
-                            imagen = images[0].get("imageUrl", "")
-                    
-                    if not imagen and "image" in product:
-                        imagen = product["image"]
-                    
-                    items.append({
-                        "title": titulo,
-                        "price": float(precio),
-                        "currency": "COP",
-                        "url": product_url,
-                        "thumbnail": imagen,
-                        "source": "Alkosto"
-                    })
-                    
-                except (KeyError, IndexError, TypeError, ValueError) as e:
-                    print(f"[Alkosto] Error parseando producto: {e}")
-                    continue
+            # Extraer imagen
+            imagen = ""
+            if "items" in product and product["items"]:
+                images = product["items"][0].get("images", [])
+                if images:
+                    imagen = images[0].get("imageUrl", "")
             
-            print(f"[Alkosto] Productos válidos encontrados: {len(items)}")
-            return items
+            if not imagen and "image" in product:
+                imagen = product["image"]
             
-    except httpx.TimeoutException:
-        print("[Alkosto] Timeout en la solicitud")
-        return []
-    except httpx.HTTPError as e:
-        print(f"[Alkosto] Error HTTP: {e}")
-        return []
-    except Exception as e:
-        print(f"[Alkosto] Error inesperado: {e}")
-        return []
+            items.append(Product(titulo, precio, product_url, imagen, "alkosto"))
+        
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"[Alkosto] Error parseando producto: {e}")
+            discarded["alkosto", "parse_error"] += 1
+            continue
+    
+    print(f"[Alkosto] Productos válidos encontrados: {len(items)}")
+    return items, discarded
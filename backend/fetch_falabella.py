@@ -1,17 +1,28 @@
 import httpx
-import json
-import re
-from typing import List, Dict
+from collections import Counter
+from typing import List, Optional, Tuple
+from executor import run_parser
+from filters import ACCESORIOS_FALABELLA, MODELOS_FUTUROS, query_filter
+from http_clients import use_client
+from next_data import iter_json_array, stream_next_data
+from store_errors import StoreError, StoreTimeout, StoreBlocked
+from timings import measure
+from product import Product
 
-async def fetch_falabella(q: str) -> List[Dict]:
+async def fetch_falabella(q: str, client: Optional[httpx.AsyncClient] = None) -> List[Product]:
     """
     Obtiene productos desde Falabella Colombia usando scraping del JSON embebido
     
     Args:
         q: Término de búsqueda
+        client: Cliente HTTP compartido (pool keep-alive); si es None se abre uno temporal
         
     Returns:
-        Lista de productos con formato estandarizado
+        Lista de productos (product.Product)
+        
+    Raises:
+        StoreError: si la tienda falla, responde un bloqueo (StoreBlocked)
+            o no responde a tiempo (StoreTimeout)
     """
     url = f"https://www.falabella.com.co/falabella-co/search?Ntt={q}"
     
@@ -25,154 +36,144 @@ async def fetch_falabella(q: str) -> List[Dict]:
     try:
         print(f"[Falabella] Buscando: {q}")
         
-        async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                print(f"[Falabella] Error {response.status_code}")
-                return []
-            
-            html = response.text
-            html_size = len(html)
-            print(f"[Falabella] HTML recibido: {html_size} bytes")
-            
-            if html_size < 50000:
-                print("[Falabella] HTML muy pequeño, posible bloqueo")
-                return []
-            
+        async with use_client(client, timeout=15.0, follow_redirects=True) as client:
             # Extraer __NEXT_DATA__ que contiene información precisa de disponibilidad
-            next_data_match = re.search(
-                r'<script id="__NEXT_DATA__" type="application/json">([\s\S]*?)</script>',
-                html
-            )
+            # (la descarga se corta apenas se cierra el script)
+            with measure("network"):
+                scan = await stream_next_data(client, url, headers, timeout=15.0)
+            html_size = scan.bytes_read
+            print(f"[Falabella] HTML recibido: {html_size} bytes")
             
-            if not next_data_match:
+            if scan.payload is None:
+                # Sin __NEXT_DATA__ se descargó la página completa: bytes_read es
+                # su tamaño (con el corte sería solo lo leído hasta el script)
+                if html_size < 50000:
+                    print("[Falabella] HTML muy pequeño, posible bloqueo")
+                    raise StoreBlocked(f"HTML muy pequeño ({html_size} bytes), posible bloqueo")
                 print("[Falabella] No se encontró __NEXT_DATA__")
-                return []
-            
-            next_data = json.loads(next_data_match.group(1))
-            productos = next_data.get("props", {}).get("pageProps", {}).get("results", [])
-            
-            print(f"[Falabella] Productos encontrados en JSON: {len(productos)}")
-            
-            items = []
-            modelos_futuros = [
-                'iphone 17', 'iphone air', 'iphone 16e',
-                'iphone 18', 'iphone 19', 'iphone 20'
-            ]
+                raise StoreBlocked("No se encontró __NEXT_DATA__")
             
-            for product in productos:
-                try:
-                    # Limitar a 10 productos válidos
-                    if len(items) >= 10:
-                        break
-                    
-                    # Título
-                    titulo = product.get("displayName", "")
-                    if not titulo or len(titulo) < 10:
-                        continue
-        
-                    # FILTRO 0: Excluir accesorios genéricos si no son parte de la búsqueda
-                    titulo_lower = titulo.lower()
-                    query_lower = q.lower()
-                    accesorios_excluidos = [
-                        'cable', 'cargador', 'funda', 'estuche', 'protector',
-                        'vidrio templado', 'mica', 'soporte', 'holder', 'base'
-                    ]
-        
-                    es_accesorio = any(acc in titulo_lower for acc in accesorios_excluidos)
-                    busca_accesorio = any(acc in query_lower for acc in accesorios_excluidos)
-        
-                    if es_accesorio and not busca_accesorio:
-                        print(f"[Falabella] Accesorio excluido: {titulo[:50]}")
-                        continue
-
-                    # FILTRO 1: Verificar disponibilidad real usando variants
-                    variants = product.get("variants", [])
-                    tiene_variante_disponible = False
-                    
-                    for variant in variants:
-                        options = variant.get("options", [])
-                        for option in options:
-                            # Verificar si es comprable
-                            if option.get("isPurchaseable") is True:
-                                tiene_variante_disponible = True
-                                break
-                            # O si tiene al menos una talla disponible
-                            sizes = option.get("sizes", [])
-                            if any(size.get("available") is True for size in sizes):
-                                tiene_variante_disponible = True
-                                break
-                        if tiene_variante_disponible:
-                            break
-                    
-                    if not tiene_variante_disponible:
-                        print(f"[Falabella] Producto omitido (sin stock): {titulo[:50]}")
-                        continue
-                    
-                    # FILTRO 2: Excluir modelos futuros/ficticios
-                    titulo_lower = titulo.lower()
-                    if any(modelo in titulo_lower for modelo in modelos_futuros):
-                        print(f"[Falabella] Producto omitido (modelo futuro): {titulo[:50]}")
-                        continue
-                    
-                    # URL
-                    product_url = product.get("url", "")
-                    if not product_url:
-                        continue
-                    
-                    # Precio - del array de precios
-                    prices = product.get("prices", [])
-                    main_price = None
-                    for p in prices:
-                        if p.get("type") == "internetPrice":
-                            main_price = p
-                            break
-                    if not main_price and prices:
-                        main_price = prices[0]
-                    
-                    if not main_price or not main_price.get("price"):
-                        continue
-                    
-                    precio_text = main_price["price"][0] if isinstance(main_price["price"], list) else str(main_price["price"])
-                    precio_text = precio_text.replace("$", "").replace(".", "").replace(",", "")
-                    
-                    try:
-                        precio = float(precio_text)
-                    except ValueError:
-                        continue
-                    
-                    if precio == 0:
-                        continue
-                    
-                    # Imagen - del array de mediaUrls
-                    media_urls = product.get("mediaUrls", [])
-                    imagen = media_urls[0] if media_urls else ""
-                    if imagen and not imagen.startswith("http"):
-                        imagen = f"https://media.falabella.com.co{imagen}"
-                    
-                    items.append({
-                        "title": titulo,
-                        "price": precio,
-                        "currency": "COP",
-                        "url": product_url,
-                        "thumbnail": imagen,
-                        "source": "Falabella"
-                    })
-                    
-                except (KeyError, IndexError, TypeError, ValueError) as e:
-                    print(f"[Falabella] Error parseando producto: {e}")
-                    continue
-            
-            print(f"[Falabella] Productos encontrados: {len(items)}")
+            items = await run_parser(parse_falabella, scan.payload, q)
             return items
             
-    except httpx.TimeoutException:
+    except StoreError:
+        raise
+    except httpx.TimeoutException as e:
         print("[Falabella] Timeout en la solicitud")
-        return []
+        raise StoreTimeout("Timeout en la solicitud") from e
     except httpx.HTTPError as e:
         print(f"[Falabella] Error HTTP: {e}")
-        return []
+        raise StoreError(f"Error HTTP: {e}") from e
     except Exception as e:
         print(f"[Falabella] Error inesperado: {e}")
-        return []
+        raise StoreError(f"Error inesperado: {e}") from e
+
+
+def parse_falabella(payload: bytearray, q: str) -> Tuple[List[Product], Counter]:
+    """
+    Decodifica los productos de __NEXT_DATA__ de Falabella y aplica los filtros.
+    Es CPU puro: se ejecuta en el pool de parseo (ver executor.py).
+    Retorna los productos y los descartados por (tienda, motivo).
+    """
+    # Decodifica props.pageProps.results producto a producto: al llegar a
+    # 10 válidos se deja de parsear el resto del JSON
+    productos = iter_json_array(payload, ("props", "pageProps", "results"))
+    revisados = 0
+    qf = query_filter(q)
+    discarded = Counter()
+    
+    items = []
+    
+    for product in productos:
+        revisados += 1
+        try:
+            # Título
+            titulo = product.get("displayName", "")
+            if not titulo or len(titulo) < 10:
+                continue
+            
+            # FILTRO 0: Excluir accesorios genéricos si no son parte de la búsqueda
+            titulo_lower = titulo.lower()
+            if qf.excluye_accesorio(titulo_lower, ACCESORIOS_FALABELLA):
+                print(f"[Falabella] Accesorio excluido: {titulo[:50]}")
+                discarded["falabella", "accessory"] += 1
+                continue
+            
+            # FILTRO 1: Verificar disponibilidad real usando variants
+            variants = product.get("variants", [])
+            tiene_variante_disponible = False
+            
+            for variant in variants:
+                options = variant.get("options", [])
+                for option in options:
+                    # Verificar si es comprable
+                    if option.get("isPurchaseable") is True:
+                        tiene_variante_disponible = True
+                        break
+                    # O si tiene al menos una talla disponible
+                    sizes = option.get("sizes", [])
+                    if any(size.get("available") is True for size in sizes):
+                        tiene_variante_disponible = True
+                        break
+                if tiene_variante_disponible:
+                    break
+            
+            if not tiene_variante_disponible:
+                print(f"[Falabella] Producto omitido (sin stock): {titulo[:50]}")
+                discarded["falabella", "out_of_stock"] += 1
+                continue
+            
+            # FILTRO 2: Excluir modelos futuros/ficticios
+            if MODELOS_FUTUROS.matches(titulo_lower):
+                print(f"[Falabella] Producto omitido (modelo futuro): {titulo[:50]}")
+                discarded["falabella", "future_model"] += 1
+                continue
+            
+            # URL
+            product_url = product.get("url", "")
+            if not product_url:
+                continue
+            
+            # Precio - del array de precios
+            prices = product.get("prices", [])
+            main_price = None
+            for p in prices:
+                if p.get("type") == "internetPrice":
+                    main_price = p
+                    break
+            if not main_price and prices:
+                main_price = prices[0]
+            
+            if not main_price or not main_price.get("price"):
+                continue
+            
+            precio_text = main_price["price"][0] if isinstance(main_price["price"], list) else str(main_price["price"])
+            precio_text = precio_text.replace("$", "").replace(".", "").replace(",", "")
+            
+            try:
+                precio = float(precio_text)
+            except ValueError:
+                continue
+            
+            if precio == 0:
+                continue
+            
+            # Imagen - del array de mediaUrls
+            media_urls = product.get("mediaUrls", [])
+            imagen = media_urls[0] if media_urls else ""
+            if imagen and not imagen.startswith("http"):
+                imagen = f"https://media.falabella.com.co{imagen}"
+            
+            items.append(Product(titulo, precio, product_url, imagen, "falabella"))
+            
+            # Limitar a 10 productos válidos (no se decodifica el siguiente)
+            if len(items) >= 10:
+                break
+        
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"[Falabella] Error parseando producto: {e}")
+            discarded["falabella", "parse_error"] += 1
+            continue
+    
+    print(f"[Falabella] Productos encontrados: {len(items)} (revisados en JSON: {revisados})")
+    return items, discarded
@@ -0,0 +1,118 @@
+import httpx
+import logging
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+from executor import run_parser
+from filters import ACCESORIOS_MERCADOLIBRE, query_filter
+from html_parsing import extract_ml_cards
+from http_clients import use_client
+from store_errors import StoreError, StoreTimeout
+from timings import measure
+from product import Product
+
+logger = logging.getLogger("uvicorn.error")
+
+async def fetch_mercadolibre(q: str, client: Optional[httpx.AsyncClient] = None) -> List[Product]:
+    """
+    Obtiene productos desde MercadoLibre Colombia (MCO) usando scraping HTML
+    
+    La API de MercadoLibre bloquea requests, usamos scraping de la web pública.
+    
+    Args:
+        q: Término de búsqueda
+        client: Cliente HTTP compartido (pool keep-alive); si es None se abre uno temporal
+        
+    Returns:
+        Lista de productos (product.Product)
+        
+    Raises:
+        StoreError: si la tienda falla o no responde a tiempo (StoreTimeout)
+    """
+    url = f"https://listado.mercadolibre.com.co/{q.replace(' ', '-')}"
+    
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "es-CO,es;q=0.9",
+        "Referer": "https://www.mercadolibre.com.co/"
+    }
+    
+    try:
+        async with use_client(client, timeout=15, follow_redirects=True) as client:
+            with measure("network"):
+                r = await client.get(url, headers=headers, timeout=15)
+            logger.info(f"[ML MCO] Status: {r.status_code}")
+            if r.status_code != 200:
+                logger.error(f"[ML MCO] Error {r.status_code}")
+                raise StoreError(f"HTTP {r.status_code}")
+            
+            items = await run_parser(parse_mercadolibre, r.text, q)
+            return items
+            
+    except StoreError:
+        raise
+    except httpx.TimeoutException as e:
+        logger.error("[ML MCO] Timeout en la solicitud")
+        raise StoreTimeout("Timeout en la solicitud") from e
+    except Exception as e:
+        logger.error(f"[ML MCO] Error en scraping: {e}")
+        raise StoreError(f"Error en scraping: {e}") from e
+
+
+def parse_mercadolibre(html: str, q: str) -> Tuple[List[Product], Counter]:
+    """
+    Extrae los productos del HTML de resultados de MercadoLibre y aplica los filtros.
+    Es CPU puro: se ejecuta en el pool de parseo (ver executor.py).
+    Retorna los productos y los descartados por (tienda, motivo).
+    """
+    qf = query_filter(q)
+    discarded = Counter()
+    items = []
+    
+    # Buscar productos en el HTML (excluye intervenciones/anuncios)
+    productos, total = extract_ml_cards(html, limit=10)
+    logger.info(f"[ML MCO] Productos encontrados: {len(productos)} (total: {total})")
+    
+    for prod in productos:
+        try:
+            # Enlace principal del producto
+            if prod["href"] is None:
+                continue
+            
+            # Título (del texto del enlace)
+            titulo = prod["title"]
+            if not titulo or len(titulo) < 10:
+                continue
+            
+            # FILTRO: Excluir accesorios genéricos
+            titulo_lower = titulo.lower()
+            
+            # Si es accesorio y el título SOLO menciona el producto como compatibilidad
+            # (ninguna palabra de la búsqueda al inicio), excluir
+            if ACCESORIOS_MERCADOLIBRE.matches(titulo_lower) and not qf.menciona_al_inicio(titulo_lower):
+                logger.info(f"[ML MCO] Accesorio excluido: {titulo[:50]}")
+                discarded["mercadolibre", "accessory"] += 1
+                continue
+            
+            # URL
+            url_producto = prod["href"]
+            
+            # Precio
+            precio = 0.0
+            if prod["price_text"] is not None:
+                precio_text = prod["price_text"].replace('.', '').replace(',', '.')
+                precio = float(re.sub(r'[^\d.]', '', precio_text))
+            
+            # Imagen
+            imagen = prod["image"]
+            
+            if titulo and precio > 0:
+                items.append(Product(titulo, precio, url_producto, imagen, "mercadolibre"))
+        except Exception as e:
+            logger.warning(f"[ML MCO] Error parseando producto: {e}")
+            discarded["mercadolibre", "parse_error"] += 1
+            continue
+    
+    logger.info(f"[ML MCO] resultados: {len(items)}")
+    return items, discarded
@@ -1,15 +1,28 @@
 import httpx
-from typing import List, Dict
+import json
+from collections import Counter
+from typing import List, Optional, Tuple
+from executor import run_parser
+from filters import ACCESORIOS_OLIMPICA, query_filter
+from http_clients import use_client
+from store_errors import StoreError, StoreTimeout
+from timings import measure
+from product import Product
 
-async def fetch_olimpica(q: str) -> List[Dict]:
+async def fetch_olimpica(q: str, client: Optional[httpx.AsyncClient] = None) -> List[Product]:
     """
     Obtiene productos desde la API pública VTEX de Olímpica Colombia
     
     Args:
         q: Término de búsqueda
+        client: Cliente HTTP compartido (pool keep-alive); si es None se abre uno temporal
         
     Returns:
-        Lista de productos con formato estandarizado
+        Lista de productos (product.Product)
+        
+    Raises:
+        StoreError: si la tienda falla, responde un bloqueo (StoreBlocked)
+            o no responde a tiempo (StoreTimeout)
     """
     url = f"https://www.olimpica.com/api/catalog_system/pub/products/search?ft={q}"
     
@@ -21,94 +34,102 @@ async def fetch_olimpica(q: str) -> List[Dict]:
     }
     
     try:
-        async with httpx.AsyncClient(timeout=12.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=headers)
+        async with use_client(client, timeout=12.0, follow_redirects=True) as client:
+            with measure("network"):
+                response = await client.get(url, headers=headers, timeout=12.0)
             
             # Olímpica puede devolver 206 (Partial Content) como Éxito
             if response.status_code not in (200, 206):
                 print(f"[Olímpica] Error {response.status_code}")
-                return []
-            
-            data = response.json()
-            
-            if not isinstance(data, list):
-                print(f"[Olímpica] Respuesta no es un array")
-                return []
+                raise StoreError(f"HTTP {response.status_code}")
             
-            products = []
-            
-            for item in data[:10]:  # Limitar a 10 productos
-                try:
-                    # Extraer datos del producto
-                    product_name = item.get("productName", "")
-                    link_text = item.get("linkText", "")
-                    
-                    if not product_name or not link_text:
-                        continue
-                    
-                    # FILTRO: Excluir accesorios genéricos
-                    product_lower = product_name.lower()
-                    accesorios_excluidos = [
-                        'cable', 'cargador', 'funda', 'estuche', 'protector',
-                        'vidrio', 'mica', 'soporte', 'control remoto', 'teclado mouse',
-                        'mini teclado', 'holder', 'base',
-                        'mesa tv', 'mueble para tv', 'rack tv'
-                    ]
-                    
-                    if any(acc in product_lower for acc in accesorios_excluidos):
-                        # Verificar si la búsqueda es específicamente por el accesorio
-                        query_lower = q.lower()
-                        if not any(acc in query_lower for acc in accesorios_excluidos):
-                            print(f"[Olímpica] Accesorio excluido: {product_name[:50]}")
-                            continue
-                    
-                    # Construir URL del producto
-                    permalink = f"https://www.olimpica.com/{link_text}/p"
-                    
-                    # Extraer precio del primer seller
-                    items_list = item.get("items", [])
-                    if not items_list:
-                        continue
-                    
-                    first_item = items_list[0]
-                    sellers = first_item.get("sellers", [])
-                    if not sellers:
-                        continue
-                    
-                    commercial_offer = sellers[0].get("commertialOffer", {})
-                    price = commercial_offer.get("Price", 0)
-                    
-                    # Verificar disponibilidad
-                    available_quantity = commercial_offer.get("AvailableQuantity", 0)
-                    if price == 0 or available_quantity == 0:
-                        continue
-                    
-                    # Extraer imagen
-                    images = first_item.get("images", [])
-                    thumbnail = images[0].get("imageUrl", "") if images else ""
-                    
-                    products.append({
-                        "title": product_name,
-                        "price": float(price),
-                        "currency": "COP",
-                        "url": permalink,
-                        "thumbnail": thumbnail,
-                        "source": "Olímpica"
-                    })
-                    
-                except (KeyError, IndexError, TypeError) as e:
-                    print(f"[Olímpica] Error parseando producto: {e}")
-                    continue
+            products = await run_parser(parse_olimpica, response.content, q)
             
             print(f"[Olímpica] Productos encontrados: {len(products)}")
             return products
             
-    except httpx.TimeoutException:
+    except StoreError:
+        raise
+    except httpx.TimeoutException as e:
         print("[Olímpica] Timeout en la solicitud")
-        return []
+        raise StoreTimeout("Timeout en la solicitud") from e
     except httpx.HTTPError as e:
         print(f"[Olímpica] Error HTTP: {e}")
-        return []
+        raise StoreError(f"Error HTTP: {e}") from e
     except Exception as e:
         print(f"[Olímpica] Error inesperado: {e}")
-        return []
+        raise StoreError(f"Error inesperado: {e}") from e
+
+
+def parse_olimpica(payload: bytes, q: str) -> Tuple[List[Product], Counter]:
+    """
+    Parsea la respuesta JSON (VTEX) de Olímpica y aplica los filtros.
+    Es CPU puro: se ejecuta en el pool de parseo (ver executor.py).
+    Retorna los productos y los descartados por (tienda, motivo).
+    
+    Raises:
+        StoreError: si la respuesta no es un array de productos
+    """
+    data = json.loads(payload)
+    
+    if not isinstance(data, list):
+        print(f"[Olímpica] Respuesta no es un array")
+        raise StoreError("Respuesta no es un array")
+    
+    qf = query_filter(q)
+    discarded = Counter()
+    products = []
+    
+    for item in data[:10]:  # Limitar a 10 productos
+        try:
+            # Extraer datos del producto
+            product_name = item.get("productName", "")
+            link_text = item.get("linkText", "")
+            
+            if not product_name or not link_text:
+                continue
+            
+            # FILTRO: Excluir accesorios genéricos (salvo que la búsqueda
+            # sea específicamente por el accesorio)
+            product_lower = product_name.lower()
+            if qf.excluye_accesorio(product_lower, ACCESORIOS_OLIMPICA):
+                print(f"[Olímpica] Accesorio excluido: {product_name[:50]}")
+                discarded["olimpica", "accessory"] += 1
+                continue
+            
+            # Construir URL del producto
+            permalink = f"https://www.olimpica.com/{link_text}/p"
+            
+            # Extraer precio del primer seller
+            items_list = item.get("items", [])
+            if not items_list:
+                continue
+            
+            first_item = items_list[0]
+            sellers = first_item.get("sellers", [])
+            if not sellers:
+                continue
+            
+            commercial_offer = sellers[0].get("commertialOffer", {})
+            price = commercial_offer.get("Price", 0)
+            
+            # Verificar disponibilidad
+            available_quantity = commercial_offer.get("AvailableQuantity", 0)
+            if price == 0:
+                continue
+            if available_quantity == 0:
+                discarded["olimpica", "out_of_stock"] += 1
+                continue
+            
+            # Extraer imagen
+            images = first_item.get("images", [])
+            thumbnail = images[0].get("imageUrl", "") if images else ""
+            
+            products.append(Product(product_name, price, permalink, thumbnail, "olimpica"))
+        
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"[Olímpica] Error parseando producto: {e}")
+            discarded["olimpica", "parse_error"] += 1
+            continue
+    
+    return products, discarded
@@ -0,0 +1,136 @@
+"""
+Filtros de relevancia compartidos por los fetchers y el puntaje de /search.
+
+Cada lista de términos (accesorios de cada tienda, reacondicionados,
+modelos futuros) se compila una sola vez en un regex de alternativas, así
+revisar un título es una sola pasada en C en lugar de un `any(t in titulo
+for t in lista)` por término. La semántica es la misma: coincidencia por
+subcadena sobre el texto en minúsculas.
+
+Lo que depende solo de la búsqueda (si la búsqueda ya es de un accesorio,
+la palabra principal, las palabras clave) se calcula una vez por consulta
+en `QueryFilter` y no una vez por producto.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+
+class TermMatcher:
+    """Conjunto de términos compilado en un único regex de alternativas."""
+
+    def __init__(self, terms: Sequence[str]):
+        self.terms = tuple(terms)
+        # Los más largos primero para que search() reporte el término completo
+        ordered = sorted(set(self.terms), key=len, reverse=True)
+        self._regex = re.compile("|".join(re.escape(t) for t in ordered))
+
+    def matches(self, text: str) -> bool:
+        """Equivale a any(t in text for t in terms)."""
+        return self._regex.search(text) is not None
+
+    def search(self, text: str) -> Optional[str]:
+        """Primer término que aparece en el texto (para logs)."""
+        found = self._regex.search(text)
+        return found.group(0) if found else None
+
+
+# -----------------------------
+# Accesorios excluidos por tienda
+# -----------------------------
+ACCESORIOS_FALABELLA = TermMatcher([
+    'cable', 'cargador', 'funda', 'estuche', 'protector',
+    'vidrio templado', 'mica', 'soporte', 'holder', 'base'
+])
+
+ACCESORIOS_EXITO = TermMatcher([
+    'cable', 'cargador', 'funda', 'estuche', 'protector', 'forro',
+    'vidrio', 'mica', 'soporte', 'holder', 'base',
+    'memoria stick', 'usb', 'auricular', 'audífono',
+    'mesa tv', 'mueble para tv', 'rack tv', 'centro de entretenimiento'
+])
+
+ACCESORIOS_OLIMPICA = TermMatcher([
+    'cable', 'cargador', 'funda', 'estuche', 'protector',
+    'vidrio', 'mica', 'soporte', 'control remoto', 'teclado mouse',
+    'mini teclado', 'holder', 'base',
+    'mesa tv', 'mueble para tv', 'rack tv'
+])
+
+ACCESORIOS_HOMECENTER = TermMatcher([
+    'micrófono', 'microfono', 'soporte', 'cable', 'cargador',
+    'funda', 'estuche', 'protector', 'vidrio', 'mica',
+    'radio carro', 'radio para', 'pantalla carro',
+    'adaptador', 'auricular genérico', 'manos libres',
+    'holder', 'base', 'stand', 'tripode'
+])
+
+ACCESORIOS_MERCADOLIBRE = TermMatcher([
+    'cable', 'cargador', 'funda', 'estuche', 'protector',
+    'vidrio', 'mica', 'auricular', 'audífono',
+    'soporte', 'holder', 'base', 'tripode',
+    'batería externa', 'power bank', 'adaptador'
+])
+
+# Accesorios que penalizan el puntaje de coincidencia (ver scoring.QueryScorer)
+ACCESORIOS_PUNTAJE = TermMatcher([
+    'cable', 'cargador', 'funda', 'estuche', 'protector', 'vidrio',
+    'mica', 'auricular', 'audífono', 'holder', 'soporte', 'base'
+])
+
+# -----------------------------
+# Otros términos
+# -----------------------------
+REACONDICIONADO = 'reacondicionado'
+
+# Modelos futuros/ficticios que aparecen en Falabella
+MODELOS_FUTUROS = TermMatcher([
+    'iphone 17', 'iphone air', 'iphone 16e',
+    'iphone 18', 'iphone 19', 'iphone 20'
+])
+
+STOP_WORDS = ['el', 'la', 'de', 'para', 'con', 'en', 'y', 'un', 'una']
+
+
+class QueryFilter:
+    """
+    Decisiones que dependen solo de la búsqueda, calculadas una vez.
+
+    Se obtiene con `query_filter(q)`, que la guarda en caché por consulta:
+    los parsers de las seis tiendas y el puntaje reutilizan la misma.
+    """
+
+    def __init__(self, q: str):
+        self.query_lower = q.lower()
+        self.query_words: List[str] = self.query_lower.split()
+        self.main_keyword = self.query_words[0] if self.query_words else ""
+        # Palabras clave para el puntaje (sin palabras comunes ni muy cortas)
+        self.keywords: List[str] = [
+            w for w in self.query_words if w not in STOP_WORDS and len(w) > 2
+        ]
+        self.busca_reacondicionado = REACONDICIONADO in self.query_lower
+        # Palabras de más de 3 letras: MercadoLibre las busca al inicio del título
+        long_words = [w for w in self.query_words if len(w) > 3]
+        self._long_words = TermMatcher(long_words) if long_words else None
+        self._busca: Dict[int, bool] = {}
+
+    def busca_accesorio(self, accesorios: TermMatcher) -> bool:
+        """True si la búsqueda misma menciona alguno de los accesorios."""
+        key = id(accesorios)
+        if key not in self._busca:
+            self._busca[key] = accesorios.matches(self.query_lower)
+        return self._busca[key]
+
+    def excluye_accesorio(self, titulo_lower: str, accesorios: TermMatcher) -> bool:
+        """True si el título es un accesorio y la búsqueda no es de accesorios."""
+        return accesorios.matches(titulo_lower) and not self.busca_accesorio(accesorios)
+
+    def menciona_al_inicio(self, titulo_lower: str, chars: int = 30) -> bool:
+        """True si alguna palabra larga de la búsqueda está en los primeros `chars` caracteres."""
+        return self._long_words is not None and self._long_words.matches(titulo_lower[:chars])
+
+
+@lru_cache(maxsize=256)
+def query_filter(q: str) -> QueryFilter:
+    """QueryFilter de la búsqueda `q` (compartido entre tiendas y puntaje)."""
+    return QueryFilter(q)
@@ -0,0 +1,239 @@
+"""
+Historial de precios en SQLite.
+
+Cada vez que una tienda responde (no en los aciertos de caché) sus
+productos se guardan como observaciones (tienda, búsqueda, url, título,
+precio, fecha). Es la base para las tendencias de precio y para responder sin
+volver a consultar las tiendas.
+
+La escritura nunca ocurre en el request: `record()` solo encola las
+filas y una tarea de fondo las agrupa y las inserta por lotes con
+`executemany` en un hilo aparte. La base usa WAL para que las lecturas no
+esperen a las escrituras.
+
+Configuración:
+    HISTORY_DB_PATH        ruta del archivo (por defecto backend/price_history.db)
+    HISTORY_BATCH_SIZE     filas máximas por lote             (por defecto 500)
+    HISTORY_FLUSH_SECONDS  espera máxima para armar un lote    (por defecto 1)
+    HISTORY_QUEUE_MAX      filas pendientes antes de descartar (por defecto 20000)
+"""
+import asyncio
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from cache import normalize_query
+from product import Product
+
+logger = logging.getLogger("uvicorn.error")
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", str(pathlib.Path(__file__).parent / "price_history.db"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "500"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1"))
+HISTORY_QUEUE_MAX = int(os.getenv("HISTORY_QUEUE_MAX", "20000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    id INTEGER PRIMARY KEY,
+    store TEXT NOT NULL,
+    query_norm TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    price REAL NOT NULL,
+    currency TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_price_history_url ON price_history (url, seen_at);
+CREATE INDEX IF NOT EXISTS idx_price_history_title ON price_history (title_norm, seen_at);
+-- Cubre las lecturas de /history/query sin tocar la tabla
+CREATE INDEX IF NOT EXISTS idx_price_history_query ON price_history (query_norm, url, seen_at, price);
+"""
+
+INSERT = """
+INSERT INTO price_history (store, query_norm, url, title, title_norm, price, currency, seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Lecturas de las tendencias (ver trends.py). Primero un resumen por
+# producto (url, tienda y título de la última observación, cantidad) y
+# luego solo las columnas numéricas, ordenadas por producto y fecha.
+PRODUCTS_SQL = """
+SELECT p.url, p.store, p.title, g.n FROM (
+    SELECT url, MAX(seen_at) AS last_seen, COUNT(*) AS n FROM price_history
+    WHERE {where} AND seen_at >= ? GROUP BY url
+) g JOIN price_history p ON p.url = g.url AND p.seen_at = g.last_seen
+GROUP BY p.url ORDER BY p.url
+"""
+POINTS_SQL = """
+SELECT seen_at, price FROM price_history
+WHERE {where} AND seen_at >= ? ORDER BY url, seen_at
+"""
+# Búsquedas que trajeron productos y cuántas veces se consultaron las
+# tiendas por cada una (cada respuesta de una tienda comparte seen_at)
+QUERIES_SQL = """
+SELECT query_norm, COUNT(DISTINCT seen_at) FROM price_history
+WHERE query_norm != '' AND seen_at >= ? GROUP BY query_norm
+"""
+BY_URL = "url = ?"
+BY_QUERY = "query_norm = ?"
+
+Row = Tuple[str, str, str, str, str, float, str, float]
+
+
+class Observations(NamedTuple):
+    products: List[Tuple[str, str, str, int]]  # (url, store, title, cantidad), ordenados por url
+    points: List[Tuple[float, float]]          # (seen_at, price) en el mismo orden
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Abre la base en modo WAL y crea el esquema si no existe."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # En WAL, NORMAL solo arriesga el último lote ante un corte de luz
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # Bases creadas antes de guardar la búsqueda
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(price_history)")}
+    if "query_norm" not in columns:
+        conn.execute("ALTER TABLE price_history ADD COLUMN query_norm TEXT NOT NULL DEFAULT ''")
+    conn.executescript(INDEXES)
+    return conn
+
+
+class PriceHistory:
+    """Historial de precios con escritura por lotes en segundo plano."""
+
+    def __init__(
+        self,
+        path: str = HISTORY_DB_PATH,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        flush_seconds: float = HISTORY_FLUSH_SECONDS,
+        queue_max: int = HISTORY_QUEUE_MAX,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_max = queue_max
+        self._conn: Optional[sqlite3.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Abre la base y arranca el escritor (dentro del event loop)."""
+        self._conn = connect(self.path)
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._task = asyncio.create_task(self._writer())
+        logger.info(f"[History] Historial de precios en {self.path}")
+
+    async def stop(self):
+        """Escribe lo pendiente y cierra la base (al apagar la app)."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._conn.close()
+        self._conn = None
+
+    def record(self, store: str, items: Iterable[Product], query: str = "", seen_at: Optional[float] = None):
+        """
+        Encola las observaciones de precio de una tienda para la búsqueda
+        `query`. No bloquea: si el escritor no ha arrancado o la cola está
+        llena, las filas se descartan.
+        """
+        if self._queue is None:
+            return
+        seen_at = seen_at or time.time()
+        query_norm = normalize_query(query)
+        for item in items:
+            if not item.url or item.price <= 0:
+                continue
+            row = (store, query_norm, item.url, item.title, normalize_query(item.title), item.price,
+                   item.currency, seen_at)
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _writer(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch: List[Row] = [row]
+            # Junta más filas hasta llenar el lote o agotar la espera
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            try:
+                await asyncio.to_thread(self._write, batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                self.dropped += len(batch)
+                logger.error(f"[History] Error escribiendo {len(batch)} filas: {e}")
+
+    def _write(self, batch: List[Row]):
+        with self._conn:
+            self._conn.executemany(INSERT, batch)
+
+    async def by_url(self, url: str, since: float = 0) -> Observations:
+        """Observaciones de un producto desde `since`."""
+        return await asyncio.to_thread(self._select, BY_URL, url, since)
+
+    async def by_query(self, query: str, since: float = 0) -> Observations:
+        """Observaciones de los productos vistos para una búsqueda desde `since`."""
+        return await asyncio.to_thread(self._select, BY_QUERY, normalize_query(query), since)
+
+    async def queries(self, since: float = 0) -> List[Tuple[str, int]]:
+        """(búsqueda normalizada, consultas) de las búsquedas vistas desde `since`."""
+        return await asyncio.to_thread(self._queries, since)
+
+    def _queries(self, since: float) -> List[Tuple[str, int]]:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, isolation_level=None)
+        try:
+            return conn.execute(QUERIES_SQL, (since,)).fetchall()
+        finally:
+            conn.close()
+
+    def _select(self, where: str, value: str, since: float) -> Observations:
+        # Conexión propia de solo lectura: en WAL no espera al escritor, y
+        # ambas consultas leen la misma foto de la base dentro de la transacción
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            products = conn.execute(PRODUCTS_SQL.format(where=where), (value, since)).fetchall()
+            points = conn.execute(POINTS_SQL.format(where=where), (value, since)).fetchall()
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return Observations(products, points)
+
+    def stats(self) -> Dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
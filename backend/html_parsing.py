@@ -0,0 +1,205 @@
+"""
+Extracción de las tarjetas de producto de las páginas HTML de resultados.
+
+Dos backends con el mismo contrato de salida:
+
+- "lxml" (por defecto): parser en C y consultas XPath, limitado a la zona
+  de la grilla de resultados cuando se puede ubicar.
+- "bs4": BeautifulSoup con html.parser, la implementación original. Se
+  mantiene como referencia y respaldo (HTML_PARSER_BACKEND=bs4).
+
+Cada tarjeta es un dict con los campos crudos que luego filtra el fetcher:
+title, href, price_text e image.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import lxml.html
+from bs4 import BeautifulSoup
+
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml")
+
+_LXML_PARSER = lxml.html.HTMLParser(remove_comments=True, remove_blank_text=True)
+
+
+def _has_class(name: str) -> str:
+    """Condición XPath equivalente al selector CSS `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _text(el) -> str:
+    """Equivalente a get_text(strip=True) de BeautifulSoup."""
+    return "".join(t.strip() for t in el.itertext())
+
+
+def _first(el, xpath: str):
+    found = el.xpath(xpath)
+    return found[0] if found else None
+
+
+def _grid_region(html: str, marker: str, open_tag: str, close_tag: str) -> str:
+    """
+    Recorta el HTML a la zona entre la primera y la última tarjeta de la
+    grilla para no parsear cabecera, scripts y pie de página.
+    """
+    first = html.find(marker)
+    if first == -1:
+        return html
+    start = html.rfind(open_tag, 0, first)
+    end = html.find(close_tag, html.rfind(marker))
+    if start == -1 or end == -1:
+        return html
+    return html[start:end + len(close_tag)]
+
+
+def _parse(html: str):
+    return lxml.html.fromstring(html, parser=_LXML_PARSER)
+
+
+# -----------------------------
+# MercadoLibre
+# -----------------------------
+_ML_ITEMS = "//li[contains(@class, 'ui-search-layout__item')]"
+_ML_PRICE = "(.//span[contains(@class, 'andes-money-amount__fraction')])[1]"
+
+
+def extract_ml_cards(html: str, limit: int = 10, backend: Optional[str] = None) -> Tuple[List[Dict], int]:
+    """
+    Tarjetas de la grilla de MercadoLibre, sin intervenciones/anuncios.
+
+    Returns:
+        (cards, total): hasta `limit` tarjetas y el total de <li> de la grilla
+    """
+    if (backend or HTML_PARSER_BACKEND) == "bs4":
+        return _extract_ml_cards_bs4(html, limit)
+
+    region = _grid_region(html, "ui-search-layout__item", "<ol", "</ol>")
+    todos = _parse(region).xpath(_ML_ITEMS)
+    productos = [p for p in todos if "intervention" not in (p.get("class") or "")]
+
+    cards = []
+    for prod in productos[:limit]:
+        link = _first(prod, "(.//a[@href])[1]")
+        precio_elem = _first(prod, _ML_PRICE)
+        img_elem = _first(prod, "(.//img)[1]")
+        cards.append({
+            "title": _text(link) if link is not None else "",
+            "href": link.get("href") if link is not None else None,
+            "price_text": _text(precio_elem) if precio_elem is not None else None,
+            "image": (img_elem.get("data-src") or img_elem.get("src")) if img_elem is not None else "",
+        })
+    return cards, len(todos)
+
+
+def _extract_ml_cards_bs4(html: str, limit: int):
+    soup = BeautifulSoup(html, 'html.parser')
+    todos = soup.find_all('li', class_=lambda x: x and 'ui-search-layout__item' in x)
+    productos = [p for p in todos if 'intervention' not in ' '.join(p.get('class', []))]
+
+    cards = []
+    for prod in productos[:limit]:
+        link = prod.find('a', href=True)
+        precio_elem = prod.find('span', class_=lambda x: x and 'andes-money-amount__fraction' in x)
+        img_elem = prod.find('img')
+        cards.append({
+            "title": link.get_text(strip=True) if link else "",
+            "href": link['href'] if link else None,
+            "price_text": precio_elem.get_text(strip=True) if precio_elem else None,
+            "image": (img_elem.get('data-src') or img_elem.get('src')) if img_elem else "",
+        })
+    return cards, len(todos)
+
+
+# -----------------------------
+# Homecenter
+# -----------------------------
+_HC_ITEMS = "//*[{}]".format(" or ".join([
+    _has_class("product-item"), _has_class("product-card"), _has_class("ProductCard"),
+    "@data-test='product-card'",
+]))
+_HC_ITEMS_FALLBACK = "//*[{}]".format(" or ".join([
+    _has_class("item"), _has_class("product"), "(self::article and @data-product)",
+]))
+_HC_TITLE = "(.//*[{}])[1]".format(" or ".join([
+    _has_class("product-name"), _has_class("ProductCard__title"), "self::h3", "self::h2",
+    _has_class("title"), f"(self::a and {_has_class('name')})",
+]))
+_HC_LINK = "(.//a[contains(@href, '/product/') or contains(@href, '/p/')])[1]"
+_HC_PRICE = "(.//*[{}])[1]".format(" or ".join([
+    _has_class("price"), _has_class("ProductCard__price"), "@data-test='price'",
+    _has_class("valor"), "(self::span and contains(@class, 'price'))",
+]))
+_HC_ALL_TEXT = ".//text()[not(ancestor::script) and not(ancestor::style)]"
+_PRICE_IN_TEXT = re.compile(r'\$\s*([0-9.,]+)')
+
+
+def _image_src(img) -> str:
+    if img is None:
+        return ""
+    return (img.get('src') or
+            img.get('data-src') or
+            img.get('data-lazy-src') or
+            img.get('data-original') or "")
+
+
+def extract_homecenter_cards(html: str, limit: int = 10, backend: Optional[str] = None) -> Tuple[List[Dict], int]:
+    """
+    Tarjetas de la grilla de Homecenter.
+
+    Returns:
+        (cards, total): hasta `limit` tarjetas y el total encontrado
+    """
+    if (backend or HTML_PARSER_BACKEND) == "bs4":
+        return _extract_homecenter_cards_bs4(html, limit)
+
+    root = _parse(html)
+    product_items = root.xpath(_HC_ITEMS) or root.xpath(_HC_ITEMS_FALLBACK)
+
+    cards = []
+    for item in product_items[:limit]:
+        title_elem = _first(item, _HC_TITLE)
+        link_elem = _first(item, _HC_LINK)
+        if link_elem is None:
+            link_elem = _first(item, "(.//a)[1]")
+        price_elem = _first(item, _HC_PRICE)
+        if price_elem is not None:
+            price_text = _text(price_elem)
+        else:
+            # Buscar por texto que contenga $
+            price_match = _PRICE_IN_TEXT.search("".join(item.xpath(_HC_ALL_TEXT)))
+            price_text = price_match.group(1) if price_match else None
+        cards.append({
+            "title": _text(title_elem) if title_elem is not None else "",
+            "href": link_elem.get("href") if link_elem is not None else None,
+            "price_text": price_text,
+            "image": _image_src(_first(item, "(.//img)[1]")),
+        })
+    return cards, len(product_items)
+
+
+def _extract_homecenter_cards_bs4(html: str, limit: int):
+    soup = BeautifulSoup(html, 'html.parser')
+    product_items = soup.select('.product-item, .product-card, .ProductCard, [data-test="product-card"]')
+    if not product_items:
+        product_items = soup.select('.item, .product, article[data-product]')
+
+    cards = []
+    for item in product_items[:limit]:
+        title_elem = item.select_one('.product-name, .ProductCard__title, h3, h2, .title, a.name')
+        link_elem = item.select_one('a[href*="/product/"], a[href*="/p/"]')
+        if not link_elem:
+            link_elem = item.find('a')
+        price_elem = item.select_one('.price, .ProductCard__price, [data-test="price"], .valor, span[class*="price"]')
+        if price_elem:
+            price_text = price_elem.get_text(strip=True)
+        else:
+            price_match = _PRICE_IN_TEXT.search(item.get_text())
+            price_text = price_match.group(1) if price_match else None
+        cards.append({
+            "title": title_elem.get_text(strip=True) if title_elem else "",
+            "href": link_elem.get('href') if link_elem else None,
+            "price_text": price_text,
+            "image": _image_src(item.select_one('img')),
+        })
+    return cards, len(product_items)
@@ -0,0 +1,209 @@
+import httpx
+import importlib.util
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+# Límites del pool configurables por variables de entorno
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# Envía todas las peticiones de las tiendas a otro servidor (p. ej. el stub de
+# bench_stub.py: UPSTREAM_OVERRIDE=http://127.0.0.1:9000); vacío = tiendas reales
+UPSTREAM_OVERRIDE = os.getenv("UPSTREAM_OVERRIDE", "")
+
+# Host de cada tienda (un pool keep-alive por host)
+STORE_HOSTS = {
+    "mercadolibre": "listado.mercadolibre.com.co",
+    "falabella": "www.falabella.com.co",
+    "exito": "www.exito.com",
+    "olimpica": "www.olimpica.com",
+    "alkosto": "www.alkosto.com",
+    "homecenter": "www.homecenter.com.co",
+}
+HOST_STORES = {host: store for store, host in STORE_HOSTS.items()}
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    """Cuerpo de la respuesta que cuenta bytes y mide la descarga hasta cerrarse."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, store: str, headers_at: float):
+        self._stream = stream
+        self._store = store
+        self._headers_at = headers_at
+        self._bytes = 0
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if self._closed:
+            return
+        self._closed = True
+        # Falabella/Alkosto cortan la descarga antes del final: cuenta lo leído
+        metrics.store_phase_seconds.observe(time.perf_counter() - self._headers_at,
+                                            store=self._store, phase="download")
+        metrics.upstream_bytes.inc(self._bytes, store=self._store)
+        metrics.upstream_response_bytes.observe(self._bytes, store=self._store)
+
+
+class UpstreamOverrideTransport(httpx.AsyncBaseTransport):
+    """
+    Redirige las peticiones a `base_url` conservando el header Host
+    original, con el que el servidor sabe qué tienda se está pidiendo.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, base_url: str):
+        self._transport = transport
+        self._base = httpx.URL(base_url)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self._base.scheme, host=self._base.host, port=self._base.port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que mide cada petición a una tienda para /metrics: conexión
+    nueva (TCP+TLS, con la extensión "trace" de httpx), espera hasta los
+    headers, descarga del cuerpo, código HTTP y bytes.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: str):
+        self._transport = transport
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        marks: Dict[str, float] = {}
+
+        async def trace(event: str, info: dict):
+            if event.startswith(("connection.connect_tcp.", "connection.start_tls.")):
+                marks.setdefault("connect_start", time.perf_counter())
+                marks["connect_end"] = time.perf_counter()
+
+        request.extensions = {**request.extensions, "trace": trace}
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        headers_at = time.perf_counter()
+
+        connect = 0.0
+        if "connect_start" in marks:
+            connect = marks["connect_end"] - marks["connect_start"]
+            metrics.upstream_connections.inc(store=self.store)
+            metrics.store_phase_seconds.observe(connect, store=self.store, phase="connect")
+        metrics.store_phase_seconds.observe(headers_at - started - connect, store=self.store, phase="wait")
+        metrics.upstream_responses.inc(store=self.store, code=str(response.status_code))
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_MeteredStream(response.stream, self.store, headers_at),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ClientRegistry:
+    """
+    Registro de clientes httpx de larga vida, uno por host.
+
+    Cada cliente mantiene su propio pool de conexiones keep-alive, así que
+    las búsquedas reutilizan las conexiones TCP+TLS ya abiertas en lugar de
+    pagar un handshake nuevo por tienda en cada request.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+        upstream: str = UPSTREAM_OVERRIDE,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # HTTP/2 requiere el paquete opcional "h2" (httpx[http2])
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("[HTTP] HTTP2_ENABLED sin el paquete 'h2', se usa HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.upstream = upstream
+        if upstream:
+            logger.warning(f"[HTTP] UPSTREAM_OVERRIDE: las tiendas se consultan en {upstream}")
+        # Un solo contexto SSL para todos los clientes: crearlo es costoso
+        # (carga los certificados) y bloquea el event loop
+        self._ssl_context = httpx.create_ssl_context()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, host: str) -> httpx.AsyncClient:
+        """Retorna (creándolo si hace falta) el cliente del host dado."""
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            transport = httpx.AsyncHTTPTransport(
+                limits=self.limits,
+                http2=self.http2,
+                verify=self._ssl_context,
+            )
+            if self.upstream:
+                transport = UpstreamOverrideTransport(transport, self.upstream)
+            client = httpx.AsyncClient(
+                transport=InstrumentedTransport(transport, HOST_STORES.get(host, host)),
+                follow_redirects=True,
+                timeout=15.0,
+            )
+            self._clients[host] = client
+        return client
+
+    def for_store(self, store: str) -> httpx.AsyncClient:
+        """Retorna el cliente asociado al host de una tienda."""
+        return self.get(STORE_HOSTS[store])
+
+    def for_url(self, url: str) -> httpx.AsyncClient:
+        """Retorna el cliente asociado al host de una URL."""
+        return self.get(urlsplit(url).netloc)
+
+    def warm(self):
+        """Crea de antemano los clientes de todas las tiendas (al arrancar la app)."""
+        for host in STORE_HOSTS.values():
+            self.get(host)
+
+    async def aclose(self):
+        """Cierra todos los pools (se llama al apagar la app)."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+@asynccontextmanager
+async def use_client(client: Optional[httpx.AsyncClient], **kwargs):
+    """
+    Usa el cliente compartido si se inyectó; si no, abre uno temporal.
+
+    Permite que los fetchers sigan funcionando solos (scripts, pruebas
+    manuales) sin depender del ciclo de vida de la app.
+    """
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient(**kwargs) as temp_client:
+            yield temp_client
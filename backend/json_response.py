@@ -0,0 +1,161 @@
+"""
+Respuestas JSON rápidas, comprimidas y con ETag.
+
+- Serialización con orjson si está instalado (varias veces más rápido que
+  json y ya produce bytes UTF-8); si no, json con el mismo formato compacto
+  que usa FastAPI. `FastJSONResponse` es la clase de respuesta por defecto
+  de la app.
+- `json_response` comprime el cuerpo con brotli o gzip según el
+  Accept-Encoding del cliente, solo desde COMPRESS_MIN_BYTES: en
+  respuestas pequeñas no compensa. `brotli` está en requirements.txt; si
+  falta (otra instalación) se ofrece solo gzip.
+- Con un `etag` (ver main.search_etag) responde 304 sin cuerpo si el
+  cliente manda el mismo en If-None-Match, sin armar ni serializar el
+  contenido. Cache-Control: no-cache hace que el navegador guarde la respuesta pero
+  pregunte siempre, así las consultas repetidas del frontend terminan en
+  304.
+- `compress_stream` comprime el NDJSON de /search/stream con la misma
+  negociación, línea por línea. El stream no lleva ETag: cada evento es el
+  resultado de una tienda a medida que llega.
+
+Configuración:
+    COMPRESS_MIN_BYTES   tamaño mínimo para comprimir    (por defecto 1024)
+    GZIP_LEVEL           nivel de gzip (1-9)             (por defecto 5)
+    BROTLI_QUALITY       calidad de brotli (0-11)        (por defecto 4)
+"""
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # sin brotli se ofrece solo gzip
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+ENCODING_IDENTITY = "identity"
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def etag_for(content: Any) -> str:
+    """
+    ETag del contenido serializado. Es débil (W/): el mismo contenido se
+    envía con distintas codificaciones, que no son idénticas byte a byte.
+    """
+    return 'W/"' + hashlib.blake2b(dumps(content), digest_size=12).hexdigest() + '"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match (lista de ETags o "*") con comparación débil, como manda el estándar."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in (_opaque(tag) for tag in if_none_match.split(","))
+
+
+def negotiate(accept_encoding: Optional[str]) -> str:
+    """
+    La codificación con mayor q que acepta el cliente entre br, gzip e
+    identity; en un empate gana br, después gzip. `*` vale para las que no
+    se nombran y q=0 es rechazo. Sin nada aceptable se responde identity.
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = ENCODING_IDENTITY, 0.0
+    for encoding in offered + [ENCODING_IDENTITY]:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+async def compress_stream(chunks: AsyncIterator[str], encoding: str) -> AsyncIterator[bytes]:
+    """
+    Comprime un stream (NDJSON) sin retener líneas: cada una sale apenas se
+    emite, con un flush de sincronización, así el cliente la puede leer sin
+    esperar el resto.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        async for chunk in chunks:
+            yield compressor.process(chunk.encode("utf-8")) + compressor.flush()
+        yield compressor.finish()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        async for chunk in chunks:
+            yield compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    else:
+        async for chunk in chunks:
+            yield chunk.encode("utf-8")
+
+
+def json_response(request: Request, content: Callable[[], Any], etag: Optional[str] = None) -> Response:
+    """
+    Respuesta JSON comprimida según Accept-Encoding; con `etag`, 304 si el
+    cliente ya tiene ese contenido.
+
+    `content` es la función que arma el contenido: con un 304 no se llama.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    body = dumps(content())
+    encoding = negotiate(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_BYTES else ENCODING_IDENTITY
+    if encoding != ENCODING_IDENTITY:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
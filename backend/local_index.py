@@ -0,0 +1,286 @@
+"""
+Índice invertido local de los productos vistos (/search?mode=local).
+
+Cada respuesta real de una tienda (no los aciertos de caché) se agrega al
+índice: un documento por producto (url), el Product con la fecha en que se
+vio por última vez (`seen_at`), y una lista de documentos por palabra del
+título. Una búsqueda local no consulta ninguna tienda:
+
+1. Por cada palabra clave de la búsqueda (las mismas de scoring.py) se
+   juntan las listas de las palabras del vocabulario que la contienen.
+   El puntaje busca la palabra clave como subcadena del título, así que
+   un título sin ninguna palabra clave nunca llega a 30 y no hace falta
+   mirarlo. Las palabras del vocabulario que contienen la palabra clave
+   salen de un índice de trigramas (trigrama -> palabras), sin recorrer
+   todo el vocabulario: las palabras clave tienen al menos 3 letras.
+2. Los candidatos se puntúan con el mismo score_items de la búsqueda en
+   vivo y se conservan los LOCAL_SEARCH_LIMIT mejores (un heap acotado,
+   no un sort de todos): el orden es el de calculate_match_score.
+
+Una búsqueda sin palabras clave ("tv") le daría 50 a todos los productos
+del índice, así que el modo local no la acepta.
+
+Los productos que no se ven hace más de LOCAL_INDEX_MAX_AGE no se
+retornan y se podan al guardar. Si se pasa de LOCAL_INDEX_MAX_DOCS se
+descartan los vistos hace más tiempo.
+
+El índice se guarda en disco (JSON comprimido, escritura atómica) cada
+LOCAL_INDEX_SAVE_SECONDS si cambió y al apagar la app, y se carga al
+arrancar; las listas por palabra se reconstruyen al cargar.
+
+Configuración:
+    LOCAL_INDEX_PATH           archivo del índice                      (por defecto backend/local_index.json.gz)
+    LOCAL_INDEX_MAX_DOCS       productos como máximo                   (por defecto 200000)
+    LOCAL_INDEX_MAX_AGE        segundos que un producto sigue vigente  (por defecto 604800, 7 días)
+    LOCAL_INDEX_SAVE_SECONDS   segundos entre guardados                (por defecto 60)
+    LOCAL_SEARCH_LIMIT         productos por respuesta por defecto     (por defecto 60)
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import pathlib
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from product import Product, to_dicts
+from scoring import query_scorer
+
+logger = logging.getLogger("uvicorn.error")
+
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", str(pathlib.Path(__file__).parent / "local_index.json.gz"))
+LOCAL_INDEX_MAX_DOCS = int(os.getenv("LOCAL_INDEX_MAX_DOCS", "200000"))
+LOCAL_INDEX_MAX_AGE = float(os.getenv("LOCAL_INDEX_MAX_AGE", "604800"))
+LOCAL_INDEX_SAVE_SECONDS = float(os.getenv("LOCAL_INDEX_SAVE_SECONDS", "60"))
+LOCAL_SEARCH_LIMIT = int(os.getenv("LOCAL_SEARCH_LIMIT", "60"))
+
+# Máximo de productos por respuesta que se puede pedir con `limit`
+MAX_SEARCH_LIMIT = 200
+
+# Al pasarse del máximo se descarta esta fracción de una vez (los más viejos)
+EVICT_FRACTION = 0.1
+
+
+def tokenize(title: str) -> Set[str]:
+    """
+    Palabras del título en minúsculas, separadas solo por espacios: las
+    palabras clave no tienen espacios, así que si una aparece en el título
+    aparece dentro de alguna de estas palabras.
+    """
+    return set(title.lower().split())
+
+
+def trigrams(word: str) -> Set[str]:
+    """Subcadenas de 3 letras de la palabra (ninguna si tiene menos de 3)."""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class LocalIndex:
+    """Índice invertido en memoria de los productos vistos, con copia en disco."""
+
+    def __init__(
+        self,
+        path: str = LOCAL_INDEX_PATH,
+        max_docs: int = LOCAL_INDEX_MAX_DOCS,
+        max_age: float = LOCAL_INDEX_MAX_AGE,
+        save_seconds: float = LOCAL_INDEX_SAVE_SECONDS,
+    ):
+        self.path = path
+        self.max_docs = max_docs
+        self.max_age = max_age
+        self.save_seconds = save_seconds
+        self._docs: List[Optional[Product]] = []  # id -> producto (None si se liberó)
+        self._ids: Dict[str, int] = {}             # url -> id
+        self._free: List[int] = []                 # ids liberados para reusar
+        self._postings: Dict[str, Set[int]] = {}   # palabra -> ids
+        self._grams: Dict[str, Set[str]] = {}      # trigrama -> palabras del vocabulario
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.saved_at = 0.0
+        self.searches = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --- escritura
+
+    def add(self, items: Iterable[Product], seen_at: Optional[float] = None):
+        """Agrega o actualiza los productos de una respuesta de una tienda."""
+        seen_at = seen_at or time.time()
+        for item in items:
+            if not item.url or not item.title or item.price <= 0:
+                continue
+            self._put(item.seen(seen_at))
+        self._dirty = True
+        if len(self._ids) > self.max_docs:
+            self._evict(len(self._ids) - int(self.max_docs * (1 - EVICT_FRACTION)))
+
+    def _put(self, doc: Product):
+        doc_id = self._ids.get(doc.url)
+        if doc_id is not None:
+            old = self._docs[doc_id]
+            self._docs[doc_id] = doc
+            if old.title == doc.title:
+                return
+            self._unlink(doc_id, old.title)
+        else:
+            doc_id = self._free.pop() if self._free else len(self._docs)
+            if doc_id == len(self._docs):
+                self._docs.append(doc)
+            else:
+                self._docs[doc_id] = doc
+            self._ids[doc.url] = doc_id
+        for token in tokenize(doc.title):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                for gram in trigrams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            posting.add(doc_id)
+
+    def _unlink(self, doc_id: int, title: str):
+        for token in tokenize(title):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[token]
+                    for gram in trigrams(token):
+                        tokens = self._grams[gram]
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._grams[gram]
+
+    def _remove(self, doc_id: int):
+        doc = self._docs[doc_id]
+        self._unlink(doc_id, doc.title)
+        del self._ids[doc.url]
+        self._docs[doc_id] = None
+        self._free.append(doc_id)
+
+    def _evict(self, count: int):
+        """Descarta los `count` productos vistos hace más tiempo."""
+        oldest = sorted(self._ids.values(), key=lambda doc_id: self._docs[doc_id].seen_at)[:count]
+        for doc_id in oldest:
+            self._remove(doc_id)
+        logger.info(f"[LocalIndex] {len(oldest)} productos descartados (máximo {self.max_docs})")
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Quita los productos que no se ven hace más de max_age."""
+        cutoff = (now or time.time()) - self.max_age
+        expired = [doc_id for doc_id in self._ids.values() if self._docs[doc_id].seen_at < cutoff]
+        for doc_id in expired:
+            self._remove(doc_id)
+        if expired:
+            self._dirty = True
+        return len(expired)
+
+    # --- lectura
+
+    def tokens_containing(self, keyword: str) -> List[str]:
+        """
+        Palabras del vocabulario que contienen `keyword` (de 3 letras o más):
+        las que tienen todos sus trigramas, empezando por el trigrama más raro.
+        """
+        grams = sorted((self._grams.get(gram, set()) for gram in trigrams(keyword)), key=len)
+        if not grams or not grams[0]:
+            return []
+        tokens = grams[0].intersection(*grams[1:])
+        return [token for token in tokens if keyword in token]
+
+    def candidates(self, q: str) -> List[Product]:
+        """
+        Productos vigentes con al menos una palabra clave de la búsqueda en el
+        título (ninguno si la búsqueda no tiene palabras clave).
+        """
+        self.searches += 1
+        ids: Set[int] = set()
+        for keyword in query_scorer(q).keywords:
+            for token in self.tokens_containing(keyword):
+                ids |= self._postings[token]
+        cutoff = time.time() - self.max_age
+        docs = (self._docs[doc_id] for doc_id in ids)
+        return [doc for doc in docs if doc.seen_at >= cutoff]
+
+    def titles(self) -> List[str]:
+        """Títulos de los productos vigentes (para las sugerencias, ver suggest.py)."""
+        cutoff = time.time() - self.max_age
+        docs = (self._docs[doc_id] for doc_id in self._ids.values())
+        return [doc.title for doc in docs if doc.seen_at >= cutoff]
+
+    # --- disco
+
+    def load(self):
+        """Carga el índice guardado (si existe) y reconstruye las listas."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                docs = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"[LocalIndex] No se pudo leer {self.path}: {e}")
+            return
+        for doc in docs:
+            try:
+                self._put(Product.from_dict(doc))
+            except (KeyError, TypeError, ValueError):
+                continue
+        expired = self.prune()
+        self._dirty = False
+        self.saved_at = os.path.getmtime(self.path)
+        logger.info(f"[LocalIndex] {len(self)} productos cargados de {self.path} ({expired} vencidos)")
+
+    def _write(self, docs: List[Product]):
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+            json.dump(to_dicts(docs), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    async def save(self):
+        """Guarda el índice si cambió; la compresión y escritura van en un hilo."""
+        if not self._dirty:
+            return
+        self.prune()
+        # La lista se arma en el event loop (los Product no cambian): el hilo no
+        # ve el índice a medio cambiar
+        docs = [self._docs[doc_id] for doc_id in self._ids.values()]
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, docs)
+            self.saved_at = time.time()
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"[LocalIndex] No se pudo guardar {self.path}: {e}")
+
+    def start(self):
+        """Carga el índice y arranca el guardado periódico (dentro del event loop)."""
+        self.load()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Detiene el guardado periódico y guarda lo pendiente (al apagar la app)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.save()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.save_seconds)
+            await self.save()
+
+    def stats(self) -> Dict:
+        return {
+            "products": len(self),
+            "tokens": len(self._postings),
+            "trigrams": len(self._grams),
+            "searches": self.searches,
+            "saved_at": round(self.saved_at),
+            "pending": self._dirty,
+        }
@@ -1,11 +1,36 @@
 # backend/main.py
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-import os, asyncio, httpx, logging, json, pathlib, time, re
-from bs4 import BeautifulSoup
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
+import os, asyncio, httpx, logging, json, pathlib, sqlite3, time, re
+from collections import Counter
+from heapq import nsmallest
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
+from http_clients import ClientRegistry, use_client
+from breaker import BreakerRegistry
+from cache import TTLCache, normalize_query
+from scoring import query_scorer
+from singleflight import SingleFlight
+from suggest import MAX_LIMIT as SUGGEST_MAX_LIMIT, SUGGEST_HISTORY_DAYS, Suggester
+from executor import PARSE_PHASES, parse_executor
+from history import PriceHistory
+from json_response import ENCODING_IDENTITY, FastJSONResponse, compress_stream, etag_for, json_response, negotiate
+from local_index import LOCAL_SEARCH_LIMIT, MAX_SEARCH_LIMIT as LOCAL_MAX_LIMIT, LocalIndex
+from matching import group_products
+from prefetch import PREFETCH_ENABLED, PrefetchScheduler
+from product import Product, to_dicts
+from ratelimit import LimiterRegistry
+from trends import DEFAULT_POINTS, summarize_by_product
+from timings import as_ms, current_timings, start_timings
+import metrics
+from store_errors import (
+    StoreError, StoreSkipped, StoreThrottled, StoreTimeout, STATUS_OK, STATUS_TIMEOUT, STATUS_SKIPPED,
+    status_for,
+)
 from fetch_exito import fetch_exito
+from fetch_mercadolibre import fetch_mercadolibre
 from fetch_falabella import fetch_falabella
 from fetch_olimpica import fetch_olimpica
 from fetch_alkosto import fetch_alkosto
@@ -59,7 +84,37 @@ async def get_valid_meli_token():
             return MELI_TOKEN_MEM["access_token"]
     return ""
 
-app = FastAPI(title="Comparador de precios")
+# Pools HTTP compartidos por todas las tiendas (se cierran al apagar la app)
+http_clients = ClientRegistry()
+
+# Historial de precios en SQLite (escritura por lotes en segundo plano)
+price_history = PriceHistory()
+
+# Índice invertido de los productos vistos para /search?mode=local (ver local_index.py)
+local_index = LocalIndex()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_clients.warm()
+    parse_executor.start()
+    price_history.start()
+    local_index.start()
+    suggester.start()
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+    metrics.loop_lag.start()
+    yield
+    await metrics.loop_lag.stop()
+    await prefetcher.stop()
+    for task in list(revalidating.values()):
+        task.cancel()
+    await price_history.stop()
+    await suggester.stop()
+    await local_index.stop()
+    parse_executor.shutdown()
+    await http_clients.aclose()
+
+app = FastAPI(title="Comparador de precios", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -67,6 +122,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 BESTBUY_KEY = os.getenv("BESTBUY_API_KEY", "")
@@ -81,134 +137,34 @@ HEADERS = {
 }
 
 # -----------------------------
-# 1) MERCADO LIBRE (MCO/Colombia)
+# 1) MERCADO LIBRE (MCO/Colombia): ver fetch_mercadolibre.py
 # -----------------------------
-async def fetch_mercadolibre(q: str):
-    # La API de MercadoLibre bloquea requests, usamos scraping de la web pública
-    url = f"https://listado.mercadolibre.com.co/{q.replace(' ', '-')}"
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "es-CO,es;q=0.9",
-        "Referer": "https://www.mercadolibre.com.co/"
-    }
-    
-    try:
-        async with httpx.AsyncClient(timeout=15, headers=headers, follow_redirects=True) as client:
-            r = await client.get(url)
-            logger.info(f"[ML MCO] Status: {r.status_code}")
-            if r.status_code != 200:
-                logger.error(f"[ML MCO] Error {r.status_code}")
-                return []
-            
-            soup = BeautifulSoup(r.text, 'html.parser')
-            items = []
-            
-            # Buscar productos en el HTML (excluir intervenciones/anuncios)
-            todos = soup.find_all('li', class_=lambda x: x and 'ui-search-layout__item' in x)
-            productos = [p for p in todos if 'intervention' not in ' '.join(p.get('class', []))]
-            logger.info(f"[ML MCO] Productos encontrados: {len(productos)} (total: {len(todos)})")
-            productos = productos[:10]
-            
-            for prod in productos:
-                try:
-                    # Buscar enlace principal del producto
-                    link = prod.find('a', href=True)
-                    if not link:
-                        continue
-                    
-                    # Título (del texto del enlace)
-                    titulo = link.get_text(strip=True)
-                    if not titulo or len(titulo) < 10:
-                        continue
-                    
-                    # FILTRO: Excluir accesorios genéricos
-                    titulo_lower = titulo.lower()
-                    accesorios_excluidos = [
-                        'cable', 'cargador', 'funda', 'estuche', 'protector',
-                        'vidrio', 'mica', 'auricular', 'audífono',
-                        'soporte', 'holder', 'base', 'tripode',
-                        'batería externa', 'power bank', 'adaptador'
-                    ]
-                    
-                    # Si el título menciona un accesorio Y NO menciona el producto principal
-                    query_words = q.lower().split()
-                    main_keyword = query_words[0] if query_words else ""
-                    
-                    es_accesorio = any(acc in titulo_lower for acc in accesorios_excluidos)
-                    menciona_producto = main_keyword in titulo_lower if main_keyword else True
-                    
-                    # Si es accesorio y el título SOLO menciona el producto como compatibilidad, excluir
-                    if es_accesorio and not any(word in titulo_lower[:30] for word in query_words if len(word) > 3):
-                        logger.info(f"[ML MCO] Accesorio excluido: {titulo[:50]}")
-                        continue
-                    
-                    # URL
-                    url_producto = link['href']
-                    
-                    # Precio
-                    precio_elem = prod.find('span', class_=lambda x: x and 'andes-money-amount__fraction' in x)
-                    precio = 0.0
-                    if precio_elem:
-                        precio_text = precio_elem.get_text(strip=True).replace('.', '').replace(',', '.')
-                        precio = float(re.sub(r'[^\d.]', '', precio_text))
-                    
-                    # Imagen
-                    img_elem = prod.find('img')
-                    imagen = img_elem.get('data-src') or img_elem.get('src') if img_elem else ""
-                    
-                    if titulo and precio > 0:
-                        items.append({
-                            "title": titulo,
-                            "price": precio,
-                            "currency": "COP",
-                            "source": "MercadoLibre",
-                            "url": url_producto,
-                            "thumbnail": imagen
-                        })
-                except Exception as e:
-                    logger.warning(f"[ML MCO] Error parseando producto: {e}")
-                    continue
-            
-            logger.info(f"[ML MCO] resultados: {len(items)}")
-            return items
-            
-    except Exception as e:
-        logger.error(f"[ML MCO] Error en scraping: {e}")
-        return []
 
 # -----------------------------
 # 2) BEST BUY (opcional con API key)
 # -----------------------------
-async def fetch_bestbuy(q: str):
+async def fetch_bestbuy(q: str, client: Optional[httpx.AsyncClient] = None):
     if not BESTBUY_KEY:
         logger.info("[BestBuy] sin API key, se omite")
         return []
     url = f"https://api.bestbuy.com/v1/products((search={q}))"
     params = {"apiKey": BESTBUY_KEY, "format": "json", "pageSize": 10}
-    async with httpx.AsyncClient(timeout=12, headers=HEADERS) as client:
-        r = await client.get(url, params=params)
+    async with use_client(client, timeout=12) as client:
+        r = await client.get(url, params=params, headers=HEADERS, timeout=12)
         r.raise_for_status()
         data = r.json()
         items = []
         for it in data.get("products", []):
             price = it.get("salePrice") or it.get("regularPrice") or 0
-            items.append({
-                "title": it.get("name"),
-                "price": float(price or 0),
-                "currency": "USD",
-                "store": "bestbuy",
-                "url": it.get("url"),
-                "image": it.get("image")
-            })
+            items.append(Product(it.get("name") or "", price or 0, it.get("url"), it.get("image"),
+                                 "bestbuy", currency="USD"))
         logger.info(f"[BestBuy] resultados: {len(items)}")
         return items
 
 # -----------------------------
 # 3) EBAY (opcional con OAuth token)
 # -----------------------------
-async def fetch_ebay(q: str):
+async def fetch_ebay(q: str, client: Optional[httpx.AsyncClient] = None):
     if not EBAY_TOKEN:
         logger.info("[eBay] sin token OAuth, se omite")
         return []
@@ -219,24 +175,396 @@ async def fetch_ebay(q: str):
         "Authorization": f"Bearer {EBAY_TOKEN}",
         "X-EBAY-C-MARKETPLACE-ID": "EBAY_US",
     }
-    async with httpx.AsyncClient(timeout=12, headers=headers) as client:
-        r = await client.get(url, params=params)
+    async with use_client(client, timeout=12) as client:
+        r = await client.get(url, params=params, headers=headers, timeout=12)
         r.raise_for_status()
         data = r.json()
         items = []
         for it in data.get("itemSummaries", []):
             p = it.get("price") or {}
-            items.append({
-                "title": it.get("title"),
-                "price": float(p.get("value") or 0),
-                "currency": p.get("currency", "USD"),
-                "store": "ebay",
-                "url": it.get("itemWebUrl"),
-                "image": (it.get("image") or {}).get("imageUrl")
-            })
+            items.append(Product(it.get("title") or "", p.get("value") or 0, it.get("itemWebUrl"),
+                                 (it.get("image") or {}).get("imageUrl"), "ebay", currency=p.get("currency", "USD")))
         logger.info(f"[eBay] resultados: {len(items)}")
         return items
 
+# -----------------------------
+# Tiendas y caché de resultados
+# -----------------------------
+# Orden en que se consultan y se combinan las tiendas en /search
+STORES = {
+    "mercadolibre": fetch_mercadolibre,
+    "falabella": fetch_falabella,
+    "exito": fetch_exito,
+    "olimpica": fetch_olimpica,
+    "alkosto": fetch_alkosto,
+    "homecenter": fetch_homecenter,
+}
+
+# TTL por tienda en segundos (CACHE_TTL_<TIENDA>, ej. CACHE_TTL_FALABELLA=600)
+CACHE_TTL_DEFAULT = float(os.getenv("CACHE_TTL_DEFAULT", "300"))
+STORE_TTLS = {
+    store: float(os.getenv(f"CACHE_TTL_{store.upper()}", CACHE_TTL_DEFAULT))
+    for store in STORES
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# Tiempo adicional en segundos durante el que se sirve una respuesta vencida:
+# la combinada mientras se revalida en segundo plano, y la de una tienda
+# cuando su límite de peticiones no deja consultarla (0 = desactivado)
+CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "3600"))
+
+# Presupuesto global por defecto de /search en ms (0 = sin límite)
+SEARCH_DEADLINE_MS = int(os.getenv("SEARCH_DEADLINE_MS", "0"))
+
+# Resultados crudos por (tienda, búsqueda normalizada) y respuestas ya combinadas
+store_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES * len(STORES), default_ttl=CACHE_TTL_DEFAULT,
+                       stale_ttl=CACHE_STALE_TTL)
+search_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES, default_ttl=min(STORE_TTLS.values()),
+                        stale_ttl=CACHE_STALE_TTL)
+
+# Peticiones en vuelo por (tienda, búsqueda normalizada)
+inflight = SingleFlight()
+
+# Circuit breaker y timeout adaptativo por tienda (ver breaker.py)
+breakers = BreakerRegistry()
+
+# Límite de peticiones y de concurrencia por tienda (ver ratelimit.py)
+limiters = LimiterRegistry(STORES)
+
+async def fetch_store_shared(store: str, q: str):
+    """
+    Consulta una tienda compartiendo la petición con otros llamadores
+    concurrentes de la misma (tienda, búsqueda normalizada).
+
+    Los precios de cada respuesta de la tienda se guardan en el historial y
+    en el índice local (una vez por petición real, no por cada llamador ni
+    por acierto de caché).
+
+    Si el circuito de la tienda está abierto no se consulta (StoreSkipped);
+    si no, la consulta espera su turno en el limitador de la tienda
+    (StoreThrottled si no lo consigue a tiempo) y se corta en el timeout
+    adaptativo de la tienda.
+    """
+    key = (store, normalize_query(q))
+
+    async def fetch():
+        try:
+            items = await fetch_store_guarded(store, q)
+        except StoreError as e:
+            metrics.store_requests.inc(store=store, status=status_for(e))
+            raise
+        metrics.store_requests.inc(store=store, status=STATUS_OK)
+        metrics.items_parsed.inc(len(items), store=store)
+        price_history.record(store, items, query=q)
+        local_index.add(items)
+        return items
+
+    return await inflight.do(key, fetch)
+
+async def fetch_store_guarded(store: str, q: str):
+    """Consulta la tienda pasando por su circuito, su limitador y su timeout."""
+    breaker = breakers.get(store)
+    if not breaker.allow():
+        raise StoreSkipped(f"Circuito abierto, se reintenta en {breaker.retry_in():.0f}s")
+    timeout = breaker.timeout()
+    # Las fases de parseo se leen del registro de timings (abierto por el
+    # llamador o, en la precarga, aquí mismo)
+    timings = current_timings()
+    if timings is None:
+        timings = start_timings()
+    before = {phase: timings.get(phase, 0.0) for phase in PARSE_PHASES}
+    try:
+        async with limiters.get(store).slot():
+            # El timeout cuenta desde que se obtiene el turno, no desde la espera
+            started = time.perf_counter()
+            items = await asyncio.wait_for(STORES[store](q, http_clients.for_store(store)), timeout)
+    except StoreThrottled:
+        # No es una falla de la tienda: no cuenta para el circuito
+        breaker.release()
+        raise
+    except asyncio.TimeoutError as e:
+        error = StoreTimeout(f"Sin respuesta en {timeout:.1f}s")
+        breaker.record_failure(error)
+        raise error from e
+    except StoreError as e:
+        breaker.record_failure(e)
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    elapsed = time.perf_counter() - started
+    breaker.record_success(elapsed)
+    metrics.store_request_seconds.observe(elapsed, store=store)
+    for phase in PARSE_PHASES:
+        if phase in timings:
+            metrics.store_phase_seconds.observe(timings[phase] - before[phase], store=store, phase=phase)
+    return items
+
+async def fetch_store_cached(store: str, q: str):
+    """Consulta una tienda usando el caché por tienda con su propio TTL."""
+    cached = store_cache.get((store, normalize_query(q)))
+    if cached is not None:
+        return cached
+    return await refresh_store(store, q)
+
+async def fetch_store_or_stale(store: str, q: str):
+    """
+    Como fetch_store_cached, pero si el limitador de la tienda no deja
+    consultarla se sirve su última respuesta aunque esté vencida.
+
+    Returns:
+        (items, edad en segundos de la respuesta vencida o None si es fresca)
+
+    Raises:
+        StoreThrottled: si la tienda está limitada y no hay nada en caché
+    """
+    try:
+        return await fetch_store_cached(store, q), None
+    except StoreThrottled as e:
+        entry = store_cache.get_entry((store, normalize_query(q)))
+        if entry is None:
+            raise
+        items, age, _ = entry
+        logger.info(f"[Search] {store} limitada ({e}), se sirve caché de hace {age:.0f}s")
+        return items, age
+
+async def refresh_store(store: str, q: str):
+    """Consulta la tienda (sin mirar el caché) y guarda el resultado."""
+    items = await fetch_store_shared(store, q)
+    # Los fetchers lanzan StoreError al fallar: lo que llega aquí es válido
+    store_cache.set((store, normalize_query(q)), items, ttl=STORE_TTLS[store])
+    return items
+
+def merge_prefetched(q: str):
+    """
+    Rearma la respuesta combinada de una búsqueda con lo que hay en el
+    caché por tienda, para que /search también la encuentre caliente. Solo
+    si todas las tiendas tienen una respuesta fresca: si no, la próxima
+    búsqueda consulta las que falten.
+    """
+    key = normalize_query(q)
+    all_items = []
+    statuses = {}
+    for store in STORES:
+        entry = store_cache.peek((store, key))
+        if entry is None or entry[2]:
+            return
+        items = entry[0]
+        all_items.extend(items)
+        statuses[store] = {"status": STATUS_OK, "count": len(items), "elapsed_ms": 0}
+    cache_merged(key, build_response(all_items, statuses, q))
+
+# Precarga de las categorías y búsquedas populares (ver prefetch.py)
+prefetcher = PrefetchScheduler(
+    refresh=refresh_store,
+    ttl_left=lambda store, q: store_cache.ttl_left((store, normalize_query(q))),
+    stores=list(STORES),
+    merge=merge_prefetched,
+)
+
+async def gather_stores(q: str, stores: list, deadline_ms: int = 0):
+    """
+    Consulta las tiendas en paralelo con un presupuesto global.
+
+    Al vencer el presupuesto cancela las tiendas que no han terminado y
+    retorna lo que alcanzó a llegar.
+
+    Returns:
+        (items, statuses): items combinados y el estado por tienda
+        ({"status", "count", "elapsed_ms", "network_ms"?, "parse_ms"?,
+        "parse_queue_ms"?, "stale"?, "age"?, "error"?}) de todas las
+        tiendas, incluidas las omitidas. Una tienda limitada servida desde
+        caché vencido queda "ok" con `stale` y `age`.
+    """
+    started = time.perf_counter()
+    finished_at = {}
+    timings = {}
+    stale_ages = {}
+
+    async def run(store: str):
+        timings[store] = start_timings()
+        try:
+            items, age = await fetch_store_or_stale(store, q)
+            if age is not None:
+                stale_ages[store] = age
+            return items
+        finally:
+            finished_at[store] = time.perf_counter()
+
+    tasks = {store: asyncio.create_task(run(store)) for store in stores}
+    if tasks:
+        _, pending = await asyncio.wait(
+            tasks.values(), timeout=deadline_ms / 1000 if deadline_ms else None
+        )
+        for task in pending:
+            task.cancel()
+
+    all_items = []
+    statuses = {}
+    for store in STORES:
+        task = tasks.get(store)
+        if task is None:
+            statuses[store] = {"status": STATUS_SKIPPED, "count": 0, "elapsed_ms": 0}
+            continue
+        elapsed_ms = round((finished_at.get(store, time.perf_counter()) - started) * 1000)
+        if not task.done() or task.cancelled():
+            statuses[store] = {"status": STATUS_TIMEOUT, "count": 0, "elapsed_ms": elapsed_ms,
+                               "error": "Presupuesto de búsqueda agotado"}
+        elif task.exception() is not None:
+            error = task.exception()
+            logger.warning(f"[Search] Error en {store}: {error}")
+            statuses[store] = {"status": status_for(error), "count": 0, "elapsed_ms": elapsed_ms,
+                               "error": str(error)}
+        else:
+            store_items = task.result()
+            all_items.extend(store_items)
+            statuses[store] = {"status": STATUS_OK, "count": len(store_items), "elapsed_ms": elapsed_ms,
+                               **as_ms(timings[store])}
+            if store in stale_ages:
+                statuses[store].update(stale=True, age=round(stale_ages[store]))
+    return all_items, statuses
+
+def build_response(all_items: list, statuses: dict, q: str, limit: Optional[int] = None) -> dict:
+    """Respuesta combinada de /search: relevantes, el más barato y el estado por tienda."""
+    items = score_items(all_items, q, limit)
+    # El más barato entre los relevantes
+    cheapest = min(items, key=lambda x: x.price) if items else None
+    return {"items": items, "cheapest": cheapest, "stores": statuses}
+
+def serialize(response: dict) -> dict:
+    """Respuesta lista para JSON: los Product de `items` y `cheapest` pasan a dict."""
+    public = dict(response)
+    if "items" in public:
+        public["items"] = to_dicts(public["items"])
+    if public.get("cheapest") is not None:
+        public["cheapest"] = public["cheapest"].to_dict()
+    return public
+
+def with_groups(response: dict) -> dict:
+    """
+    Cambia `items` por `groups`: el mismo producto de varias tiendas en un
+    solo grupo con su oferta más barata (ver matching.py).
+    """
+    grouped = {key: value for key, value in response.items() if key != "items"}
+    grouped["count"] = len(response["items"])
+    grouped["groups"] = group_products(response["items"])
+    return grouped
+
+def parse_stores(stores: Optional[str]) -> list:
+    """
+    Tiendas pedidas en `?stores=` (separadas por coma, sin importar espacios
+    ni mayúsculas), en el orden de STORES; sin parámetro, todas. Un nombre
+    desconocido es un error 422 con la lista de tiendas válidas.
+    """
+    names = {name.strip().lower() for name in (stores or "").split(",")} - {""}
+    if not names:
+        return list(STORES)
+    unknown = sorted(names - set(STORES))
+    if unknown:
+        raise HTTPException(status_code=422, detail={
+            "error": f"Tiendas desconocidas: {', '.join(unknown)}",
+            "valid": list(STORES),
+        })
+    return [store for store in STORES if store in names]
+
+def all_ok(statuses: dict) -> bool:
+    """Todas las tiendas respondieron, y con datos frescos."""
+    return all(st["status"] == STATUS_OK and not st.get("stale") for st in statuses.values())
+
+def cache_merged(key: str, response: dict):
+    """
+    Guarda la respuesta combinada según el estado de las tiendas: con todas
+    frescas, por el TTL normal; si alguna viene de una respuesta vieja, ya
+    vencida (TTL 0), para que se sirva como `stale` y la próxima consulta
+    revalide; si alguna falló, no se guarda.
+    """
+    statuses = response["stores"]
+    if all_ok(statuses):
+        search_cache.set(key, response)
+    elif all(st["status"] == STATUS_OK for st in statuses.values()):
+        search_cache.set(key, response, ttl=0)
+
+async def collect_suggestions():
+    """
+    Datos para las sugerencias: las búsquedas del historial (solo las que
+    trajeron productos) con la frecuencia reciente de los usuarios y su
+    texto tal como lo escribieron, y los títulos del índice local.
+    """
+    try:
+        seen = await price_history.queries(since=time.time() - SUGGEST_HISTORY_DAYS * 86400)
+    except sqlite3.Error as e:
+        logger.warning(f"[Suggest] No se pudo leer el historial: {e}")
+        seen = []
+    queries = {key: (n, key) for key, n in seen}
+    for key, n, text in prefetcher.popular.items():
+        if key in queries:
+            queries[key] = (queries[key][0] + n, text)
+    return queries, local_index.titles()
+
+# Sugerencias por prefijo (ver suggest.py); "warm" si la búsqueda está en caché
+suggester = Suggester(collect_suggestions, is_warm=lambda key: search_cache.ttl_left(key) > 0)
+
+# Revalidaciones en segundo plano en curso, por búsqueda normalizada
+revalidating = {}
+
+def revalidate_search(q: str):
+    """
+    Refresca en segundo plano la respuesta combinada de una búsqueda
+    (stale-while-revalidate). Solo una revalidación por búsqueda a la vez;
+    cada tienda vencida se consulta una vez (singleflight) y las que siguen
+    frescas salen de su caché.
+    """
+    key = normalize_query(q)
+    if key in revalidating:
+        return
+    task = asyncio.create_task(_revalidate(q, key))
+    revalidating[key] = task
+    task.add_done_callback(lambda _: revalidating.pop(key, None))
+
+async def _revalidate(q: str, key: str):
+    all_items, statuses = await gather_stores(q, list(STORES))
+    # Las tiendas que fallaron entran con su última respuesta buena (vencida):
+    # las demás se actualizan igual y una falla nunca pisa con vacío la
+    # respuesta que se está sirviendo
+    failed = [store for store, st in statuses.items() if st["status"] != STATUS_OK]
+    # Leer la anterior no es servirla: no cuenta en las estadísticas del caché
+    previous = search_cache.peek(key) if failed else None
+    for store in failed:
+        last = last_good_items(store, key, previous)
+        if last is None:
+            logger.warning(f"[Search] Revalidación de '{q}' incompleta ({store} sin respuesta anterior), "
+                           f"se conserva la anterior")
+            return
+        items, age = last
+        all_items.extend(items)
+        statuses[store] = {"status": STATUS_OK, "count": len(items), "elapsed_ms": statuses[store]["elapsed_ms"],
+                           "stale": True, "age": round(age), "error": statuses[store].get("error")}
+    cache_merged(key, build_response(all_items, statuses, q))
+    if failed:
+        logger.info(f"[Search] '{q}' revalidada; {', '.join(failed)} con su respuesta anterior")
+    else:
+        logger.info(f"[Search] '{q}' revalidada")
+
+def last_good_items(store: str, key: str, previous: Optional[tuple]):
+    """
+    Última respuesta buena de la tienda para la búsqueda: la de su caché
+    (aunque esté vencida) o, si ya se desalojó, sus productos en la respuesta
+    combinada anterior.
+
+    Returns:
+        (items, edad en segundos) o None si no hay ninguna
+    """
+    entry = store_cache.get_entry((store, key))
+    if entry is not None:
+        items, age, _ = entry
+        return items, age
+    if previous is not None:
+        response, age, _ = previous
+        status = response["stores"].get(store)
+        if status is not None and status["status"] == STATUS_OK:
+            return [i for i in response["items"] if i.store == store], age + status.get("age", 0)
+    return None
+
 # -----------------------------
 # Endpoints
 # -----------------------------
@@ -247,54 +575,20 @@ def root():
 def calculate_match_score(title: str, query: str) -> int:
     """
     Calcula qué tan bien coincide el producto con la búsqueda.
-    Retorna un puntaje de 0-100.
+    Retorna un puntaje de 0-100 (ver scoring.QueryScorer).
     """
-    title_lower = title.lower()
-    query_lower = query.lower()
-    
-    # Extraer palabras clave (ignorar palabras comunes)
-    stop_words = ['el', 'la', 'de', 'para', 'con', 'en', 'y', 'un', 'una']
-    query_words = [w for w in query_lower.split() if w not in stop_words and len(w) > 2]
-    
-    if not query_words:
-        return 50
-    
-    score = 0
-    
-    # 1. Coincidencia exacta completa = +50 puntos
-    if query_lower in title_lower:
-        score += 50
-    
-    # 2. Todas las palabras clave presentes = +30 puntos
-    words_in_title = sum(1 for word in query_words if word in title_lower)
-    score += (words_in_title / len(query_words)) * 30
-    
-    # 3. Palabras al inicio del título = +20 puntos (más importante)
-    first_50_chars = title_lower[:50]
-    words_at_start = sum(1 for word in query_words if word in first_50_chars)
-    score += (words_at_start / len(query_words)) * 20
-    
-    # PENALIZACIONES (muy importante para filtrar)
-    
-    # 4. Penalizar accesorios si no se buscan explícitamente
-    accesorios = ['cable', 'cargador', 'funda', 'estuche', 'protector', 'vidrio', 
-                  'mica', 'auricular', 'audífono', 'holder', 'soporte', 'base']
-    if not any(acc in query_lower for acc in accesorios):
-        if any(acc in title_lower for acc in accesorios):
-            score -= 40  # Penalización fuerte
-    
-    # 5. Penalizar "reacondicionado" si no se busca
-    if 'reacondicionado' not in query_lower and 'reacondicionado' in title_lower:
-        score -= 20
-    
-    # 6. Penalizar si el título es muy corto (posible spam)
-    if len(title) < 15:
-        score -= 15
-    
-    return max(0, min(100, score))
+    return query_scorer(query).score(title)
 
 @app.get("/search")
-async def search(q: str = Query(..., min_length=1)):
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    deadline_ms: int = Query(SEARCH_DEADLINE_MS, ge=0),
+    stores: Optional[str] = Query(None, description="Tiendas separadas por coma (por defecto todas)"),
+    group: bool = Query(False, description="Agrupar el mismo producto de distintas tiendas"),
+    mode: str = Query("live", pattern="^(live|local)$", description="live: consulta las tiendas; local: solo el índice local"),
+    limit: int = Query(LOCAL_SEARCH_LIMIT, ge=1, le=LOCAL_MAX_LIMIT, description="Máximo de productos con mode=local"),
+):
     """
     Endpoint unificado. Busca en 6 tiendas colombianas:
     - MercadoLibre (scraping)
@@ -305,53 +599,323 @@ async def search(q: str = Query(..., min_length=1)):
     - Homecenter (scraping)
     
     Filtra automáticamente accesorios y productos irrelevantes.
+    
+    `stores` (parámetro) limita la búsqueda a esas tiendas; un nombre que no
+    existe responde 422 con la lista de tiendas válidas.
+    
+    Con `deadline_ms` retorna lo que haya llegado al vencer el presupuesto;
+    `stores` reporta el estado de cada tienda (ok / timeout / error / skipped /
+    throttled); una tienda limitada con caché vencido queda ok con `stale`.
+    
+    Si la respuesta en caché venció se retorna igual (`stale: true`, `age`
+    en segundos) y se revalida en segundo plano; una tienda que falla en la
+    revalidación queda con su respuesta anterior (ok con `stale`, `age` y
+    `error`).
+    
+    Con `group=true` retorna `groups` en lugar de `items`: los productos
+    equivalentes de distintas tiendas juntos, cada grupo con su oferta más
+    barata.
+    
+    Con `mode=local` no se consulta ninguna tienda: responde en milisegundos
+    con los productos ya vistos que guarda el índice local (cada uno con su
+    `seen_at`), con el mismo puntaje y orden, hasta `limit` productos. Una
+    búsqueda sin palabras clave (todas de 2 letras o menos) no se acepta en
+    modo local.
+    
+    La respuesta lleva un ETag de los resultados: si el cliente lo manda en
+    If-None-Match y nada cambió se responde 304 sin cuerpo. Se comprime con
+    gzip o brotli según Accept-Encoding (ver json_response.py).
     """
-    results = await asyncio.gather(
-        fetch_mercadolibre(q),
-        fetch_falabella(q),
-        fetch_exito(q),
-        fetch_olimpica(q),
-        fetch_alkosto(q),
-        fetch_homecenter(q),
-        return_exceptions=True  # Evitar que una tienda falle todo
-    )
+    started = time.perf_counter()
+    prefetcher.observe(q)
+    selected = parse_stores(stores)
+    if mode == "local":
+        return search_local(request, q, selected, group, limit, started)
+    cache_key = normalize_query(q)
+    if selected == list(STORES):
+        entry = search_cache.get_entry(cache_key)
+        if entry is not None:
+            cached, age, stale = entry
+            if stale:
+                # Stale-while-revalidate: se responde ya y se refresca por detrás
+                revalidate_search(q)
+            logger.info(f"[Search] '{q}' → caché{' vencido, revalidando' if stale else ''}")
+            if group:
+                cached = with_groups(cached)
+            elapsed = time.perf_counter() - started
+            metrics.search_seconds.observe(elapsed, cache="stale" if stale else "hit")
+            return send_search(request, cached, cached=True, stale=stale, age=round(age),
+                               elapsed_ms=round(elapsed * 1000))
+
+    all_items, statuses = await gather_stores(q, selected, deadline_ms)
+    response = build_response(all_items, statuses, q)
     
-    # Filtrar excepciones y combinar resultados
-    all_items = []
-    for result in results:
-        if isinstance(result, list):
-            all_items.extend(result)
-        elif isinstance(result, Exception):
-            print(f"[Search] Error en tienda: {result}")
+    logger.info(f"[Search] '{q}' → {len(response['items'])} productos relevantes")
     
+    cache_merged(cache_key, response)
+    if group:
+        response = with_groups(response)
+    elapsed = time.perf_counter() - started
+    metrics.search_seconds.observe(elapsed, cache="miss")
+    return send_search(request, response, cached=False, stale=False, age=0, elapsed_ms=round(elapsed * 1000))
+
+def search_etag(response: dict, mode: str) -> str:
+    """
+    ETag del conjunto de resultados: los productos (o grupos) y el estado de
+    cada tienda, no la edad ni los tiempos que cambian en cada consulta.
+    Se calcula sobre los Product, sin pasarlos a dict.
+    """
+    if "groups" in response:
+        results = response["groups"]
+    else:
+        results = [(i.title, i.price, i.url, i.thumbnail, i.store, i.match_score) for i in response["items"]]
+    statuses = {store: st["status"] for store, st in response["stores"].items()}
+    return etag_for([mode, results, statuses])
+
+def send_search(request: Request, response: dict, **extra):
+    """Responde /search con ETag (304 si el cliente ya tiene estos resultados) y comprimido."""
+    etag = search_etag(response, extra.get("mode", "live"))
+    sent = json_response(request, lambda: {**serialize(response), **extra}, etag=etag)
+    encoding = "not_modified" if sent.status_code == 304 else sent.headers.get("content-encoding", "identity")
+    metrics.search_responses.inc(encoding=encoding)
+    metrics.search_response_bytes.inc(len(sent.body), encoding=encoding)
+    return sent
+
+def search_local(request: Request, q: str, selected: list, group: bool, limit: int, started: float):
+    """/search?mode=local: la respuesta sale del índice local, sin red."""
+    if not query_scorer(q).keywords:
+        # Sin palabras clave todo el índice tendría puntaje 50
+        return {"error": "La búsqueda local necesita al menos una palabra de 3 letras o más"}
+    candidates = [item for item in local_index.candidates(q) if item.store in selected]
+    response = build_response(candidates, {}, q, limit)
+    logger.info(f"[Search] '{q}' → índice local, {len(response['items'])} productos relevantes")
+    if group:
+        response = with_groups(response)
+    elapsed = time.perf_counter() - started
+    metrics.search_seconds.observe(elapsed, cache="local")
+    return send_search(request, response, mode="local", indexed=len(local_index), cached=False, stale=False,
+                       age=0, elapsed_ms=round(elapsed * 1000))
+
+def score_items(all_items: list, q: str, limit: Optional[int] = None) -> list:
+    """
+    Filtra los items con precio, les calcula el match_score, descarta los
+    irrelevantes (< 30) y los ordena por relevancia y luego por precio.
+    Con `limit` retorna solo los `limit` primeros (heap acotado, sin
+    ordenar todos).
+    """
     # Filtrar items válidos (con precio)
-    items = [i for i in all_items if (i.get("price") or 0) > 0]
+    items = [i for i in all_items if i.price > 0]
+    discarded = Counter((i.store, "no_price") for i in all_items if not i.price > 0)
     
-    # Calcular score de relevancia para cada producto
-    for item in items:
-        item["match_score"] = calculate_match_score(item.get("title", ""), q)
+    # Calcular score de relevancia de todos los productos en un solo lote
+    # (copia del item: los originales viven en el caché por tienda)
+    scores = query_scorer(q).score_many([item.title for item in items])
+    items = [item.scored(score) for item, score in zip(items, scores)]
     
     # FILTRAR: Solo productos con score >= 30 (relevantes)
-    items = [i for i in items if i["match_score"] >= 30]
+    discarded.update((i.store, "low_score") for i in items if i.match_score < 30)
+    items = [i for i in items if i.match_score >= 30]
+    metrics.record_filtered(discarded)
     
     # Ordenar por relevancia primero, luego por precio
-    items.sort(key=lambda x: (-x["match_score"], x["price"]))
-    
-    # El más barato entre los relevantes
-    cheapest = min(items, key=lambda x: x["price"]) if items else None
+    if limit is not None:
+        return nsmallest(limit, items, key=lambda x: (-x.match_score, x.price))
+    items.sort(key=lambda x: (-x.match_score, x.price))
+    return items
+
+@app.get("/suggest")
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=SUGGEST_MAX_LIMIT),
+):
+    """
+    Sugerencias de búsqueda mientras se escribe: búsquedas que ya trajeron
+    productos y frases de los títulos vistos, por frecuencia. Las que tienen
+    respuesta en caché (`warm`) van primero.
+    """
+    started = time.perf_counter()
+    suggestions = suggester.suggest(prefix, limit)
+    return {"prefix": prefix, "suggestions": suggestions,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/search/stream")
+async def search_stream(request: Request, q: str = Query(..., min_length=1)):
+    """
+    Igual que /search pero en streaming NDJSON: emite un evento por tienda
+    apenas esa tienda termina y cierra con un evento final con el más barato.
+
+        {"type": "store", "store": "exito", "status": "ok", "items": [...]}
+        {"type": "store", "store": "falabella", "status": "error", "items": [], "error": "..."}
+        {"type": "done", "count": 12, "cheapest": {...}}
     
-    logger.info(f"[Search] '{q}' → {len(items)} productos relevantes")
+    Desde caché se emite un solo evento "cache" (con `stale` y `age`); si
+    estaba vencido se revalida en segundo plano como en /search.
     
-    return {"items": items, "cheapest": cheapest}
+    Se comprime con gzip o brotli según Accept-Encoding, sin demorar los
+    eventos (ver json_response.compress_stream).
+    """
+    cache_key = normalize_query(q)
+    prefetcher.observe(q)
+
+    async def events():
+        entry = search_cache.get_entry(cache_key)
+        if entry is not None:
+            cached, age, stale = entry
+            if stale:
+                revalidate_search(q)
+            cached = serialize(cached)
+            yield json.dumps({"type": "store", "store": "cache", "items": cached["items"],
+                              "stale": stale, "age": round(age)}) + "\n"
+            yield json.dumps({"type": "done", "count": len(cached["items"]), "cheapest": cached["cheapest"]}) + "\n"
+            return
+
+        started = time.perf_counter()
+
+        async def run(store: str):
+            timings = start_timings()
+            try:
+                items, age = await fetch_store_or_stale(store, q)
+                return store, items, age, None, timings
+            except Exception as e:
+                return store, [], None, e, timings
+
+        statuses = {}
+        tasks = [asyncio.create_task(run(store)) for store in STORES]
+        all_items = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                store, store_items, age, error, timings = await next_done
+                event = {"type": "store", "store": store, "status": STATUS_OK,
+                         "items": to_dicts(score_items(store_items, q))}
+                if error is not None:
+                    logger.warning(f"[Search] Error en {store}: {error}")
+                    event["status"] = status_for(error)
+                    event["error"] = str(error)
+                statuses[store] = {"status": event["status"], "count": len(store_items),
+                                   "elapsed_ms": round((time.perf_counter() - started) * 1000),
+                                   **as_ms(timings)}
+                if age is not None:
+                    event.update(stale=True, age=round(age))
+                    statuses[store].update(stale=True, age=round(age))
+                all_items.extend(store_items)
+                yield json.dumps(event) + "\n"
+        finally:
+            # Si el cliente se desconecta, no dejar tiendas colgadas
+            for task in tasks:
+                task.cancel()
+
+        response = build_response(all_items, statuses, q)
+        cache_merged(cache_key, response)
+        logger.info(f"[Search/stream] '{q}' → {len(response['items'])} productos relevantes")
+        cheapest = response["cheapest"].to_dict() if response["cheapest"] is not None else None
+        yield json.dumps({"type": "done", "count": len(response["items"]), "cheapest": cheapest}) + "\n"
+
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != ENCODING_IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress_stream(events(), encoding), media_type="application/x-ndjson", headers=headers)
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Contadores de aciertos/fallos de los cachés de búsqueda"""
+    return {
+        "search": search_cache.stats(),
+        "stores": store_cache.stats(),
+        "coalesced": inflight.shared,
+        "inflight": len(inflight),
+        "prefetch": prefetcher.stats(),
+        "local_index": local_index.stats(),
+        "suggest": suggester.stats(),
+    }
+
+@app.get("/stores/health")
+def stores_health():
+    """Estado del circuito, timeout adaptativo, latencias y limitador de cada tienda"""
+    health = breakers.stats()
+    for store, stats in limiters.stats().items():
+        health.setdefault(store, {})["limiter"] = stats
+    return health
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus (ver metrics.py)"""
+    for name, cache in (("search", search_cache), ("stores", store_cache)):
+        stats = cache.stats()
+        for result in ("hits", "stale_hits", "misses"):
+            metrics.cache_requests.set(stats[result], cache=name, result=result)
+        metrics.cache_hit_ratio.set(stats["hit_ratio"], cache=name)
+        metrics.cache_entries.set(stats["size"], cache=name)
+    for store, stats in breakers.stats().items():
+        metrics.breaker_open.set(int(stats["state"] != "closed"), store=store)
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# -----------------------------
+# Historial y tendencias de precio
+# -----------------------------
+HISTORY_DAYS_DEFAULT = float(os.getenv("HISTORY_DAYS_DEFAULT", "365"))
+PERCENTILES_PATTERN = r"^\d+(\.\d+)?(,\d+(\.\d+)?)*$"
+
+def parse_percentiles(percentiles: str) -> Optional[tuple]:
+    """"10,90" → (10.0, 90.0); None si alguno está fuera de 0-100."""
+    values = tuple(float(p) for p in percentiles.split(","))
+    return values if all(0 <= p <= 100 for p in values) else None
+
+@app.get("/history")
+async def history(
+    url: str = Query(..., min_length=1),
+    days: float = Query(HISTORY_DAYS_DEFAULT, gt=0),
+    points: int = Query(DEFAULT_POINTS, ge=2, le=1000),
+    percentiles: str = Query("10,25,75,90", pattern=PERCENTILES_PATTERN),
+):
+    """
+    Tendencia de precio de un producto (por url) en los últimos `days` días:
+    min/max/mediana/percentiles, último cambio de precio y la serie reducida
+    a lo sumo `points` puntos ([fecha unix, precio promedio]).
+    """
+    started = time.perf_counter()
+    pcts = parse_percentiles(percentiles)
+    if pcts is None:
+        return {"error": "Los percentiles deben estar entre 0 y 100"}
+    observations = await price_history.by_url(url, since=time.time() - days * 86400)
+    products = summarize_by_product(observations, percentiles=pcts, points=points)
+    if not products:
+        return {"url": url, "count": 0, "error": "Sin historial para esta url"}
+    return {**products[0], "elapsed_ms": round((time.perf_counter() - started) * 1000)}
+
+@app.get("/history/query")
+async def history_query(
+    q: str = Query(..., min_length=1),
+    days: float = Query(HISTORY_DAYS_DEFAULT, gt=0),
+    points: int = Query(DEFAULT_POINTS, ge=2, le=1000),
+    percentiles: str = Query("10,25,75,90", pattern=PERCENTILES_PATTERN),
+):
+    """
+    Tendencias de todos los productos vistos para una búsqueda (normalizada
+    como en el caché), del más barato al más caro según su último precio.
+    """
+    started = time.perf_counter()
+    pcts = parse_percentiles(percentiles)
+    if pcts is None:
+        return {"error": "Los percentiles deben estar entre 0 y 100"}
+    observations = await price_history.by_query(q, since=time.time() - days * 86400)
+    products = summarize_by_product(observations, percentiles=pcts, points=points)
+    return {
+        "query": normalize_query(q),
+        "count": len(products),
+        "observations": len(observations.points),
+        "products": products,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+    }
 
 # (Opcional) Endpoint de debug para inspeccionar la respuesta cruda de ML
 @app.get("/debug/ml")
 async def debug_ml(q: str):
     url = "https://api.mercadolibre.com/sites/MCO/search"
     params = {"q": q, "limit": 2}
-    async with httpx.AsyncClient(timeout=12, headers=HEADERS) as client:
-        r = await client.get(url, params=params)
-        return {"status": r.status_code, "sample": r.json()}
+    client = http_clients.for_url(url)
+    r = await client.get(url, params=params, headers=HEADERS, timeout=12)
+    return {"status": r.status_code, "sample": r.json()}
 
 # -----------------------------
 # OAuth MercadoLibre
@@ -401,32 +965,35 @@ async def meli_notifications(request: dict):
     # Aquí puedes procesar las notificaciones de cambios en órdenes, mensajes, etc.
     return {"ok": True}
 
+async def debug_store(store: str, q: str):
+    """Consulta una tienda sin caché y reporta el error en lugar de fallar."""
+    try:
+        data = await fetch_store_shared(store, q)
+    except StoreError as e:
+        return {"source": store, "status": status_for(e), "error": str(e), "count": 0, "items": []}
+    return {"source": store, "status": STATUS_OK, "count": len(data), "items": to_dicts(data)}
+
 @app.get("/debug/exito")
 async def debug_exito(q: str):
     """Endpoint de debug para verificar la integración con Éxito Colombia"""
-    data = await fetch_exito(q)
-    return {"source": "exito", "count": len(data), "items": data}
+    return await debug_store("exito", q)
 
 @app.get("/debug/falabella")
 async def debug_falabella(q: str):
     """Endpoint de debug para verificar la integración con Falabella Colombia"""
-    data = await fetch_falabella(q)
-    return {"source": "falabella", "count": len(data), "items": data}
+    return await debug_store("falabella", q)
 
 @app.get("/debug/olimpica")
 async def debug_olimpica(q: str):
     """Endpoint de debug para verificar la integración con Olímpica Colombia"""
-    data = await fetch_olimpica(q)
-    return {"source": "olimpica", "count": len(data), "items": data}
+    return await debug_store("olimpica", q)
 
 @app.get("/debug/alkosto")
 async def debug_alkosto(q: str):
     """Endpoint de debug para verificar la integración con Alkosto Colombia"""
-    data = await fetch_alkosto(q)
-    return {"source": "alkosto", "count": len(data), "items": data}
+    return await debug_store("alkosto", q)
 
 @app.get("/debug/homecenter")
 async def debug_homecenter(q: str):
     """Endpoint de debug para verificar la integración con Homecenter Colombia"""
-    data = await fetch_homecenter(q)
-    return {"source": "homecenter", "count": len(data), "items": data}
+    return await debug_store("homecenter", q)
@@ -0,0 +1,277 @@
+"""
+Agrupación de un mismo producto ofrecido por varias tiendas (/search?group=true).
+
+"Apple iPhone 15 (128 GB) - Negro" en MercadoLibre, "iPhone 15 128GB
+Negro" en Falabella y "Celular Apple iPhone 15 128 Gb" en Éxito son el
+mismo producto. Para agruparlos sin comparar todos contra todos:
+
+1. Cada título se normaliza (minúsculas, sin tildes ni signos, unidades
+   pegadas: "128 GB" → "128gb", 55" → "55in") y se reduce a sus palabras
+   útiles (sin colores ni palabras de relleno).
+2. De esas palabras se extraen las claves que deben coincidir: modelo
+   (palabras con dígitos), capacidad, tamaño en pulgadas, variante
+   (pro, max, plus...), reacondicionado, accesorio y moneda.
+3. Una firma MinHash por título y un índice LSH por bandas proponen como
+   candidatos solo los títulos que probablemente se parecen: tiempo casi
+   lineal en el número de productos.
+4. Cada candidato se confirma con la contención real de palabras y con
+   las claves, y se une con union-find. Las claves se llevan por grupo, así
+   un título sin capacidad no puede unir "128 GB" con "256 GB".
+
+Cada grupo retorna su oferta más barata y las ofertas de cada tienda en
+forma compacta (sin imagen ni puntaje), lo que además achica la respuesta.
+
+Configuración:
+    MATCH_NUM_PERM      permutaciones de MinHash                  (por defecto 32)
+    MATCH_BANDS         bandas del índice LSH                     (por defecto 16,
+                        debe dividir a MATCH_NUM_PERM)
+    MATCH_CONTAINMENT   palabras compartidas / palabras del menor (por defecto 0.75)
+"""
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from cache import normalize_query
+from filters import ACCESORIOS_PUNTAJE, REACONDICIONADO
+from product import Product
+
+MATCH_NUM_PERM = int(os.getenv("MATCH_NUM_PERM", "32"))
+MATCH_BANDS = int(os.getenv("MATCH_BANDS", "16"))
+MATCH_CONTAINMENT = float(os.getenv("MATCH_CONTAINMENT", "0.75"))
+
+# Cada banda toma MATCH_NUM_PERM / MATCH_BANDS valores de la firma: se
+# valida al importar para no fallar en la primera búsqueda agrupada
+if MATCH_BANDS < 1 or MATCH_NUM_PERM < 1 or MATCH_NUM_PERM % MATCH_BANDS:
+    raise ValueError(f"MATCH_NUM_PERM ({MATCH_NUM_PERM}) debe ser un múltiplo positivo de "
+                     f"MATCH_BANDS ({MATCH_BANDS})")
+
+# Primo de Mersenne 2^31-1: h * a + b cabe en int64 sin desbordar
+_PRIME = (1 << 31) - 1
+
+_UNITS = re.compile(r"\b(\d+(?:[.,]\d+)?)\s*(gb|tb|mb|kg|lb|mah|hz|w|l|lt|cm|mm|in|pulgadas|pulg|\"|'')(?=\W|$)")
+_NON_WORD = re.compile(r"[^a-z0-9.]+")
+_CAPACITY = re.compile(r"^(\d+)(gb|tb)$")
+_SIZE = re.compile(r"^(\d+(?:\.\d+)?)in$")
+_DIGIT = re.compile(r"\d")
+# Conectividad y resolución: no distinguen un modelo de otro
+_GENERIC_CODES = re.compile(r"^(\d+g|\d+k|\d+p|\d+hz|\d+mah|\d+w)$")
+
+VARIANTS = frozenset(["pro", "max", "plus", "mini", "ultra", "lite", "se", "fe", "air", "neo"])
+COLORS = frozenset([
+    "negro", "blanco", "azul", "rojo", "verde", "gris", "plateado", "plata", "dorado", "oro",
+    "rosado", "rosa", "morado", "lila", "amarillo", "naranja", "beige", "grafito", "medianoche",
+    "black", "white", "blue", "red", "green", "gray", "grey", "silver", "gold", "pink", "purple",
+    "midnight", "starlight", "titanio", "titanium", "natural", "negra", "blanca",
+])
+NOISE = frozenset([
+    "el", "la", "los", "las", "de", "del", "para", "con", "en", "y", "un", "una", "color",
+    "celular", "smartphone", "telefono", "nuevo", "nueva", "original", "libre", "liberado",
+    "envio", "gratis", "oferta", "version", "distribuidor", "autorizado", "garantia", "ram",
+    "memoria", "interna", "gb", "tb", "x",
+])
+
+
+class TitleFeatures(NamedTuple):
+    tokens: FrozenSet[str]      # palabras útiles del título (para MinHash y contención)
+    models: FrozenSet[str]      # palabras con dígitos que identifican el modelo
+    capacity: Optional[int]     # almacenamiento en GB (la mayor capacidad del título)
+    size: Optional[str]         # pulgadas
+    variants: FrozenSet[str]    # pro, max, plus...
+    flags: tuple                # (reacondicionado, accesorio, moneda): deben ser iguales
+
+
+def normalize_title(title: str) -> str:
+    """Minúsculas, sin tildes ni signos y con las unidades pegadas al número."""
+    text = normalize_query(title or "")
+    text = _UNITS.sub(lambda m: m.group(1).replace(",", ".") + _unit(m.group(2)), text)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _unit(unit: str) -> str:
+    if unit in ('"', "''", "pulgadas", "pulg"):
+        return "in"
+    if unit == "lt":
+        return "l"
+    return unit
+
+
+@lru_cache(maxsize=4096)
+def title_features(title: str, currency: str = "") -> TitleFeatures:
+    """Claves de un título; se cachean porque los mismos títulos vuelven en cada búsqueda."""
+    normalized = normalize_title(title)
+    words = [w.strip(".") for w in normalized.split()]
+    tokens = frozenset(w for w in words if w and w not in COLORS and w not in NOISE)
+
+    capacities = []
+    size = None
+    models = set()
+    for token in tokens:
+        capacity = _CAPACITY.match(token)
+        if capacity:
+            capacities.append(int(capacity.group(1)) * (1024 if capacity.group(2) == "tb" else 1))
+            continue
+        if _SIZE.match(token):
+            size = token
+            continue
+        if _DIGIT.search(token) and not _GENERIC_CODES.match(token):
+            models.add(token)
+
+    lower = title.lower()
+    return TitleFeatures(
+        tokens=tokens,
+        models=frozenset(models),
+        capacity=max(capacities) if capacities else None,
+        size=size,
+        variants=tokens & VARIANTS,
+        flags=(REACONDICIONADO in lower, ACCESORIOS_PUNTAJE.matches(lower), currency or ""),
+    )
+
+
+def _models_compatible(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """Iguales, o uno contiene al otro ("15" y "15 a3090"); vacío solo con vacío."""
+    if a == b:
+        return True
+    return bool(a) and bool(b) and (a <= b or b <= a)
+
+
+def compatible(a: TitleFeatures, b: TitleFeatures) -> bool:
+    """Las claves de los dos títulos (o grupos) no se contradicen."""
+    return (
+        a.flags == b.flags
+        and a.variants == b.variants
+        and (a.capacity is None or b.capacity is None or a.capacity == b.capacity)
+        and (a.size is None or b.size is None or a.size == b.size)
+        and _models_compatible(a.models, b.models)
+    )
+
+
+def merge(a: TitleFeatures, b: TitleFeatures) -> TitleFeatures:
+    """Claves de un grupo: las más específicas de sus miembros."""
+    return a._replace(
+        models=a.models | b.models,
+        capacity=a.capacity if a.capacity is not None else b.capacity,
+        size=a.size or b.size,
+    )
+
+
+def containment(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Palabras compartidas sobre las del título más corto."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+class MinHasher:
+    """Firmas MinHash de conjuntos de palabras, todas a la vez con NumPy."""
+
+    def __init__(self, num_perm: int = MATCH_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    def signatures(self, token_sets: Sequence[FrozenSet[str]]) -> np.ndarray:
+        """(conjuntos, num_perm); los conjuntos vacíos no deben llegar aquí."""
+        counts = np.array([len(tokens) for tokens in token_sets], dtype=np.int64)
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode()) % _PRIME for tokens in token_sets for token in tokens),
+            dtype=np.int64, count=int(counts.sum()),
+        )
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % _PRIME
+        starts = np.cumsum(counts) - counts
+        return np.minimum.reduceat(permuted, starts, axis=0)
+
+
+class LSHIndex:
+    """
+    Índice LSH por bandas: dos firmas son candidatas si coinciden en todas
+    las filas de al menos una banda.
+    """
+
+    def __init__(self, bands: int = MATCH_BANDS):
+        self.bands = bands
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def add(self, key: int, signature: np.ndarray) -> List[int]:
+        """Agrega una firma y retorna las ya indexadas que comparten alguna banda."""
+        candidates = []
+        # num_perm debe ser múltiplo de bands (filas iguales por banda)
+        for bucket, band in zip(self._buckets, signature.reshape(self.bands, -1)):
+            members = bucket.setdefault(band.tobytes(), [])
+            candidates.extend(members)
+            members.append(key)
+        return candidates
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> int:
+        """Une los grupos; la raíz es la de menor índice (el más relevante)."""
+        ra, rb = self.find(a), self.find(b)
+        if ra > rb:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        return ra
+
+
+def group_products(items: List[Product], containment_min: float = MATCH_CONTAINMENT) -> List[Dict]:
+    """
+    Agrupa los productos equivalentes de distintas tiendas.
+
+    `items` (product.Product) viene ordenado por relevancia (score_items):
+    los grupos salen en el orden de su producto más relevante.
+
+    Returns:
+        [{"title", "cheapest", "price_min", "price_max", "count", "stores",
+          "offers": [{"source", "price", "url"}, ...]}]
+    """
+    features = [title_features(item.title, item.currency) for item in items]
+    indexed = [i for i, f in enumerate(features) if f.tokens]
+    groups = UnionFind(len(items))
+    group_features = dict(enumerate(features))
+
+    if indexed:
+        signatures = MinHasher().signatures([features[i].tokens for i in indexed])
+        index = LSHIndex()
+        for row, i in enumerate(indexed):
+            for j in set(index.add(i, signatures[row])):
+                ri, rj = groups.find(i), groups.find(j)
+                if ri == rj:
+                    continue
+                if not compatible(group_features[ri], group_features[rj]):
+                    continue
+                if containment(features[i].tokens, features[j].tokens) < containment_min:
+                    continue
+                root = groups.union(ri, rj)
+                group_features[root] = merge(group_features[ri], group_features[rj])
+
+    members: Dict[int, List[int]] = {}
+    for i in range(len(items)):
+        members.setdefault(groups.find(i), []).append(i)
+
+    result = []
+    for root in sorted(members):
+        offers = sorted((items[i] for i in members[root]), key=lambda item: item.price)
+        cheapest = offers[0]
+        result.append({
+            "title": items[root].title,
+            "cheapest": cheapest.to_dict(),
+            "price_min": cheapest.price,
+            "price_max": offers[-1].price,
+            "count": len(offers),
+            "stores": sorted({offer.source for offer in offers}),
+            "offers": [{"source": offer.source, "price": offer.price, "url": offer.url} for offer in offers],
+        })
+    return result
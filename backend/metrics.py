@@ -0,0 +1,269 @@
+"""
+Métricas en formato de texto de Prometheus para GET /metrics.
+
+Contadores, gauges e histogramas mínimos (sin prometheus_client) y las
+métricas del comparador:
+
+- peticiones por tienda y resultado (ok / timeout / error / skipped / throttled);
+- códigos HTTP y bytes descargados por tienda;
+- histogramas de latencia por tienda y fase: connect (TCP+TLS, solo
+  cuando se abre una conexión), wait (hasta los headers), download
+  (cuerpo), parse (medido en el worker) y parse_queue (espera por el
+  pool de parseo);
+- productos parseados y descartados por motivo (accessory, out_of_stock,
+  future_model, parse_error, no_price, low_score);
+- aciertos de los cachés, respuestas de /search por codificación (y 304)
+  y retraso del event loop.
+
+Las fases connect/wait/download las mide InstrumentedTransport (ver
+http_clients.py) con la extensión "trace" de httpx; parse y parse_queue
+salen del registro de timings.py.
+
+Los parsers no tocan estos contadores (con PARSE_EXECUTOR=process correrían
+en otro proceso): retornan sus descartes y executor.run_parser los suma.
+
+Configuración:
+    METRICS_LOOP_INTERVAL   segundos entre mediciones del event loop   (por defecto 0.5)
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("uvicorn.error")
+
+METRICS_LOOP_INTERVAL = float(os.getenv("METRICS_LOOP_INTERVAL", "0.5"))
+
+# Latencias de red/parseo: de 1 ms a 15 s
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base: nombre, ayuda y nombres de etiquetas. Seguro entre hilos (pool de parseo)."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        """Para contadores que se llevan en otro lado (p. ej. los de TTLCache)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteos por bucket (el último es +Inf), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self._series.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {n}"
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """
+    Mide el retraso del event loop: duerme `interval` y anota cuánto tardó
+    de más en despertar (lo que bloqueó el loop mientras tanto).
+    """
+
+    def __init__(self, histogram: Histogram, gauge: Gauge, interval: float = METRICS_LOOP_INTERVAL):
+        self.histogram = histogram
+        self.gauge = gauge
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.histogram.observe(lag)
+            self.gauge.set(lag)
+
+
+# Métricas de la app (compartidas por main, http_clients y los fetchers)
+registry = Registry()
+
+store_requests = registry.counter(
+    "cocheap_store_requests_total", "Consultas a las tiendas por resultado", ("store", "status"))
+store_request_seconds = registry.histogram(
+    "cocheap_store_request_seconds", "Duración total de la consulta a una tienda", ("store",))
+store_phase_seconds = registry.histogram(
+    "cocheap_store_phase_seconds", "Duración por fase (connect, wait, download, parse, parse_queue)", ("store", "phase"))
+upstream_responses = registry.counter(
+    "cocheap_upstream_responses_total", "Respuestas HTTP de las tiendas por código", ("store", "code"))
+upstream_connections = registry.counter(
+    "cocheap_upstream_connections_total", "Conexiones nuevas abiertas hacia las tiendas", ("store",))
+upstream_bytes = registry.counter(
+    "cocheap_upstream_bytes_total", "Bytes descargados de las tiendas", ("store",))
+upstream_response_bytes = registry.histogram(
+    "cocheap_upstream_response_bytes", "Tamaño de cada respuesta descargada", ("store",), BYTES_BUCKETS)
+items_parsed = registry.counter(
+    "cocheap_items_parsed_total", "Productos válidos retornados por los parsers", ("store",))
+items_filtered = registry.counter(
+    "cocheap_items_filtered_total", "Productos descartados por motivo", ("store", "reason"))
+cache_requests = registry.counter(
+    "cocheap_cache_requests_total", "Consultas a los cachés por resultado", ("cache", "result"))
+cache_hit_ratio = registry.gauge(
+    "cocheap_cache_hit_ratio", "Aciertos frescos / consultas de cada caché", ("cache",))
+cache_entries = registry.gauge(
+    "cocheap_cache_entries", "Entradas en cada caché", ("cache",))
+search_seconds = registry.histogram(
+    "cocheap_search_seconds", "Duración de /search por origen de la respuesta", ("cache",))
+search_responses = registry.counter(
+    "cocheap_search_responses_total", "Respuestas de /search por codificación (identity, gzip, br, not_modified)",
+    ("encoding",))
+search_response_bytes = registry.counter(
+    "cocheap_search_response_bytes_total", "Bytes enviados por /search por codificación", ("encoding",))
+breaker_open = registry.gauge(
+    "cocheap_breaker_open", "1 si el circuito de la tienda no está cerrado", ("store",))
+loop_lag_seconds = registry.histogram(
+    "cocheap_event_loop_lag_seconds", "Retraso del event loop", (), LOOP_LAG_BUCKETS)
+loop_lag_last = registry.gauge(
+    "cocheap_event_loop_lag_last_seconds", "Última medición del retraso del event loop")
+
+loop_lag = LoopLagMonitor(loop_lag_seconds, loop_lag_last)
+
+
+def record_filtered(discarded: Dict[Tuple[str, str], int]):
+    """Suma los productos descartados por (tienda, motivo) por un parser o por el puntaje."""
+    for (store, reason), count in discarded.items():
+        items_filtered.inc(count, store=store, reason=reason)
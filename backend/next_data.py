@@ -0,0 +1,238 @@
+"""
+Descarga en streaming de páginas Next.js hasta el <script id="__NEXT_DATA__">.
+
+En lugar de bajar todo el HTML a `response.text` y correr un regex sobre
+el documento completo, se leen los bytes a medida que llegan, se descarta
+lo que ya se revisó antes del script y se corta la descarga apenas llega
+el </script> que lo cierra. Solo se conserva en memoria el JSON embebido.
+
+`iter_json_array` decodifica luego solo la parte del JSON que se necesita.
+"""
+import json
+import re
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence
+
+import httpx
+
+from store_errors import StoreError
+
+NEXT_DATA_OPEN = b'<script id="__NEXT_DATA__"'
+SCRIPT_CLOSE = b'</script>'
+
+
+class NextDataScan(NamedTuple):
+    payload: Optional[bytearray]  # JSON de __NEXT_DATA__ (json.loads acepta bytearray)
+    bytes_read: int                # bytes descargados (menos que la página si se cortó)
+    markers: frozenset             # marcadores extra vistos antes de cortar
+
+
+def _find(buf: bytearray, needle: bytes, start: int) -> int:
+    # Retrocede len(needle) para no perder un marcador partido entre chunks
+    return buf.find(needle, max(0, start - len(needle)))
+
+
+class NextDataScanner:
+    """
+    Búsqueda incremental de __NEXT_DATA__, sin red: recibe los bytes de la
+    página a medida que llegan (`feed`) y avisa cuando ya tiene el JSON
+    completo. stream_next_data la alimenta con la descarga; los benchmarks,
+    con una página ya descargada (ver scan_next_data).
+    """
+
+    def __init__(self, markers: Sequence[bytes] = ()):
+        self.markers = tuple(markers)
+        self._keep = max([len(NEXT_DATA_OPEN)] + [len(m) for m in self.markers])
+        self._buf = bytearray()
+        self._seen = set()
+        self._open_found = False
+        self._content_start = -1
+        self.bytes_read = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Procesa un chunk; True si ya se cerró el script (se puede cortar)."""
+        buf = self._buf
+        scanned = len(buf)
+        buf += chunk
+        self.bytes_read += len(chunk)
+
+        for marker in self.markers:
+            if marker not in self._seen and _find(buf, marker, scanned) != -1:
+                self._seen.add(marker)
+
+        if self._content_start == -1:
+            if not self._open_found:
+                open_at = _find(buf, NEXT_DATA_OPEN, scanned)
+                if open_at == -1:
+                    # Aún no aparece: solo se guarda la cola por si el marcador viene partido
+                    del buf[:-self._keep]
+                    return False
+                del buf[:open_at]
+                self._open_found = True
+            tag_end = buf.find(b">")
+            if tag_end == -1:
+                return False
+            del buf[:tag_end + 1]
+            self._content_start = 0
+            scanned = 0
+
+        close_at = _find(buf, SCRIPT_CLOSE, scanned)
+        if close_at != -1:
+            del buf[close_at:]
+            self.done = True
+        return self.done
+
+    def result(self) -> NextDataScan:
+        return NextDataScan(self._buf if self.done else None, self.bytes_read, frozenset(self._seen))
+
+
+async def stream_next_data(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    timeout: float,
+    markers: Sequence[bytes] = (),
+) -> NextDataScan:
+    """
+    Descarga `url` hasta extraer el JSON de __NEXT_DATA__.
+
+    Args:
+        markers: otros marcadores (bytes) que interesa saber si aparecen
+            antes del corte, p. ej. b"window.__RUNTIME__"
+
+    Raises:
+        StoreError: si la respuesta no es 200
+    """
+    scanner = NextDataScanner(markers)
+    async with client.stream("GET", url, headers=headers, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise StoreError(f"HTTP {response.status_code}")
+
+        async for chunk in response.aiter_bytes():
+            if scanner.feed(chunk):
+                # Corta la descarga: el resto de la página no hace falta
+                break
+    return scanner.result()
+
+
+def scan_next_data(page: bytes, markers: Sequence[bytes] = (), chunk_size: int = 65536) -> NextDataScan:
+    """Como stream_next_data, pero sobre una página ya descargada (en chunks como la red)."""
+    scanner = NextDataScanner(markers)
+    for start in range(0, len(page), chunk_size):
+        if scanner.feed(page[start:start + chunk_size]):
+            break
+    return scanner.result()
+
+
+# -----------------------------
+# Decodificación incremental
+# -----------------------------
+_decoder = json.JSONDecoder()
+_WS = re.compile(r"[ \t\n\r]*")
+# Para saltar valores sin construirlos (_skip_value): un string completo
+# (con escapes), un número / true / false / null, y todo lo que hay hasta
+# la próxima llave o corchete que abre o cierra un objeto con otros dentro;
+# los strings y los objetos/arreglos sin anidados ({"title": .., "count": ..})
+# se consumen enteros en la misma regex
+_STR = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_OTHER = r'[^"{}\[\]]'
+_LEAF = rf'\{{{_OTHER}*(?:{_STR}{_OTHER}*)*\}}|\[{_OTHER}*(?:{_STR}{_OTHER}*)*\]'
+_STRING = re.compile(_STR)
+_SCALAR = re.compile(r'[^\s,\]}]+')
+_BETWEEN = re.compile(rf'{_OTHER}*(?:(?:{_STR}|{_LEAF}){_OTHER}*)*')
+
+
+def _skip_ws(text: str, i: int) -> int:
+    return _WS.match(text, i).end()
+
+
+def _expect(text: str, i: int, char: str) -> int:
+    if text[i:i + 1] != char:
+        raise ValueError(f"Se esperaba {char!r} en la posición {i}")
+    return i + 1
+
+
+def _skip_value(text: str, i: int) -> int:
+    """
+    Posición siguiente al valor JSON que empieza en `i`, sin construirlo:
+    en objetos y arreglos se cuentan llaves y corchetes, saltando de una vez
+    (con una regex) todo lo que hay entre uno y otro, strings y objetos
+    sin anidados incluidos.
+    No valida el valor; si está mal formado falla más adelante o al
+    decodificar lo que sí se usa.
+    """
+    char = text[i:i + 1]
+    if char not in ("{", "["):
+        match = (_STRING if char == '"' else _SCALAR).match(text, i)
+        if match is None:
+            raise ValueError(f"JSON incompleto en la posición {i}")
+        return match.end()
+    depth = 0
+    while True:
+        char = text[i:i + 1]
+        if char in ("{", "["):
+            depth += 1
+        elif char in ("}", "]"):
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        else:
+            # Un string sin cerrar o el final del texto
+            raise ValueError(f"JSON incompleto en la posición {i}")
+        i = _BETWEEN.match(text, i + 1).end()
+
+
+def _seek_member(text: str, i: int, key: str) -> int:
+    """
+    Recorre los miembros del objeto que empieza en `i` (justo después de
+    la llave de apertura) hasta `key` y retorna la posición de su valor.
+    Los valores de las demás claves se saltan sin decodificarlos (ver
+    _skip_value): solo se decodifican los nombres de las claves.
+    """
+    i = _skip_ws(text, i)
+    if text[i:i + 1] == "}":
+        raise KeyError(key)
+    while True:
+        name, i = _decoder.raw_decode(text, i)
+        i = _expect(text, _skip_ws(text, i), ":")
+        i = _skip_ws(text, i)
+        if name == key:
+            return i
+        i = _skip_ws(text, _skip_value(text, i))
+        if text[i:i + 1] == "}":
+            raise KeyError(key)
+        i = _skip_ws(text, _expect(text, i, ","))
+
+
+def iter_json_array(payload, path: Sequence[str]) -> Iterator:
+    """
+    Itera los elementos del arreglo JSON en `path` sin decodificar el
+    documento completo.
+
+    Camina directo por las claves de `path` (saltando los valores hermanos
+    sin construirlos) y entrega cada elemento del arreglo a medida que se decodifica: si el
+    consumidor deja de iterar, el resto del documento nunca se parsea.
+
+    Si la ruta no existe o no es un arreglo no entrega nada, igual que
+    `data.get(...).get(..., [])`.
+    """
+    text = payload.decode("utf-8") if isinstance(payload, (bytes, bytearray)) else payload
+    try:
+        i = _expect(text, _skip_ws(text, 0), "{")
+        for depth, key in enumerate(path):
+            i = _seek_member(text, i, key)
+            if depth < len(path) - 1:
+                i = _expect(text, i, "{")
+        i = _skip_ws(text, _expect(text, i, "["))
+    except (KeyError, ValueError):
+        return
+
+    if text[i:i + 1] == "]":
+        return
+    while True:
+        item, i = _decoder.raw_decode(text, i)
+        yield item
+        i = _skip_ws(text, i)
+        if text[i:i + 1] != ",":
+            return
+        i = _skip_ws(text, i + 1)
@@ -0,0 +1,222 @@
+"""
+Precarga en segundo plano de las búsquedas más pedidas.
+
+Cada cierto intervalo (con jitter) refresca en el caché por tienda las
+búsquedas de las categorías de la página de inicio (CategoryWall.tsx) y
+las N búsquedas más frecuentes de los usuarios, para que lleguen siempre
+a un caché caliente en lugar de disparar la consulta a las seis tiendas.
+
+Solo se refrescan las entradas que expirarían antes del siguiente ciclo,
+y cada tienda tiene su propio tope de peticiones simultáneas para no
+saturarla con la precarga. Al terminar el ciclo se rearma la respuesta
+combinada (caché de /search) de cada búsqueda refrescada.
+
+Está apagada por defecto: consulta las tiendas reales cada intervalo, así
+que se activa solo donde se quiere (PREFETCH_ENABLED=1 en producción).
+
+Configuración:
+    PREFETCH_ENABLED            1 / 0                                 (por defecto 0)
+    PREFETCH_QUERIES            búsquedas fijas separadas por coma    (por defecto las categorías)
+    PREFETCH_TOP_N              búsquedas populares a incluir         (por defecto 20)
+    PREFETCH_INTERVAL           segundos entre ciclos                 (por defecto 240)
+    PREFETCH_JITTER             fracción aleatoria del intervalo      (por defecto 0.1)
+    PREFETCH_INITIAL_DELAY      segundos antes del primer ciclo       (por defecto 10)
+    PREFETCH_STORE_CONCURRENCY  peticiones simultáneas por tienda     (por defecto 2)
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache import normalize_query
+
+logger = logging.getLogger("uvicorn.error")
+
+# Las mismas búsquedas que envía la página de inicio (src/components/landing/CategoryWall.tsx)
+CATEGORY_QUERIES = ["iphone", "laptop", "electrodomesticos", "televisor", "videojuegos", "hogar", "mercado"]
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0").lower() in ("1", "true", "yes")
+PREFETCH_QUERIES = [q.strip() for q in os.getenv("PREFETCH_QUERIES", ",".join(CATEGORY_QUERIES)).split(",") if q.strip()]
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "240"))
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.1"))
+PREFETCH_INITIAL_DELAY = float(os.getenv("PREFETCH_INITIAL_DELAY", "10"))
+PREFETCH_STORE_CONCURRENCY = int(os.getenv("PREFETCH_STORE_CONCURRENCY", "2"))
+
+
+class QueryCounter:
+    """
+    Frecuencia de las búsquedas de los usuarios, por búsqueda normalizada.
+
+    Los conteos se reducen a la mitad en cada `decay()` para que "popular"
+    signifique popular recientemente, y se guarda la última forma escrita
+    por el usuario (con tildes) para consultar las tiendas con ella.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.counts: Counter = Counter()
+        self._raw: Dict[str, str] = {}
+
+    def add(self, q: str):
+        key = normalize_query(q)
+        if not key:
+            return
+        self.counts[key] += 1
+        self._raw[key] = q.strip()
+        if len(self.counts) > self.maxsize:
+            # Conserva la mitad más frecuente
+            for key, _ in self.counts.most_common()[self.maxsize // 2:]:
+                del self.counts[key]
+                del self._raw[key]
+
+    def top(self, n: int) -> List[str]:
+        """Las `n` búsquedas más frecuentes, tal como las escribió el usuario."""
+        return [self._raw[key] for key, _ in self.counts.most_common(n)]
+
+    def items(self) -> List[Tuple[str, int, str]]:
+        """(búsqueda normalizada, frecuencia, texto del usuario) de cada búsqueda."""
+        return [(key, n, self._raw[key]) for key, n in self.counts.items()]
+
+    def decay(self):
+        for key in list(self.counts):
+            self.counts[key] //= 2
+            if not self.counts[key]:
+                del self.counts[key]
+                del self._raw[key]
+
+
+class PrefetchScheduler:
+    """
+    Refresca periódicamente (búsqueda, tienda) en el caché.
+
+    Args:
+        refresh: corrutina refresh(store, q) que consulta la tienda y guarda
+            el resultado en el caché
+        ttl_left: ttl_left(store, q) -> segundos que le quedan a la entrada
+        stores: tiendas a refrescar
+        merge: merge(q) que rearma la respuesta combinada de una búsqueda
+            después de refrescarla (opcional)
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str, str], Awaitable],
+        ttl_left: Callable[[str, str], float],
+        stores: Sequence[str],
+        queries: Sequence[str] = PREFETCH_QUERIES,
+        top_n: int = PREFETCH_TOP_N,
+        interval: float = PREFETCH_INTERVAL,
+        jitter: float = PREFETCH_JITTER,
+        initial_delay: float = PREFETCH_INITIAL_DELAY,
+        store_concurrency: int = PREFETCH_STORE_CONCURRENCY,
+        merge: Optional[Callable[[str], None]] = None,
+    ):
+        self.refresh = refresh
+        self.ttl_left = ttl_left
+        self.merge = merge
+        self.stores = list(stores)
+        self.queries = list(queries)
+        self.top_n = top_n
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+        self.popular = QueryCounter()
+        self._semaphores = {store: asyncio.Semaphore(store_concurrency) for store in self.stores}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_cycle_ms = 0
+
+    def observe(self, q: str):
+        """Cuenta una búsqueda de un usuario (para el top N)."""
+        self.popular.add(q)
+
+    def targets(self) -> List[str]:
+        """Búsquedas a precargar: las fijas más las populares, sin repetir."""
+        seen = set()
+        targets = []
+        for q in self.queries + self.popular.top(self.top_n):
+            key = normalize_query(q)
+            if key and key not in seen:
+                seen.add(key)
+                targets.append(q)
+        return targets
+
+    def start(self):
+        """Arranca el ciclo de precarga (dentro del event loop)."""
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"[Prefetch] Cada {self.interval:.0f}s: {len(self.queries)} búsquedas fijas + top {self.top_n}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"[Prefetch] Error en el ciclo: {e}")
+            self.popular.decay()
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            await asyncio.sleep(delay)
+
+    async def run_once(self):
+        """Un ciclo: refresca las entradas que expirarían antes del siguiente."""
+        started = time.perf_counter()
+        horizon = self.interval * (1 + self.jitter)
+        jobs = []
+        refreshed = []
+        for q in self.targets():
+            before = len(jobs)
+            for store in self.stores:
+                if self.ttl_left(store, q) > horizon:
+                    self.skipped += 1
+                    continue
+                jobs.append(self._refresh_one(store, q))
+            if len(jobs) > before:
+                refreshed.append(q)
+        await asyncio.gather(*jobs)
+        if self.merge is not None:
+            for q in refreshed:
+                try:
+                    self.merge(q)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"[Prefetch] Respuesta combinada de '{q}': {e}")
+        self.cycles += 1
+        self.last_cycle_ms = round((time.perf_counter() - started) * 1000)
+        logger.info(f"[Prefetch] Ciclo {self.cycles}: {len(jobs)} refrescos en {self.last_cycle_ms} ms")
+
+    async def _refresh_one(self, store: str, q: str):
+        async with self._semaphores[store]:
+            try:
+                await self.refresh(store, q)
+                self.refreshed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"[Prefetch] {store} '{q}': {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._task is not None,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_cycle_ms": self.last_cycle_ms,
+            "targets": len(self.targets()),
+        }
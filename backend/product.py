@@ -0,0 +1,103 @@
+"""
+Producto de una tienda: el registro que arman los fetchers y que pasa por
+el caché, el puntaje, la agrupación, el historial y el índice local.
+
+Un objeto con __slots__ pesa menos de la mitad que el dict equivalente y
+los nombres de tienda y moneda se internan (una sola copia del string
+para todos los productos). Los productos no se modifican una vez creados:
+el puntaje crea una copia con `scored`, así los del caché por tienda
+siguen intactos.
+
+La conversión a JSON se hace solo al responder (`to_dict`), con un esquema
+único para el frontend:
+
+    {"title", "price", "currency", "url", "thumbnail", "source", "store",
+     "match_score"?, "seen_at"?}
+
+`source` es el nombre para mostrar ("Éxito") y `store` la llave interna
+("exito"); `match_score` solo en los resultados puntuados y `seen_at`
+solo en los que salen del índice local.
+"""
+import sys
+from typing import Dict, Iterable, List, Optional, Union
+
+# Nombre para mostrar de cada tienda (la llave es la de main.STORES)
+STORE_NAMES = {
+    "mercadolibre": "MercadoLibre",
+    "falabella": "Falabella",
+    "exito": "Éxito",
+    "olimpica": "Olímpica",
+    "alkosto": "Alkosto",
+    "homecenter": "Homecenter",
+    "bestbuy": "BestBuy",
+    "ebay": "eBay",
+}
+
+
+class Product:
+    __slots__ = ("title", "price", "currency", "url", "thumbnail", "store", "source", "match_score", "seen_at")
+
+    def __init__(
+        self,
+        title: str,
+        price: float,
+        url: str,
+        thumbnail: Optional[str],
+        store: str,
+        currency: str = "COP",
+        source: Optional[str] = None,
+        match_score: Union[int, float, None] = None,
+        seen_at: Optional[float] = None,
+    ):
+        self.title = title
+        self.price = float(price)
+        self.currency = sys.intern(currency)
+        self.url = url
+        self.thumbnail = thumbnail
+        self.store = sys.intern(store)
+        self.source = sys.intern(source or STORE_NAMES.get(store, store))
+        self.match_score = match_score
+        self.seen_at = seen_at
+
+    def __repr__(self):
+        return f"Product({self.store}, {self.title!r}, {self.price:g})"
+
+    def __reduce__(self):
+        # Pickle compacto (pool de procesos, ver executor.py)
+        return (Product, (self.title, self.price, self.url, self.thumbnail, self.store, self.currency,
+                          self.source, self.match_score, self.seen_at))
+
+    def scored(self, match_score: Union[int, float]) -> "Product":
+        """Copia con el puntaje de la búsqueda."""
+        return Product(self.title, self.price, self.url, self.thumbnail, self.store, self.currency,
+                       self.source, match_score, self.seen_at)
+
+    def seen(self, seen_at: float) -> "Product":
+        """Copia con la fecha en que se vio (índice local)."""
+        return Product(self.title, self.price, self.url, self.thumbnail, self.store, self.currency,
+                       self.source, self.match_score, seen_at)
+
+    def to_dict(self) -> Dict:
+        data = {
+            "title": self.title,
+            "price": self.price,
+            "currency": self.currency,
+            "url": self.url,
+            "thumbnail": self.thumbnail,
+            "source": self.source,
+            "store": self.store,
+        }
+        if self.match_score is not None:
+            data["match_score"] = self.match_score
+        if self.seen_at is not None:
+            data["seen_at"] = self.seen_at
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Product":
+        return cls(data["title"], data["price"], data["url"], data.get("thumbnail"), data["store"],
+                   data.get("currency") or "COP", data.get("source"), data.get("match_score"), data.get("seen_at"))
+
+
+def to_dicts(products: Iterable[Product]) -> List[Dict]:
+    return [product.to_dict() for product in products]
@@ -0,0 +1,174 @@
+"""
+Límite de peticiones salientes por tienda (una tienda = un host).
+
+Cada tienda tiene un token bucket (peticiones por segundo con ráfaga) y
+un semáforo con el máximo de peticiones simultáneas. Una petición que
+excede el límite espera su turno, pero como mucho RATE_LIMIT_MAX_WAIT
+segundos: si no alcanza, se lanza StoreThrottled y el llamador responde
+desde el caché (aunque esté vencido) o reporta la tienda como "throttled".
+
+Configuración (por tienda con sufijo, ej. RATE_LIMIT_FALABELLA=2):
+    RATE_LIMIT_<TIENDA>       peticiones por segundo, 0 = sin límite  (por defecto RATE_LIMIT_DEFAULT=5)
+    RATE_BURST_<TIENDA>       ráfaga máxima, al menos 1               (por defecto RATE_BURST_DEFAULT=10)
+    MAX_CONCURRENCY_<TIENDA>  peticiones simultáneas, al menos 1      (por defecto MAX_CONCURRENCY_DEFAULT=4)
+    RATE_LIMIT_MAX_WAIT       espera máxima en segundos               (por defecto 2)
+
+Un valor fuera de rango lanza ValueError al crear el limitador (la app
+crea los de todas las tiendas al arrancar).
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional
+
+from store_errors import StoreThrottled
+
+RATE_LIMIT_DEFAULT = float(os.getenv("RATE_LIMIT_DEFAULT", "5"))
+RATE_BURST_DEFAULT = float(os.getenv("RATE_BURST_DEFAULT", "10"))
+MAX_CONCURRENCY_DEFAULT = int(os.getenv("MAX_CONCURRENCY_DEFAULT", "4"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "2"))
+
+
+class TokenBucket:
+    """
+    Token bucket con reservas: si no hay token disponible, `reserve` deja
+    el saldo en negativo y retorna cuánto debe esperar el llamador, así
+    las esperas quedan en orden de llegada. Con `rate` 0 no limita.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Reserva un token; retorna los segundos a esperar, o None si excede `max_wait`."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        wait = max(0.0, (1 - self._tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self._tokens -= 1
+        return wait
+
+    def refund(self):
+        """Devuelve un token reservado que no se usó."""
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class StoreLimiter:
+    """Token bucket + tope de concurrencia de una tienda."""
+
+    def __init__(self, store: str, rate: float, burst: float, concurrency: int,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.store = store
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Espera (acotado) un token y un cupo de concurrencia.
+
+        Raises:
+            StoreThrottled: si no se consigue dentro de `max_wait`
+        """
+        started = time.monotonic()
+        wait = self.bucket.reserve(self.max_wait)
+        if wait is None:
+            self.throttled += 1
+            raise StoreThrottled(f"Límite de {self.bucket.rate:g} peticiones/s alcanzado")
+
+        self.waiting += 1
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            if self._semaphore.locked():
+                remaining = self.max_wait - (time.monotonic() - started)
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), max(remaining, 0.001))
+                except asyncio.TimeoutError:
+                    self.throttled += 1
+                    raise StoreThrottled(f"{self.concurrency} peticiones simultáneas en curso") from None
+            else:
+                await self._semaphore.acquire()
+        except BaseException:
+            # Sin cupo o cancelada: el token reservado no se usó
+            self.bucket.refund()
+            raise
+        finally:
+            self.waiting -= 1
+            self.waited += time.monotonic() - started
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "tokens": round(self.bucket.tokens, 2),
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "waited_s": round(self.waited, 3),
+        }
+
+
+class LimiterRegistry:
+    """Un limitador por tienda, configurado por variables de entorno."""
+
+    def __init__(self, stores: Iterable[str] = ()):
+        self._limiters: Dict[str, StoreLimiter] = {}
+        # Se crean de una vez para que una configuración inválida falle al arrancar
+        for store in stores:
+            self.get(store)
+
+    def get(self, store: str) -> StoreLimiter:
+        """
+        Limitador de la tienda.
+
+        Raises:
+            ValueError: si su configuración está fuera de rango
+        """
+        limiter = self._limiters.get(store)
+        if limiter is None:
+            suffix = store.upper()
+            rate = float(os.getenv(f"RATE_LIMIT_{suffix}", RATE_LIMIT_DEFAULT))
+            burst = float(os.getenv(f"RATE_BURST_{suffix}", RATE_BURST_DEFAULT))
+            concurrency = int(os.getenv(f"MAX_CONCURRENCY_{suffix}", MAX_CONCURRENCY_DEFAULT))
+            if rate < 0:
+                raise ValueError(f"RATE_LIMIT_{suffix} inválido: {rate:g} (0 = sin límite)")
+            if rate > 0 and burst < 1:
+                raise ValueError(f"RATE_BURST_{suffix} inválido: {burst:g} (debe ser al menos 1)")
+            if concurrency < 1:
+                raise ValueError(f"MAX_CONCURRENCY_{suffix} inválido: {concurrency} (debe ser al menos 1)")
+            limiter = self._limiters[store] = StoreLimiter(store, rate, burst, concurrency)
+        return limiter
+
+    def stats(self) -> Dict[str, Dict]:
+        return {store: limiter.stats() for store, limiter in self._limiters.items()}
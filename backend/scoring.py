@@ -0,0 +1,93 @@
+"""
+Puntaje de relevancia (0-100) de los productos frente a la búsqueda.
+
+`QueryScorer` se construye una vez por consulta (palabras clave, si la
+búsqueda es de accesorios o reacondicionados, ver filters.QueryFilter) y
+puntúa la lista completa de títulos en una sola llamada con `score_many`.
+Da exactamente los mismos valores (incluido el tipo: int o float) que la
+versión original por producto.
+
+Las pruebas de presencia (palabra clave in título, regex de accesorios)
+son por título: armarlas en arreglos de NumPy no las vectoriza y medido
+con bench_scoring.py no era más rápido, así que todo es Python.
+"""
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+from filters import ACCESORIOS_PUNTAJE, REACONDICIONADO, query_filter
+
+Score = Union[int, float]
+
+
+def _clamp(score: Score) -> Score:
+    return max(0, min(100, score))
+
+
+class QueryScorer:
+    """Puntúa títulos contra una búsqueda fija."""
+
+    def __init__(self, query: str):
+        self.qf = query_filter(query)
+        self.query_lower = self.qf.query_lower
+        self.keywords = self.qf.keywords
+        self.busca_accesorio = self.qf.busca_accesorio(ACCESORIOS_PUNTAJE)
+
+    def score(self, title: str) -> Score:
+        """
+        Calcula qué tan bien coincide el producto con la búsqueda.
+        Retorna un puntaje de 0-100.
+        """
+        if not self.keywords:
+            return 50
+
+        title_lower = title.lower()
+        n = len(self.keywords)
+        score = 0
+
+        # 1. Coincidencia exacta completa = +50 puntos
+        if self.query_lower in title_lower:
+            score += 50
+
+        # 2. Todas las palabras clave presentes = +30 puntos
+        words_in_title = sum(1 for word in self.keywords if word in title_lower)
+        score += (words_in_title / n) * 30
+
+        # 3. Palabras al inicio del título = +20 puntos (más importante)
+        first_50_chars = title_lower[:50]
+        words_at_start = sum(1 for word in self.keywords if word in first_50_chars)
+        score += (words_at_start / n) * 20
+
+        # PENALIZACIONES (muy importante para filtrar)
+
+        # 4. Penalizar accesorios si no se buscan explícitamente
+        if self._es_accesorio(title_lower):
+            score -= 40  # Penalización fuerte
+
+        # 5. Penalizar "reacondicionado" si no se busca
+        if self._es_reacondicionado(title_lower):
+            score -= 20
+
+        # 6. Penalizar si el título es muy corto (posible spam)
+        if len(title) < 15:
+            score -= 15
+
+        return _clamp(score)
+
+    def _es_accesorio(self, title_lower: str) -> bool:
+        return not self.busca_accesorio and ACCESORIOS_PUNTAJE.matches(title_lower)
+
+    def _es_reacondicionado(self, title_lower: str) -> bool:
+        return not self.qf.busca_reacondicionado and REACONDICIONADO in title_lower
+
+    def score_many(self, titles: Sequence[str]) -> List[Score]:
+        """Puntajes de todos los títulos, en el mismo orden."""
+        if not self.keywords:
+            return [50] * len(titles)
+        score = self.score
+        return [score(t) for t in titles]
+
+
+@lru_cache(maxsize=256)
+def query_scorer(query: str) -> QueryScorer:
+    """QueryScorer de la búsqueda (se reutiliza entre requests)."""
+    return QueryScorer(query)
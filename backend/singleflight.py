@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas que están en vuelo al mismo tiempo.
+
+    Mientras exista una llamada en curso para una llave, los demás que
+    pidan la misma llave esperan ese mismo resultado en lugar de lanzar
+    otra petición a la tienda. Al terminar, la llave se libera.
+
+    Si todos los que esperan se cancelan (p. ej. por el presupuesto de
+    /search), la petición compartida también se cancela.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.shared = 0  # llamadas que se ahorraron uniéndose a una en curso
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.shared += 1
+        self._waiters[fut] = self._waiters.get(fut, 0) + 1
+        try:
+            # shield: si un llamador se cancela, la petición compartida sigue
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            # ...salvo que fuera el último esperando por ella
+            if self._waiters.get(fut) == 1 and not fut.done():
+                fut.cancel()
+            raise
+        finally:
+            self._waiters[fut] -= 1
+            if not self._waiters[fut]:
+                del self._waiters[fut]
+
+    def _forget(self, key: Hashable, fut: asyncio.Future):
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # Marca la excepción como leída aunque todos los llamadores se hayan ido
+        if not fut.cancelled():
+            fut.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,45 @@
+"""
+Errores de las tiendas y estados por tienda que reporta /search.
+
+Los fetchers lanzan estos errores en lugar de retornar [] para que el
+llamador pueda distinguir una tienda caída o lenta de una búsqueda sin
+resultados.
+"""
+
+# Estados por tienda en la respuesta de /search
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+STATUS_THROTTLED = "throttled"
+
+
+class StoreError(Exception):
+    """La tienda respondió con error o con un contenido que no se pudo leer."""
+
+
+class StoreTimeout(StoreError):
+    """La tienda no respondió a tiempo."""
+
+
+class StoreBlocked(StoreError):
+    """La tienda respondió, pero con una página de bloqueo o sin los datos esperados."""
+
+
+class StoreSkipped(StoreError):
+    """No se consultó la tienda (p. ej. su circuito está abierto)."""
+
+
+class StoreThrottled(StoreError):
+    """No se consultó la tienda por su límite de peticiones."""
+
+
+def status_for(error: BaseException) -> str:
+    """Traduce una excepción al estado que se reporta por tienda."""
+    if isinstance(error, StoreTimeout):
+        return STATUS_TIMEOUT
+    if isinstance(error, StoreSkipped):
+        return STATUS_SKIPPED
+    if isinstance(error, StoreThrottled):
+        return STATUS_THROTTLED
+    return STATUS_ERROR
@@ -0,0 +1,225 @@
+"""
+Sugerencias de búsqueda por prefijo (GET /suggest).
+
+Mientras el usuario escribe se le proponen búsquedas que ya dieron
+resultados, para que no dispare una consulta a las seis tiendas por una
+búsqueda mal escrita o sin productos:
+
+- búsquedas del historial de precios (solo las que trajeron productos),
+  con peso por cuántas veces se consultaron las tiendas, más la frecuencia
+  reciente de los usuarios (prefetch.QueryCounter);
+- frases de 1 a 3 palabras de los títulos del índice local ("iphone 15",
+  "iphone 15 pro", "televisor samsung"), con peso por cuántos productos
+  las contienen.
+
+Los términos (normalizados con normalize_query) van en un arreglo ordenado
+con sus pesos en arreglos paralelos: los que empiezan por el prefijo son un
+rango contiguo que se encuentra con bisect. Para los prefijos de 1 y 2
+letras, donde el rango es casi todo el arreglo, el top ya viene calculado.
+El índice es inmutable: se reconstruye en un hilo cada
+SUGGEST_REBUILD_SECONDS y se reemplaza de una vez.
+
+Entre las sugerencias primero van las búsquedas con respuesta vigente en
+el caché (`warm`), luego por peso.
+
+Configuración:
+    SUGGEST_REBUILD_SECONDS  segundos entre reconstrucciones            (por defecto 300)
+    SUGGEST_HISTORY_DAYS     días de búsquedas del historial a usar     (por defecto 30)
+    SUGGEST_MAX_PHRASES      frases de títulos a conservar              (por defecto 50000)
+    SUGGEST_QUERY_WEIGHT     peso de una búsqueda frente a un producto  (por defecto 5)
+"""
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from heapq import nlargest
+from itertools import groupby
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from cache import normalize_query
+from filters import STOP_WORDS
+
+logger = logging.getLogger("uvicorn.error")
+
+SUGGEST_REBUILD_SECONDS = float(os.getenv("SUGGEST_REBUILD_SECONDS", "300"))
+SUGGEST_HISTORY_DAYS = float(os.getenv("SUGGEST_HISTORY_DAYS", "30"))
+SUGGEST_MAX_PHRASES = int(os.getenv("SUGGEST_MAX_PHRASES", "50000"))
+SUGGEST_QUERY_WEIGHT = float(os.getenv("SUGGEST_QUERY_WEIGHT", "5"))
+
+# Máximo de sugerencias por respuesta
+MAX_LIMIT = 20
+# Candidatos por prefijo antes de reordenar por caché
+CANDIDATES = MAX_LIMIT * 3
+# Prefijos con el top precalculado (hasta esta longitud)
+HOT_PREFIX_LEN = 2
+# Frases de títulos: hasta 3 palabras, empezando en las primeras 6
+PHRASE_WORDS = 3
+PHRASE_STARTS = 6
+
+KIND_QUERY = "query"
+KIND_PRODUCT = "product"
+
+_PUNCTUATION = "\"'()[]{},;:!¡?¿|*+-_/"
+
+# término normalizado -> (peso, texto a mostrar, tipo)
+Entries = Dict[str, Tuple[float, str, str]]
+
+
+@lru_cache(maxsize=262144)
+def title_phrases(title: str) -> Dict[str, str]:
+    """
+    Frases de 1 a 3 palabras del título que sirven como búsqueda (sin
+    empezar ni terminar en conectores), {normalizada: como en el título}.
+    Se cachea: de una reconstrucción a otra casi todos los títulos se repiten.
+    """
+    words = [w.strip(_PUNCTUATION) for w in title.lower().split()]
+    # Se normaliza el título una vez y no cada frase (y solo si tiene tildes)
+    keys = words if title.isascii() else [w.strip(_PUNCTUATION) for w in normalize_query(title).split()]
+    if len(keys) != len(words):
+        keys = [normalize_query(w) for w in words]
+    phrases = {}
+    for start in range(min(len(words), PHRASE_STARTS)):
+        first = words[start]
+        if len(first) < 2 or first in STOP_WORDS:
+            continue
+        for end in range(start + 1, min(len(words), start + PHRASE_WORDS) + 1):
+            last = words[end - 1]
+            if not last:
+                break
+            if last not in STOP_WORDS:
+                phrases[" ".join(keys[start:end])] = " ".join(words[start:end])
+    return phrases
+
+
+def build_entries(queries: Dict[str, Tuple[float, str]], titles: List[str],
+                  max_phrases: int = SUGGEST_MAX_PHRASES, query_weight: float = SUGGEST_QUERY_WEIGHT) -> Entries:
+    """Junta búsquedas {normalizada: (frecuencia, texto)} y frases de títulos en un solo diccionario."""
+    counts: Counter = Counter()
+    texts: Dict[str, str] = {}
+    for title in titles:
+        phrases = title_phrases(title)
+        counts.update(phrases.keys())
+        for key, phrase in phrases.items():
+            texts.setdefault(key, phrase)
+    entries: Entries = {key: (n, texts[key], KIND_PRODUCT) for key, n in counts.most_common(max_phrases)}
+    for key, (n, text) in queries.items():
+        weight, _, _ = entries.get(key, (0, "", ""))
+        entries[key] = (weight + n * query_weight, text, KIND_QUERY)
+    return entries
+
+
+class PrefixIndex:
+    """Términos ordenados con sus pesos; búsqueda por prefijo con bisect."""
+
+    def __init__(self, entries: Entries):
+        self.keys = sorted(entries)
+        self.weights = [entries[key][0] for key in self.keys]
+        self.texts = [entries[key][1] for key in self.keys]
+        self.kinds = [entries[key][2] for key in self.keys]
+        self.built_at = time.time()
+        # prefijo corto -> posiciones de los términos de más peso
+        self._hot: Dict[str, List[int]] = {}
+        for length in range(1, HOT_PREFIX_LEN + 1):
+            for prefix, positions in groupby(range(len(self.keys)), key=lambda i: self.keys[i][:length]):
+                if len(prefix) == length:
+                    self._hot[prefix] = nlargest(CANDIDATES, positions, key=self.weights.__getitem__)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, prefix: str, limit: int = CANDIDATES) -> List[int]:
+        """Posiciones de los `limit` términos de más peso que empiezan por `prefix` (normalizado)."""
+        if len(prefix) <= HOT_PREFIX_LEN:
+            return self._hot.get(prefix, [])[:limit]
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        return nlargest(limit, range(lo, hi), key=self.weights.__getitem__)
+
+
+class Suggester:
+    """
+    Sugerencias por prefijo sobre un PrefixIndex que se reconstruye en
+    segundo plano.
+
+    Args:
+        collect: corrutina que retorna ({búsqueda normalizada: (frecuencia,
+            texto)}, títulos) con los datos actuales
+        is_warm: is_warm(búsqueda normalizada) -> True si tiene respuesta
+            vigente en el caché
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[], Awaitable[Tuple[Dict[str, Tuple[float, str]], List[str]]]],
+        is_warm: Callable[[str], bool],
+        interval: float = SUGGEST_REBUILD_SECONDS,
+    ):
+        self.collect = collect
+        self.is_warm = is_warm
+        self.interval = interval
+        self.index = PrefixIndex({})
+        self._task = None
+        self.rebuilds = 0
+        self.last_build_ms = 0
+        self.requests = 0
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict]:
+        """Sugerencias para `prefix`: primero las que están en caché, luego por peso."""
+        self.requests += 1
+        key = normalize_query(prefix)
+        if not key:
+            return []
+        index = self.index
+        suggestions = [
+            {"text": index.texts[i], "kind": index.kinds[i], "weight": index.weights[i],
+             "warm": index.kinds[i] == KIND_QUERY and self.is_warm(index.keys[i])}
+            for i in index.lookup(key)
+        ]
+        # sort es estable: dentro de cada grupo se conserva el orden por peso
+        suggestions.sort(key=lambda s: not s["warm"])
+        return suggestions[:limit]
+
+    async def rebuild(self):
+        """Reconstruye el índice con los datos actuales (la construcción va en un hilo)."""
+        started = time.perf_counter()
+        queries, titles = await self.collect()
+        entries = await asyncio.to_thread(build_entries, queries, titles)
+        self.index = await asyncio.to_thread(PrefixIndex, entries)
+        self.rebuilds += 1
+        self.last_build_ms = round((time.perf_counter() - started) * 1000)
+        logger.info(f"[Suggest] {len(self.index)} términos ({len(queries)} búsquedas, "
+                    f"{len(titles)} títulos) en {self.last_build_ms} ms")
+
+    def start(self):
+        """Arranca las reconstrucciones periódicas (dentro del event loop)."""
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"[Suggest] Error reconstruyendo el índice: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        return {
+            "terms": len(self.index),
+            "built_at": round(self.index.built_at),
+            "rebuilds": self.rebuilds,
+            "last_build_ms": self.last_build_ms,
+            "requests": self.requests,
+        }
@@ -0,0 +1,50 @@
+"""
+Tiempos por fase (red, parseo) de la consulta a una tienda.
+
+El llamador abre un registro con `start_timings()` antes de consultar la
+tienda; los fetchers suman sus fases con `measure()` y el pool de parseo
+con `add()` (el parseo se mide dentro del worker, ver executor.py).
+El registro viaja en un ContextVar, así que cada tarea (y la petición
+compartida que lanza el singleflight) escribe en el registro de quien la
+inició. Sin registro abierto, `measure()` no hace nada.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("store_timings", default=None)
+
+
+def start_timings() -> Dict[str, float]:
+    """Abre un registro vacío para el contexto actual y lo retorna."""
+    timings: Dict[str, float] = {}
+    _current.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    """El registro abierto en el contexto actual, o None."""
+    return _current.get()
+
+
+def add(phase: str, seconds: float):
+    """Suma `seconds` a la fase en el registro actual."""
+    timings = _current.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def measure(phase: str):
+    """Suma al registro actual los segundos que tarda el bloque."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(phase, time.perf_counter() - started)
+
+
+def as_ms(timings: Dict[str, float]) -> Dict[str, int]:
+    """Convierte el registro a {"<fase>_ms": milisegundos} para las respuestas."""
+    return {f"{phase}_ms": round(seconds * 1000) for phase, seconds in timings.items()}
@@ -0,0 +1,127 @@
+"""
+Tendencias de precio sobre el historial (ver history.py).
+
+Las observaciones llegan como pares (fecha, precio) ordenados por
+producto y fecha, así que cada producto es un tramo contiguo de los
+arreglos. Todas las estadísticas (min/max/mediana/percentiles, último
+cambio, serie reducida) se calculan con NumPy para todos los productos a
+la vez: un solo ordenamiento, `reduceat` y `bincount` por tramo, sin
+recorrer las observaciones fila por fila en Python.
+"""
+from itertools import chain
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from history import Observations
+
+DEFAULT_PERCENTILES = (10, 25, 75, 90)
+DEFAULT_POINTS = 60
+
+
+def _group_percentiles(sorted_prices: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                       percentiles: Sequence[float]) -> np.ndarray:
+    """
+    Percentiles (interpolación lineal, como np.percentile) de cada tramo de
+    `sorted_prices`, ordenado dentro de cada producto. Retorna (productos, percentiles).
+    """
+    q = np.asarray(percentiles, dtype=np.float64) / 100
+    pos = starts[:, None] + (counts[:, None] - 1) * q[None, :]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, (starts + counts - 1)[:, None])
+    return sorted_prices[lo] + (sorted_prices[hi] - sorted_prices[lo]) * (pos - lo)
+
+
+def _latest_changes(prices: np.ndarray, group: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Índice de la última observación con un precio distinto al anterior (-1 si nunca cambió)."""
+    changed = np.zeros(prices.size, dtype=bool)
+    changed[1:] = (prices[1:] != prices[:-1]) & (group[1:] == group[:-1])
+    at = np.where(changed, np.arange(prices.size), -1)
+    return np.maximum.reduceat(at, starts)
+
+
+def _downsample(seen_at: np.ndarray, prices: np.ndarray, group: np.ndarray,
+                starts: np.ndarray, ends: np.ndarray, points: int):
+    """
+    Divide el rango de fechas de cada producto en `points` intervalos iguales
+    y promedia fecha y precio de cada uno. Retorna (fechas, precios, llenos)
+    con forma (productos, points).
+    """
+    first, last = seen_at[starts], seen_at[ends - 1]
+    span = np.where(last > first, last - first, 1.0)
+    bucket = ((seen_at - first[group]) / span[group] * points).astype(np.int64)
+    np.minimum(bucket, points - 1, out=bucket)
+    slot = group * points + bucket
+    size = starts.size * points
+    counts = np.bincount(slot, minlength=size).reshape(-1, points)
+    filled = counts > 0
+    safe = np.where(filled, counts, 1)
+    times = np.bincount(slot, weights=seen_at, minlength=size).reshape(-1, points) / safe
+    means = np.bincount(slot, weights=prices, minlength=size).reshape(-1, points) / safe
+    return times, means, filled
+
+
+def summarize_by_product(
+    observations: Observations,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    points: int = DEFAULT_POINTS,
+) -> List[Dict]:
+    """
+    Resume cada producto del historial: cantidad, primera/última fecha,
+    último precio, min/max/mediana/percentiles, último cambio de precio y
+    la serie reducida a lo sumo `points` puntos ([fecha unix, precio]).
+
+    Se ordena del más barato al más caro según el último precio.
+    """
+    if not observations.products:
+        return []
+    flat = np.fromiter(chain.from_iterable(observations.points), dtype=np.float64,
+                       count=2 * len(observations.points))
+    seen_at, prices = flat[0::2], flat[1::2]
+    counts = np.array([count for *_, count in observations.products], dtype=np.int64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    group = np.repeat(np.arange(counts.size), counts)
+
+    # Un solo ordenamiento: precios ordenados dentro de cada producto
+    sorted_prices = prices[np.lexsort((prices, group))]
+    stats = _group_percentiles(sorted_prices, starts, counts, [50, *percentiles])
+    changes = _latest_changes(prices, group, starts)
+    times, means, filled = _downsample(seen_at, prices, group, starts, ends, points)
+
+    products = []
+    for i, (url, store, title, count) in enumerate(observations.products):
+        start, end = starts[i], ends[i]
+        if count <= points:
+            series_t, series_p = seen_at[start:end], prices[start:end]
+        else:
+            series_t, series_p = times[i][filled[i]], means[i][filled[i]].round(2)
+        series = list(zip(series_t.astype(np.int64).tolist(), series_p.tolist()))
+        change = None
+        if changes[i] >= 0:
+            j = changes[i]
+            before, after = float(prices[j - 1]), float(prices[j])
+            change = {
+                "from": before,
+                "to": after,
+                "delta": after - before,
+                "pct": round((after - before) / before * 100, 2) if before else None,
+                "at": int(seen_at[j]),
+            }
+        products.append({
+            "url": url,
+            "store": store,
+            "title": title,
+            "count": int(count),
+            "first_seen": int(seen_at[start]),
+            "last_seen": int(seen_at[end - 1]),
+            "latest": float(prices[end - 1]),
+            "min": float(sorted_prices[start]),
+            "max": float(sorted_prices[end - 1]),
+            "median": float(stats[i, 0]),
+            **{f"p{p:g}": float(v) for p, v in zip(percentiles, stats[i, 1:])},
+            "latest_change": change,
+            "series": series,
+        })
+    products.sort(key=lambda p: p["latest"])
+    return products
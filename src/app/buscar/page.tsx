@@ -41,14 +41,37 @@ function SearchContent() {
     if (!searchQuery.trim()) return;
     
     setLoading(true);
+    setResults([]);
+    setCheapest(null);
     try {
-      const res = await fetch(`http://localhost:8000/search?q=${encodeURIComponent(searchQuery)}`);
-      const data = await res.json();
-      
-      const sortedItems = (data.items || []).sort((a: any, b: any) => a.price - b.price);
-      
-      setResults(sortedItems);
-      setCheapest(data.cheapest || null);
+      // Streaming NDJSON: cada tienda llega apenas termina
+      const res = await fetch(`http://localhost:8000/search/stream?q=${encodeURIComponent(searchQuery)}`);
+      if (!res.body) throw new Error('Respuesta sin cuerpo');
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let received: Product[] = [];
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || '';
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'store') {
+            received = [...received, ...(event.items || [])].sort((a, b) => a.price - b.price);
+            setResults(received);
+            setLoading(false);
+          } else if (event.type === 'done') {
+            setCheapest(event.cheapest || null);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error buscando:', error);
     }